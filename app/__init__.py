@@ -1,4 +1,72 @@
-# Assuming this file is in the same directory as `config` and `routes`
+"""
+The game guides web application.
 
-from .config import app
-from . import routes
+``create_app`` builds an application. Importing this package does no work by
+itself: Flask, the database layer and the route modules are only imported when
+the first application is created. ``from app import app`` returns a default
+application, created on first access.
+"""
+
+import threading
+from collections.abc import Mapping
+
+
+_default_app = None
+_default_app_lock = threading.Lock()
+
+
+def create_app(config=None):
+    """
+    Create and configure an application.
+
+    An application keeping the database settings of the environment shares
+    the process-wide engine and database services; one overriding a setting of
+    ``db.PROCESS_SETTINGS``, e.g. ``DATABASE_URL``, gets its own.
+
+    Args:
+        config (Mapping | object | None): Settings applied over ``Config`` and
+                                          ``db.DATABASE_CONFIG``, as a mapping
+                                          or an object with upper-case
+                                          attributes.
+
+    Returns:
+        Flask: The application.
+    """
+    from flask import Flask
+
+    from db import DATABASE_CONFIG
+    from .assets import init_assets
+    from .commands import register_commands
+    from .compression import CompressionMiddleware
+    from .config import Config
+    from .extensions import init_extensions
+    from .logs import configure_logging
+    from .routes import register_blueprints
+
+    app = Flask(
+        __name__, template_folder="frontend/templates", static_folder="frontend/static"
+    )
+    app.config.update(DATABASE_CONFIG)
+    app.config.from_object(Config)
+    if isinstance(config, Mapping):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    configure_logging(app)
+    init_extensions(app)
+    init_assets(app)
+    register_blueprints(app)
+    register_commands(app)
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config)
+    return app
+
+
+def __getattr__(name):
+    global _default_app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+    return _default_app
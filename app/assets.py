@@ -0,0 +1,202 @@
+"""
+Build step and runtime support for fingerprinted, precompressed static assets.
+
+``flask assets build`` minifies the CSS and JavaScript files of the static
+folder, writes them to ``dist/`` under content-hashed names with ``.gz`` (and,
+when the optional ``brotli`` package is installed, ``.br``) siblings, and
+records the mapping in ``dist/manifest.json``.
+
+At runtime ``url_for('static', filename=...)`` in templates resolves names
+through the manifest, and hashed files are served precompressed with an
+immutable one-year cache lifetime. Without a manifest the original files are
+served as before.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+
+DIST_DIRECTORY = "dist"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ASSET_EXTENSIONS = (".css", ".js")
+
+
+def minify_css(source):
+    """
+    Remove comments and redundant whitespace from a stylesheet.
+    """
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    source = re.sub(r"\s*([{};,>])\s*", r"\1", source)
+    return source.replace(";}", "}").strip()
+
+
+def minify_js(source):
+    """
+    Remove indentation, blank lines and whole-line comments from a script.
+
+    This is not a JavaScript parser. Stripping lines would change the content
+    of template literals and of strings continued with a trailing backslash,
+    so scripts containing a backtick or a line continuation are left as they
+    are; ship such scripts already minified as ``.min.js``.
+    """
+    if "`" in source or re.search(r"\\\r?\n", source):
+        return source
+    lines = (line.strip() for line in source.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+def _minify(relative_path, content):
+    if relative_path.endswith(".min.js") or relative_path.endswith(".min.css"):
+        return content
+    text = content.decode("utf-8")
+    if relative_path.endswith(".css"):
+        return minify_css(text).encode("utf-8")
+    return minify_js(text).encode("utf-8")
+
+
+def _write(path, content):
+    with open(path, "wb") as file:
+        file.write(content)
+
+
+def build_assets(static_folder):
+    """
+    Minify, fingerprint and precompress the assets of ``static_folder``.
+
+    Args:
+        static_folder (str): Path of the application's static folder.
+
+    Returns:
+        dict: The manifest mapping original names to hashed names.
+    """
+    import gzip
+
+    dist_folder = os.path.join(static_folder, DIST_DIRECTORY)
+    os.makedirs(dist_folder, exist_ok=True)
+
+    manifest = {}
+    for root, directories, files in os.walk(static_folder):
+        directories[:] = [name for name in directories if name != DIST_DIRECTORY]
+        for name in sorted(files):
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            source_path = os.path.join(root, name)
+            relative_path = os.path.relpath(source_path, static_folder).replace(
+                os.sep, "/"
+            )
+            with open(source_path, "rb") as file:
+                content = _minify(relative_path, file.read())
+
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            stem, extension = os.path.splitext(relative_path)
+            hashed_path = f"{DIST_DIRECTORY}/{stem}.{digest}{extension}"
+            output_path = os.path.join(static_folder, *hashed_path.split("/"))
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+            _write(output_path, content)
+            _write(output_path + ".gz", gzip.compress(content, 9, mtime=0))
+            if brotli is not None:
+                _write(output_path + ".br", brotli.compress(content))
+            manifest[relative_path] = hashed_path
+
+    with open(os.path.join(dist_folder, MANIFEST_NAME), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """
+    Read the asset manifest written by ``build_assets``.
+
+    Returns:
+        dict: The manifest, or an empty mapping if assets have not been built.
+    """
+    path = os.path.join(static_folder, DIST_DIRECTORY, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url_for(endpoint, **values):
+    """
+    ``url_for`` that resolves static file names to their fingerprinted versions.
+    """
+    if endpoint == "static" and "filename" in values:
+        manifest = current_app.extensions["asset_manifest"]
+        values["filename"] = manifest.get(values["filename"], values["filename"])
+    return url_for(endpoint, **values)
+
+
+def serve_static(filename):
+    """
+    Serve a static file, using a precompressed sibling and an immutable cache
+    lifetime for fingerprinted files.
+    """
+    static_folder = current_app.static_folder
+    if not filename.startswith(DIST_DIRECTORY + "/"):
+        return current_app.send_static_file(filename)
+
+    accepted = request.accept_encodings
+    encoding = None
+    for candidate, extension in (("br", ".br"), ("gzip", ".gz")):
+        if accepted[candidate] and os.path.isfile(
+            os.path.join(static_folder, filename + extension)
+        ):
+            encoding = candidate
+            break
+
+    if encoding is None:
+        response = send_from_directory(static_folder, filename, max_age=31536000)
+    else:
+        response = send_from_directory(
+            static_folder,
+            filename + (".br" if encoding == "br" else ".gz"),
+            mimetype=_mimetype(filename),
+            max_age=31536000,
+        )
+        response.content_encoding = encoding
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _mimetype(filename):
+    return "text/css" if filename.endswith(".css") else "text/javascript"
+
+
+def init_assets(app):
+    """
+    Install the manifest-aware ``url_for``, the static view and the build command.
+
+    Args:
+        app (Flask): The application.
+    """
+    app.extensions["asset_manifest"] = load_manifest(app.static_folder)
+    app.jinja_env.globals["url_for"] = asset_url_for
+    app.view_functions["static"] = serve_static
+
+    @app.cli.group("assets")
+    def assets_command():
+        """Manage static assets."""
+
+    @assets_command.command("build")
+    def build_command():
+        """Minify, fingerprint and precompress static assets."""
+        manifest = build_assets(app.static_folder)
+        app.extensions["asset_manifest"] = manifest
+        for original, hashed in sorted(manifest.items()):
+            click.echo(f"{original} -> {hashed}")
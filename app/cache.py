@@ -0,0 +1,117 @@
+"""
+A small thread-safe in-memory cache with per-entry expiry and LRU eviction.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded mapping whose entries expire after ``ttl`` seconds.
+
+    The least recently used entry is evicted once ``maxsize`` is reached, so
+    memory use stays constant however many keys pass through the cache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0):
+        """
+        Args:
+            maxsize (int): Maximum number of entries kept.
+            ttl (float): Default lifetime of an entry in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value cached under ``key``, or ``default`` if missing or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Cache ``value`` under ``key`` for ``ttl`` seconds (the cache default if None).
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove ``key`` from the cache.
+
+        Returns:
+            bool: True if an entry was removed.
+        """
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def delete_matching(self, predicate):
+        """
+        Remove the entries whose key satisfies ``predicate``.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            matching = [key for key in self._data if predicate(key)]
+            for key in matching:
+                del self._data[key]
+            return len(matching)
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def purge_expired(self, batch_size=None):
+        """
+        Remove expired entries, at most ``batch_size`` of them per call.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                key for key, (_, expires_at) in self._data.items() if expires_at <= now
+            ][:batch_size]
+            for key in expired:
+                del self._data[key]
+            return len(expired)
+
+    def stats(self):
+        """
+        Return the hit and miss counters and the current size of the cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,353 @@
+"""
+Bulk import and export of guides as JSONL or CSV.
+
+Records are parsed one at a time from the input stream and inserted in batches
+of ``executemany`` inserts, so memory use does not depend on the size of the
+input. Every batch is committed in its own write transaction, so other writers
+get the lock between batches; an import that fails keeps the batches committed
+before the failure, and ``ImportInterrupted`` reports how far it got. Game names
+are resolved through a mapping of all games loaded once at the start; missing
+games are created in the transaction of the first batch that needs them.
+
+Every record needs the fields of ``GuideForm``: ``game_name``, ``title``,
+``content``, ``link``, ``video`` and ``image``. Invalid records are skipped and
+reported with their line number.
+
+Exports stream the catalogue from a server-side cursor in chunks of
+``EXPORT_CHUNK_SIZE`` rows, optionally gzip-compressed, and produce records
+that can be imported again.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+from db import get_engine, write_transaction, Game, Guide, User
+from .extensions import fragment_cache, leaderboard
+from .routes.validators import GuideForm
+
+
+IMPORT_FORMATS = ("jsonl", "csv")
+EXPORT_FORMATS = IMPORT_FORMATS
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = (
+    Guide.id,
+    Game.name.label("game_name"),
+    Guide.title,
+    Guide.content,
+    Guide.link,
+    Guide.video,
+    Guide.image,
+    User.username.label("author"),
+    Guide.usage_count,
+    Guide.updated_at,
+)
+
+
+class ImportReport:
+    """
+    Outcome of an import.
+
+    Attributes:
+        imported (int): Guides inserted.
+        failed (int): Records skipped because they were invalid.
+        created_games (int): Games created for unknown game names.
+        errors (list[tuple[int, str]]): Line numbers and messages of the first
+                                        ``max_errors`` invalid records.
+        committed_line (int): Line of the last record committed; every record
+                              up to it was imported or rejected. An interrupted
+                              import can resume after it.
+    """
+
+    def __init__(self, max_errors=100):
+        self.imported = 0
+        self.failed = 0
+        self.created_games = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.committed_line = 0
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    def to_dict(self):
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "created_games": self.created_games,
+            "committed_line": self.committed_line,
+            "errors": [
+                {"line": line, "error": message} for line, message in self.errors
+            ],
+        }
+
+
+class ImportInterrupted(Exception):
+    """
+    Raised when an import stops on a database or decoding error.
+
+    The batches before the failure stay committed; the error is the exception's
+    ``__cause__``.
+
+    Attributes:
+        report (ImportReport): What was imported before the failure.
+    """
+
+    def __init__(self, report):
+        super().__init__(
+            f"Import stopped after line {report.committed_line}; "
+            f"{report.imported} guides were imported."
+        )
+        self.report = report
+
+
+def format_from_filename(filename):
+    """
+    Guess the import format from a file name.
+
+    Returns:
+        str | None: ``"jsonl"``, ``"csv"``, or None if the extension is unknown.
+    """
+    extension = filename.rsplit(".", 1)[-1].lower() if filename else ""
+    if extension in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    return None
+
+
+def read_records(stream, file_format):
+    """
+    Parse records lazily from a text stream.
+
+    Args:
+        stream (TextIO): The input.
+        file_format (str): ``"jsonl"`` or ``"csv"``; CSV needs a header row.
+
+    Yields:
+        tuple[int, dict | None, str | None]: The line number, and the record or
+        the reason it could not be parsed.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, f"Invalid JSON: {error}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object."
+            continue
+        yield line_number, record, None
+
+
+def _validate(record):
+    form = GuideForm(
+        MultiDict(
+            {
+                key: "" if value is None else str(value)
+                for key, value in record.items()
+            }
+        )
+    )
+    if form.validate():
+        return form, None
+    return None, " ".join(
+        message for messages in form.errors.values() for message in messages
+    )
+
+
+def import_guides(
+    stream,
+    file_format,
+    user_id,
+    create_games=False,
+    batch_size=500,
+    max_errors=100,
+    on_progress=None,
+    on_error=None,
+):
+    """
+    Import guides written by one user from a JSONL or CSV stream.
+
+    Args:
+        stream (TextIO): The input.
+        file_format (str): ``"jsonl"`` or ``"csv"``.
+        user_id (int): Author of the imported guides.
+        create_games (bool): Create games missing from the database instead of
+                             rejecting their guides.
+        batch_size (int): Guides inserted per statement and transaction.
+        max_errors (int): Errors kept in the report; all are counted.
+        on_progress (Callable[[ImportReport], None]): Called after every batch.
+        on_error (Callable[[int, str], None]): Called with the line number and
+                                               message of every invalid record.
+
+    Returns:
+        ImportReport: The numbers of imported and failed records.
+
+    Raises:
+        ValueError: If the format is unknown.
+        ImportInterrupted: If a batch cannot be written or the stream cannot be
+                           decoded; earlier batches are kept.
+    """
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unknown import format: {file_format}")
+
+    report = ImportReport(max_errors=max_errors)
+    bind = get_engine()
+    with bind.connect() as connection:
+        game_ids = dict(connection.execute(select(Game.name, Game.id)).all())
+    batch = []
+
+    def reject(line, message):
+        report.add_error(line, message)
+        if on_error is not None:
+            on_error(line, message)
+
+    def flush():
+        resolved = {}
+        created_games = 0
+        with write_transaction(bind) as connection:
+            for _, game_name, _ in batch:
+                if game_name in game_ids or game_name in resolved:
+                    continue
+                # Looked up again under the write lock, as another import may
+                # have created the game since the start.
+                game_id = connection.scalar(
+                    select(Game.id).where(Game.name == game_name)
+                )
+                if game_id is None:
+                    game_id = connection.execute(
+                        insert(Game).values(name=game_name)
+                    ).inserted_primary_key[0]
+                    created_games += 1
+                resolved[game_name] = game_id
+            rows = [
+                {**values, "game_id": resolved.get(name) or game_ids[name]}
+                for _, name, values in batch
+            ]
+            connection.execute(insert(Guide), rows)
+        game_ids.update(resolved)
+        report.created_games += created_games
+        report.imported += len(batch)
+        report.committed_line = batch[-1][0]
+        batch.clear()
+        if on_progress is not None:
+            on_progress(report)
+
+    try:
+        for line, record, error in read_records(stream, file_format):
+            if error is None:
+                form, error = _validate(record)
+            if error is not None:
+                reject(line, error)
+                continue
+
+            game_name = form.game_name.data
+            if game_name not in game_ids and not create_games:
+                reject(line, f"Game {game_name} not found.")
+                continue
+
+            batch.append(
+                (
+                    line,
+                    game_name,
+                    {
+                        "title": form.title.data,
+                        "content": form.content.data,
+                        "link": form.link.data,
+                        "video": form.video.data,
+                        "image": form.image.data,
+                        "user_id": user_id,
+                    },
+                )
+            )
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except (SQLAlchemyError, UnicodeDecodeError) as error:
+        raise ImportInterrupted(report) from error
+    finally:
+        # Core inserts bypass the ORM events that keep these caches current.
+        if report.imported or report.created_games:
+            leaderboard.invalidate()
+            fragment_cache.invalidate("games", "help_other")
+    return report
+
+
+def _serialize_rows(rows, file_format, fieldnames):
+    if file_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+    return "".join(
+        json.dumps(dict(zip(fieldnames, row)), default=str) + "\n" for row in rows
+    )
+
+
+def export_guides(
+    file_format, compress=False, chunk_size=EXPORT_CHUNK_SIZE, bind=None
+):
+    """
+    Stream every guide with its game name and author.
+
+    Rows are fetched ``chunk_size`` at a time from a server-side cursor, and each
+    chunk is serialized and yielded before the next is fetched, so the first
+    bytes are produced immediately and memory use does not depend on the number
+    of guides.
+
+    Args:
+        file_format (str): ``"jsonl"`` or ``"csv"``; CSV starts with a header row.
+        compress (bool): Gzip the output.
+        chunk_size (int): Rows fetched and serialized at a time.
+        bind (Engine | None): The engine to read from, by default that of the
+                              current application. Pass it when the export is
+                              consumed after the application context ends.
+
+    Yields:
+        bytes: Consecutive parts of the export.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {file_format}")
+
+    fieldnames = [column.key for column in EXPORT_COLUMNS]
+    statement = (
+        select(*EXPORT_COLUMNS)
+        .join(Game, Guide.game_id == Game.id)
+        .join(User, Guide.user_id == User.id)
+        .order_by(Guide.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+    def encode(text):
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if file_format == "csv":
+        yield encode(_serialize_rows([fieldnames], "csv", fieldnames))
+    with (bind or get_engine()).connect() as connection:
+        for rows in connection.execute(statement).partitions():
+            data = encode(_serialize_rows(rows, file_format, fieldnames))
+            if data:
+                yield data
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,150 @@
+"""
+Command line commands, available through ``flask --app main <command>``.
+
+The ``db`` commands run against the engine of the application, and import the
+migrations only when they run.
+"""
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select
+
+from db import db_session, get_engine, User
+from .catalogue import (
+    EXPORT_FORMATS,
+    IMPORT_FORMATS,
+    ImportInterrupted,
+    export_guides,
+    format_from_filename,
+    import_guides,
+)
+
+
+db_cli = AppGroup("db", help="Manage the database schema.")
+guides_cli = AppGroup("guides", help="Import and export guides.")
+
+
+@guides_cli.command("import")
+@click.argument("source", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(IMPORT_FORMATS),
+    help="Input format; guessed from the file name by default.",
+)
+@click.option("--author", required=True, help="Username of the guides' author.")
+@click.option("--create-games", is_flag=True, help="Create missing games.")
+@click.option("--batch-size", default=500, show_default=True)
+def import_command(source, file_format, author, create_games, batch_size):
+    """Import guides from a JSONL or CSV file, or - for standard input."""
+    file_format = file_format or format_from_filename(source.name)
+    if file_format is None:
+        raise click.UsageError("Cannot guess the format; pass --format.")
+    user_id = db_session.scalar(select(User.id).where(User.username == author))
+    if user_id is None:
+        raise click.UsageError(f"Unknown author: {author}")
+
+    def progress(report):
+        click.echo(f"{report.imported} imported, {report.failed} failed", err=True)
+
+    def error(line, message):
+        click.echo(f"line {line}: {message}", err=True)
+
+    try:
+        report = import_guides(
+            source,
+            file_format,
+            user_id,
+            create_games=create_games,
+            batch_size=batch_size,
+            max_errors=0,
+            on_progress=progress,
+            on_error=error,
+        )
+    except ImportInterrupted as interrupted:
+        raise click.ClickException(f"{interrupted} {interrupted.__cause__}")
+    click.echo(
+        f"Imported {report.imported} guides, created {report.created_games} games, "
+        f"skipped {report.failed} invalid records."
+    )
+    current_app.logger.info(
+        "Imported %d guides from %s (%d failed).",
+        report.imported,
+        source.name,
+        report.failed,
+    )
+
+
+@guides_cli.command("export")
+@click.argument("target", type=click.File("wb"), default="-")
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(EXPORT_FORMATS),
+    default="jsonl",
+    show_default=True,
+)
+@click.option("--gzip", "compress", is_flag=True, help="Gzip the output.")
+def export_command(target, file_format, compress):
+    """Export every guide to a file, or - for standard output."""
+    for chunk in export_guides(file_format, compress=compress):
+        target.write(chunk)
+
+
+@db_cli.command("init")
+def init_command():
+    """Create the schema, or upgrade an existing one."""
+    from db.migrations import MigrationLocked, migrate
+
+    try:
+        migrate(get_engine())
+    except MigrationLocked as error:
+        raise click.ClickException(str(error))
+    click.echo("Database schema is up to date.")
+
+
+@db_cli.command("upgrade")
+@click.option("--target", type=int, help="Stop after this migration version.")
+def upgrade_command(target):
+    """Apply the pending migrations."""
+    from db.migrations import MigrationLocked, migrate
+
+    try:
+        applied = migrate(get_engine(), target)
+    except MigrationLocked as error:
+        raise click.ClickException(str(error))
+    for step in applied:
+        click.echo(f"Applied {step.version}: {step.description}")
+    click.echo("Database schema is up to date.")
+
+
+@db_cli.command("status")
+def status_command():
+    """List the migrations and whether they were applied."""
+    from db.migrations import MIGRATIONS, applied_versions
+
+    applied = applied_versions(get_engine())
+    for known in MIGRATIONS:
+        state = "applied" if known.version in applied else "pending"
+        click.echo(f"{known.version:>4}  {state:<8} {known.description}")
+
+
+@db_cli.command("unlock")
+def unlock_command():
+    """Release the migration lock left by an interrupted upgrade."""
+    from db.migrations import release_migration_lock
+
+    release_migration_lock(get_engine())
+    click.echo("Migration lock released.")
+
+
+def register_commands(app):
+    """
+    Add the command groups to the application's ``flask`` command.
+
+    Args:
+        app (Flask): The application.
+    """
+    app.cli.add_command(db_cli)
+    app.cli.add_command(guides_cli)
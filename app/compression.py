@@ -0,0 +1,187 @@
+"""
+WSGI middleware compressing responses on the fly.
+
+The encoding is negotiated from ``Accept-Encoding``: brotli when the optional
+``brotli`` package is installed and the client accepts it, otherwise gzip.
+Only the first ``COMPRESSION_MIN_SIZE`` bytes of a response are buffered to
+decide whether it is worth compressing; the rest is compressed as it streams.
+Streamed responses, which have no ``Content-Length``, are flushed after every
+chunk so the client receives each chunk as soon as it is produced.
+Responses that are already encoded, downloads sent as attachments, of a type
+not listed in ``COMPRESSION_MIMETYPES``, or marked ``no-transform`` pass
+through unchanged.
+"""
+
+import itertools
+import zlib
+
+from werkzeug.http import parse_accept_header, parse_options_header
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Choose the response encoding for an ``Accept-Encoding`` header.
+
+    Args:
+        accept_encoding (str | None): The request header.
+
+    Returns:
+        str | None: ``"br"``, ``"gzip"``, or None if neither is acceptable.
+    """
+    accepted = parse_accept_header(accept_encoding)
+    gzip_quality = accepted["gzip"]
+    brotli_quality = accepted["br"] if brotli is not None else 0
+    if brotli_quality and brotli_quality >= gzip_quality:
+        return "br"
+    if gzip_quality:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of the wrapped WSGI application.
+
+    Settings are read from ``config`` on every request, so they can be changed
+    at runtime:
+
+    - ``COMPRESSION_ENABLED``: whether to compress at all.
+    - ``COMPRESSION_MIN_SIZE``: smallest response body, in bytes, to compress.
+    - ``COMPRESSION_LEVEL``: gzip level from 1 (fastest) to 9 (smallest).
+    - ``COMPRESSION_BROTLI_QUALITY``: brotli quality from 0 to 11.
+    - ``COMPRESSION_MIMETYPES``: content types worth compressing.
+    """
+
+    def __init__(self, wsgi_app, config):
+        """
+        Args:
+            wsgi_app (Callable): The WSGI application to wrap.
+            config (Mapping): The application configuration.
+        """
+        self.wsgi_app = wsgi_app
+        self.config = config
+
+    def __call__(self, environ, start_response):
+        if (
+            not self.config["COMPRESSION_ENABLED"]
+            or environ["REQUEST_METHOD"] == "HEAD"
+        ):
+            return self.wsgi_app(environ, start_response)
+        encoding = negotiate_encoding(environ.get("HTTP_ACCEPT_ENCODING"))
+        if encoding is None:
+            return self.wsgi_app(environ, start_response)
+
+        started = []
+        chunks = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            started[:] = [status, headers, exc_info]
+            return chunks.append
+
+        app_iter = self.wsgi_app(environ, capture_start_response)
+        return self._respond(app_iter, started, chunks, encoding, start_response)
+
+    def _respond(self, app_iter, started, chunks, encoding, start_response):
+        min_size = self.config["COMPRESSION_MIN_SIZE"]
+        iterator = iter(app_iter)
+        try:
+            size = sum(len(chunk) for chunk in chunks)
+            if size < min_size:
+                for chunk in iterator:
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= min_size:
+                        break
+
+            status, headers, exc_info = started
+            if size < min_size or not self._compressible(status, headers):
+                start_response(status, headers, exc_info)
+                yield from chunks
+                yield from iterator
+                return
+
+            streamed = not any(name.lower() == "content-length" for name, _ in headers)
+            headers = self._compressed_headers(headers, encoding)
+            start_response(status, headers, exc_info)
+            if encoding == "br":
+                quality = self.config["COMPRESSION_BROTLI_QUALITY"]
+                compressor = _BrotliCompressor(quality)
+            else:
+                compressor = _GzipCompressor(self.config["COMPRESSION_LEVEL"])
+            for chunk in itertools.chain([b"".join(chunks)], iterator):
+                data = compressor.compress(chunk)
+                if streamed:
+                    data += compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+
+    def _compressible(self, status, headers):
+        if int(status.split(" ", 1)[0]) in (204, 206, 304):
+            return False
+        values = {name.lower(): value for name, value in headers}
+        if "content-encoding" in values:
+            return False
+        disposition = parse_options_header(values.get("content-disposition", ""))[0]
+        if disposition == "attachment":
+            return False
+        if "no-transform" in values.get("cache-control", ""):
+            return False
+        mimetype = parse_options_header(values.get("content-type", ""))[0]
+        return mimetype in self.config["COMPRESSION_MIMETYPES"]
+
+    @staticmethod
+    def _compressed_headers(headers, encoding):
+        compressed = [("Content-Encoding", encoding)]
+        vary = ["Accept-Encoding"]
+        for name, value in headers:
+            lowered = name.lower()
+            if lowered == "content-length":
+                continue
+            if lowered == "vary":
+                vary.insert(0, value)
+                continue
+            if lowered == "etag" and not value.startswith("W/"):
+                # The compressed body is a different representation.
+                value = "W/" + value
+            compressed.append((name, value))
+        if any("accept-encoding" in value.lower() for value in vary[:-1]):
+            vary.pop()
+        compressed.append(("Vary", ", ".join(vary)))
+        return compressed
@@ -1,49 +1,88 @@
 """
-This module sets up the Flask application, configures session settings,
-and initializes the login manager.
+Default configuration of the Flask application.
+
+``create_app`` loads ``Config`` first and then applies the configuration it is
+given, so any of these settings can be overridden per application.
 """
 
 from datetime import timedelta
-import logging
-
-from flask import Flask, session
-from flask_login import LoginManager
-
-from db import db_session, User
-
-
-app = Flask(
-    __name__, template_folder="frontend/templates", static_folder="frontend/static"
-)
-app.secret_key = "supersecretkey"
-app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=7)
-
-logging.basicConfig(level=logging.DEBUG)
-
-tokens = {}
+import os
 
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = "login"
 
-
-@login_manager.user_loader
-def load_user(user_id):
+class Config:
     """
-    Loads the user by ID for Flask-Login.
-
-    Args:
-        user_id (int): The user ID.
-
-    Returns:
-        User: The user object or None if not found.
+    Default settings; database settings come from ``db.DATABASE_CONFIG``.
     """
-    return db_session.query(User).get(int(user_id))
 
-
-@app.before_request
-def make_session_permanent():
-    """
-    Ensures that the session is marked as permanent before each request.
-    """
-    session.permanent = True
+    SECRET_KEY = "supersecretkey"
+    PERMANENT_SESSION_LIFETIME = timedelta(days=7)
+    GUIDES_PAGE_SIZE = 20
+    GUIDES_MAX_PAGE_SIZE = 100
+    ADMIN_USERNAMES = set(
+        filter(None, os.environ.get("ADMIN_USERNAMES", "").split(","))
+    )
+    TOKEN_STORE_BACKEND = "sqlite"  # "memory" for a single worker
+    TOKEN_TTL = PERMANENT_SESSION_LIFETIME.total_seconds()
+    TOKEN_STORE_MAX_ENTRIES = 10000
+    TOKEN_PURGE_BATCH_SIZE = 500
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_BACKEND = "memory"  # "sqlite" to share across workers
+    RATE_LIMITS = {
+        "login": {
+            "per_ip": "30/minute",
+            "per_identifier": "10/minute",
+            "identifier_field": "identifier",
+        },
+        "register": {
+            "per_ip": "10/minute",
+            "per_identifier": "5/minute",
+            "identifier_field": "email",
+        },
+    }
+    CACHE_CONTROL_POLICIES = {
+        "view_guide": "private, no-cache",
+        "help_other_games": "no-cache",
+    }
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_BACKEND = "memory"  # "disk" to share across workers
+    FRAGMENT_CACHE_SIZE = 1024
+    FRAGMENT_CACHE_TTL = 300
+    FRAGMENT_CACHE_DIR = os.path.join("cache", "fragments")
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 60
+    PASSWORD_HASH_METHOD = "scrypt:32768:8:1"
+    PASSWORD_HASH_WORKERS = None  # one per CPU; 0 hashes in-thread
+    PASSWORD_HASH_MAX_PENDING = 32
+    PASSWORD_HASH_QUEUE_TIMEOUT = 1.0
+    PASSWORD_HASH_TIMEOUT = 10.0
+    COMPRESSION_ENABLED = True
+    COMPRESSION_MIN_SIZE = 500
+    COMPRESSION_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 4
+    COMPRESSION_MIMETYPES = {
+        "text/html",
+        "text/css",
+        "text/plain",
+        "text/csv",
+        "text/javascript",
+        "application/javascript",
+        "application/json",
+        "application/xml",
+        "image/svg+xml",
+    }
+    LOG_LEVEL = "INFO"
+    LOG_FILE = os.environ.get("LOG_FILE", os.path.join("logs", "application.log"))
+    LOG_FILE_MAX_BYTES = 100000
+    LOG_FILE_BACKUP_COUNT = 1
+    LOG_QUEUE_SIZE = 10000
+    LOG_QUEUE_POLICY = "drop"  # "block" to wait for room instead
+    LOG_QUEUE_BLOCK_TIMEOUT = 1.0
+    LOG_SAMPLE_RATES = {"WARNING": 0.1}  # records logged with sampled=True
+    INSTRUMENTATION_ENABLED = False
+    INSTRUMENTATION_SERVER_TIMING = True
+    INSTRUMENTATION_SLOW_REQUEST_MS = 500
+    INSTRUMENTATION_SLOW_STATEMENTS = 5
+    INSTRUMENTATION_LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    METRICS_MULTIPROCESS_DIR = os.environ.get("METRICS_MULTIPROCESS_DIR")
+    METRICS_WRITE_INTERVAL = 5.0
@@ -0,0 +1,168 @@
+"""
+Services shared by the route modules, created per application.
+
+``init_extensions`` builds the services from the application's configuration
+and stores them in ``app.extensions``. The module-level names are proxies to
+the service of the current application, so route modules can import them
+before any application exists.
+"""
+
+from flask import current_app, session
+from flask_login import LoginManager
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from werkzeug.local import LocalProxy
+
+from db import build_database_services, db_session, User
+from .cache import TTLCache
+from .fragment_cache import (
+    FragmentCacheExtension,
+    build_fragment_cache,
+    register_invalidation,
+)
+from .hashing import PasswordHasher
+from .http_cache import apply_cache_policy
+from .instrumentation import Instrumentation
+from .metrics import init_metrics
+from .ratelimit import build_rate_limiter
+from .tokens import build_token_store
+
+
+def _extension(name):
+    return LocalProxy(lambda: current_app.extensions[name])
+
+
+tokens = _extension("tokens")
+password_hasher = _extension("password_hasher")
+rate_limiter = _extension("rate_limiter")
+fragment_cache = _extension("fragment_cache")
+user_cache = _extension("user_cache")
+instrumentation = _extension("instrumentation")
+metrics = _extension("metrics")
+usage_counter = LocalProxy(lambda: current_app.extensions["database"].usage_counter)
+leaderboard = LocalProxy(lambda: current_app.extensions["database"].leaderboard)
+
+login_manager = LoginManager()
+login_manager.login_view = "login"
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    """
+    Loads the user by ID for Flask-Login.
+
+    Column values of recently loaded users are cached, and a cache hit is
+    attached to the request's session without querying the database.
+
+    Args:
+        user_id (int): The user ID.
+
+    Returns:
+        User: The user object or None if not found.
+    """
+    user_id = int(user_id)
+    values = user_cache.get(user_id)
+    if values is not None:
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db_session.merge(user, load=False)
+
+    user = db_session.get(User, user_id)
+    if user is not None:
+        user_cache.set(
+            user_id,
+            {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs},
+        )
+    return user
+
+
+def invalidate_cached_user(user_id):
+    """
+    Removes a user from the user loader cache after their data changed.
+
+    Args:
+        user_id (int): The user ID.
+    """
+    user_cache.delete(int(user_id))
+
+
+def make_session_permanent():
+    """
+    Ensures that the session is marked as permanent before each request.
+    """
+    session.permanent = True
+
+
+def remove_db_session(exception=None):
+    """
+    Releases the scoped database session at the end of each application context,
+    returning its connection to the pool.
+    """
+    db_session.remove()
+
+
+def _register_metrics(app):
+    metrics = init_metrics(app, app.extensions["database"].engine)
+    services = app.extensions
+    for cache_name in ("user", "fragment"):
+        cache = services[f"{cache_name}_cache"]
+        metrics.add_counter(
+            "cache_hits_total",
+            lambda cache=cache: cache.stats()["hits"],
+            cache=cache_name,
+        )
+        metrics.add_counter(
+            "cache_misses_total",
+            lambda cache=cache: cache.stats()["misses"],
+            cache=cache_name,
+        )
+    metrics.add_gauge(
+        "session_tokens_active",
+        services["tokens"].__len__,
+        shared=app.config["TOKEN_STORE_BACKEND"] == "sqlite",
+    )
+    metrics.add_gauge(
+        "password_hash_queue_depth", lambda: services["password_hasher"].queue_depth
+    )
+    metrics.add_counter(
+        "log_records_dropped_total",
+        lambda: services["log_queue_handler"].dropped,
+    )
+
+
+def init_extensions(app):
+    """
+    Create the application's services and install their request hooks.
+
+    Args:
+        app (Flask): The application; its configuration must be loaded.
+    """
+    config = app.config
+    database = build_database_services(config)
+    app.extensions["database"] = database
+    app.extensions["tokens"] = build_token_store(config, database.engine)
+    app.extensions["password_hasher"] = PasswordHasher(
+        config["PASSWORD_HASH_METHOD"],
+        max_workers=config["PASSWORD_HASH_WORKERS"],
+        max_pending=config["PASSWORD_HASH_MAX_PENDING"],
+        queue_timeout=config["PASSWORD_HASH_QUEUE_TIMEOUT"],
+        timeout=config["PASSWORD_HASH_TIMEOUT"],
+    )
+    app.extensions["rate_limiter"] = build_rate_limiter(config, database.engine)
+    app.extensions["user_cache"] = TTLCache(
+        maxsize=config["USER_CACHE_SIZE"], ttl=config["USER_CACHE_TTL"]
+    )
+
+    cache = build_fragment_cache(config)
+    register_invalidation(cache)
+    app.extensions["fragment_cache"] = cache
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = cache
+
+    Instrumentation(app, database.engine)
+    _register_metrics(app)
+    login_manager.init_app(app)
+
+    app.before_request(make_session_permanent)
+    app.after_request(apply_cache_policy)
+    app.teardown_appcontext(remove_db_session)
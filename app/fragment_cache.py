@@ -0,0 +1,253 @@
+"""
+Caching of rendered template fragments with model-driven invalidation.
+
+Templates wrap expensive parts in ``{% cache key, ttl %} ... {% endcache %}``.
+Keys are colon-separated, e.g. ``"guide:5"`` or ``"help_other:0:20"``, and are
+invalidated by prefix: invalidating ``"guide:5"`` removes ``"guide:5"`` and
+``"guide:5:..."`` but not ``"guide:50"``.
+
+Writes to ``Guide`` and ``Game`` record the affected prefixes on the session,
+and they are invalidated once that session commits, so a page rendered between
+the flush and the commit cannot put stale content back into the cache.
+"""
+
+import os
+import pickle
+import tempfile
+import threading
+import time
+import weakref
+from urllib.parse import quote, unquote
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from db import Game, Guide
+from .cache import TTLCache
+
+
+def _matches(key, prefix):
+    return key == prefix or key.startswith(prefix + ":")
+
+
+class MemoryFragmentBackend:
+    """
+    Fragments kept in a bounded in-process LRU cache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._cache.set(key, value, ttl)
+
+    def invalidate(self, prefix):
+        self._cache.delete_matching(lambda key: _matches(key, prefix))
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class DiskFragmentBackend:
+    """
+    Fragments stored as files in a directory, shared by all worker processes.
+
+    Each fragment is one file named after its percent-encoded key and holding
+    its expiry time and content. Files are replaced atomically.
+    """
+
+    def __init__(self, directory, ttl=300.0):
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, quote(key, safe=""))
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as file:
+                expires_at, value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        if expires_at <= time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=".")
+        with os.fdopen(descriptor, "wb") as file:
+            pickle.dump((expires_at, value), file)
+        os.replace(temporary_path, self._path(key))
+
+    def invalidate(self, prefix):
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("."):
+                continue
+            if _matches(unquote(entry.name), prefix):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        size = sum(
+            1 for entry in os.scandir(self.directory) if not entry.name.startswith(".")
+        )
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+class FragmentCache:
+    """
+    Front of a fragment backend that can be switched off through configuration.
+    """
+
+    def __init__(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+
+    def get(self, key):
+        return self.backend.get(key) if self.enabled else None
+
+    def set(self, key, value, ttl=None):
+        if self.enabled:
+            self.backend.set(key, value, ttl)
+
+    def invalidate(self, *prefixes):
+        """
+        Remove the fragments whose keys equal or start with any of ``prefixes``.
+        """
+        for prefix in prefixes:
+            self.backend.invalidate(prefix)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja extension adding the ``{% cache key[, ttl] %}...{% endcache %}`` tag.
+
+    The cache used is ``environment.fragment_cache``.
+    """
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        ttl = nodes.Const(None)
+        if parser.stream.skip_if("comma"):
+            ttl = parser.parse_expression()
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render_cached", [key, ttl]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key, ttl, caller):
+        cache = self.environment.fragment_cache
+        fragment = cache.get(str(key))
+        if fragment is None:
+            fragment = str(caller())
+            cache.set(str(key), fragment, ttl)
+        return Markup(fragment)
+
+
+def build_fragment_cache(config):
+    """
+    Create the fragment cache selected by ``FRAGMENT_CACHE_BACKEND``.
+
+    Args:
+        config (Mapping): The application configuration.
+
+    Returns:
+        FragmentCache: A cache over a ``"memory"`` or ``"disk"`` backend.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    backend = config["FRAGMENT_CACHE_BACKEND"]
+    ttl = config["FRAGMENT_CACHE_TTL"]
+    if backend == "memory":
+        store = MemoryFragmentBackend(
+            maxsize=config["FRAGMENT_CACHE_SIZE"], ttl=ttl
+        )
+    elif backend == "disk":
+        store = DiskFragmentBackend(config["FRAGMENT_CACHE_DIR"], ttl=ttl)
+    else:
+        raise ValueError(f"Unknown fragment cache backend: {backend}")
+    return FragmentCache(store, enabled=config["FRAGMENT_CACHE_ENABLED"])
+
+
+_invalidated_caches = []
+_registration_lock = threading.Lock()
+
+
+def _invalidate_all(prefixes):
+    for reference in _invalidated_caches:
+        cache = reference()
+        if cache is not None:
+            cache.invalidate(*prefixes)
+
+
+def register_invalidation(fragment_cache):
+    """
+    Invalidate fragments showing ``Guide`` or ``Game`` rows when they change.
+
+    All applications of the process share the database, so a commit
+    invalidates the caches of all of them. The listeners are installed with
+    the first cache; caches are held by weak reference.
+
+    Args:
+        fragment_cache (FragmentCache): The cache to invalidate.
+    """
+    global _invalidated_caches
+    with _registration_lock:
+        if not _invalidated_caches:
+            _install_invalidation_listeners()
+        # Copied on write, so commits can iterate the list without the lock.
+        _invalidated_caches = [
+            reference for reference in _invalidated_caches if reference() is not None
+        ] + [weakref.ref(fragment_cache)]
+
+
+def _install_invalidation_listeners():
+    def record(prefixes, target):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault("fragment_invalidations", set()).update(prefixes)
+
+    @event.listens_for(Guide, "after_insert")
+    @event.listens_for(Guide, "after_update")
+    @event.listens_for(Guide, "after_delete")
+    def guide_changed(mapper, connection, target):
+        record({f"guide:{target.id}", "games", "help_other"}, target)
+
+    @event.listens_for(Game, "after_insert")
+    @event.listens_for(Game, "after_update")
+    @event.listens_for(Game, "after_delete")
+    def game_changed(mapper, connection, target):
+        # Guide pages show the game name, so all of them may be affected.
+        record({"guide", "games", "help_other"}, target)
+
+    @event.listens_for(Session, "after_commit")
+    def invalidate_committed(session):
+        prefixes = session.info.pop("fragment_invalidations", None)
+        if prefixes:
+            _invalidate_all(prefixes)
+
+    @event.listens_for(Session, "after_rollback")
+    def discard_rolled_back(session):
+        session.info.pop("fragment_invalidations", None)
@@ -0,0 +1,160 @@
+"""
+Password hashing offloaded to a bounded pool of worker processes.
+
+Hashing is CPU-bound by design, so running it in request threads lets a burst of
+logins starve every other request. The hasher runs it in separate processes,
+limits how many hashes may be queued, and rejects work beyond that limit
+instead of letting requests pile up.
+"""
+
+import atexit
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusyError(Exception):
+    """
+    Raised when the hashing pool is saturated and cannot accept more work.
+    """
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a bounded ``ProcessPoolExecutor``.
+    """
+
+    def __init__(
+        self, method, max_workers=None, max_pending=32, queue_timeout=1.0, timeout=10.0
+    ):
+        """
+        Args:
+            method (str): Werkzeug hash method, e.g. ``"scrypt:32768:8:1"`` or
+                          ``"pbkdf2:sha256:600000"``.
+            max_workers (int): Worker processes, defaults to the number of CPUs;
+                               0 hashes in the calling thread.
+            max_pending (int): Hashes allowed to wait for a worker before new
+                               requests are rejected.
+            queue_timeout (float): Seconds to wait for a free slot before rejecting.
+            timeout (float): Seconds to wait for the result of a hash.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.method = method
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_workers + max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+
+    @property
+    def queue_depth(self):
+        """
+        Number of hashes currently running or waiting for a worker.
+        """
+        return self._queued
+
+    def hash_password(self, password):
+        """
+        Hash a password with the configured method.
+
+        Raises:
+            HashingBusyError: If the pool is saturated.
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify_password(self, password_hash, password):
+        """
+        Check a password against a stored hash.
+
+        Raises:
+            HashingBusyError: If the pool is saturated.
+        """
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        Check whether a stored hash was made with other parameters than configured.
+        """
+        return password_hash.split("$", 1)[0] != self.method
+
+    def set_password(self, user, password):
+        """
+        Store the hash of ``password`` on ``user``.
+        """
+        user.password_hash = self.hash_password(password)
+
+    def check_password(self, user, password):
+        """
+        Verify the password of ``user``, upgrading an outdated hash in place.
+
+        When the hash parameters changed since the password was stored, the new
+        hash is set on ``user``; the caller commits it with the login.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        if not self.verify_password(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            self.set_password(user, password)
+        return True
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, func, *args):
+        if self.max_workers == 0:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusyError("Password hashing pool is saturated")
+        with self._queued_lock:
+            self._queued += 1
+        try:
+            return self._get_executor().submit(func, *args).result(self.timeout)
+        except FutureTimeoutError as error:
+            raise HashingBusyError("Password hashing timed out") from error
+        finally:
+            with self._queued_lock:
+                self._queued -= 1
+            self._slots.release()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # Imported on the first hash: most processes never start a pool.
+                from concurrent.futures import ProcessPoolExecutor
+
+                # Forking would copy the app's background threads (the usage
+                # counter flusher, the log listener) and their held locks into
+                # the workers, so they start from a clean interpreter instead.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=_worker_context()
+                )
+                atexit.register(self.shutdown)
+            return self._executor
+
+
+def _worker_context():
+    """
+    Pick a multiprocessing context that does not fork the running app.
+
+    Returns:
+        BaseContext: The ``forkserver`` context where available, else ``spawn``.
+    """
+    import multiprocessing
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
@@ -0,0 +1,95 @@
+"""
+Conditional GET support and Cache-Control policies for rendered pages.
+
+Routes compute a weak ETag and a Last-Modified time from the ``updated_at``
+columns of the rows they show. When the client's ``If-None-Match`` or
+``If-Modified-Since`` header still matches, a 304 response is returned before
+any template is rendered.
+"""
+
+import hashlib
+from datetime import timezone
+
+from flask import Response, current_app, request, session
+
+
+def page_validators(*parts, timestamps=()):
+    """
+    Build the validators of a page.
+
+    The login state is part of the ETag because the page layout differs for
+    logged-in users.
+
+    Args:
+        *parts: Values identifying the page content, e.g. guide IDs.
+        timestamps (Iterable[datetime]): Modification times of the shown rows;
+                                         None values are ignored.
+
+    Returns:
+        tuple[str, datetime | None]: The ETag value and the Last-Modified time.
+    """
+    known = [timestamp for timestamp in timestamps if timestamp is not None]
+    last_modified = max(known).replace(tzinfo=timezone.utc) if known else None
+    key = "|".join(
+        str(part)
+        for part in (
+            *parts,
+            last_modified.isoformat() if last_modified else "",
+            bool(session.get("logged_in")),
+        )
+    )
+    return hashlib.sha1(key.encode()).hexdigest(), last_modified
+
+
+def not_modified(etag, last_modified):
+    """
+    Return a 304 response if the client's cached copy is still current.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``, as required by
+    RFC 9110.
+
+    Args:
+        etag (str): The current weak ETag value.
+        last_modified (datetime | None): The current Last-Modified time.
+
+    Returns:
+        Response | None: The 304 response, or None if the page must be rendered.
+    """
+    if request.if_none_match:
+        matches = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        matches = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        matches = False
+
+    if not matches:
+        return None
+    return with_validators(Response(status=304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified):
+    """
+    Set the ETag and Last-Modified headers on a response.
+    """
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def apply_cache_policy(response):
+    """
+    Set the Cache-Control policy configured for the request's endpoint.
+
+    Policies come from ``CACHE_CONTROL_POLICIES`` and only apply to successful and
+    304 responses that do not set Cache-Control themselves.
+    """
+    policy = current_app.config["CACHE_CONTROL_POLICIES"].get(request.endpoint)
+    if (
+        policy
+        and response.status_code in (200, 304)
+        and "Cache-Control" not in response.headers
+    ):
+        response.headers["Cache-Control"] = policy
+        response.vary.add("Cookie")
+    return response
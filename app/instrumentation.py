@@ -0,0 +1,238 @@
+"""
+Opt-in request timing and SQL profiling.
+
+When ``INSTRUMENTATION_ENABLED`` is set, every request records its latency in a
+per-endpoint histogram, and SQLAlchemy cursor events count the statements it
+executes and the time spent in them. The totals are returned in a
+``Server-Timing`` header, and requests slower than
+``INSTRUMENTATION_SLOW_REQUEST_MS`` are logged with their slowest statements.
+
+When it is switched off, no SQLAlchemy listeners are installed and the request
+hooks return immediately.
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+
+class LatencyHistogram:
+    """
+    Thread-safe histogram of durations in milliseconds.
+
+    Args:
+        buckets (Sequence[float]): Ascending upper bounds of the buckets; an
+                                   implicit last bucket holds larger values.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: The bucket bounds, per-bucket counts, count and sum.
+        """
+        with self._lock:
+            return {
+                "buckets": self.buckets,
+                "counts": list(self.counts),
+                "count": self.count,
+                "sum": self.total,
+            }
+
+
+class RequestProfile:
+    """
+    Timing of one request and the SQL statements it executed.
+    """
+
+    __slots__ = ("start", "queries", "query_time", "slowest", "max_statements")
+
+    def __init__(self, max_statements):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.slowest = []
+        self.max_statements = max_statements
+
+    def record_query(self, statement, duration):
+        self.queries += 1
+        self.query_time += duration
+        entry = (duration, self.queries, statement)
+        if len(self.slowest) < self.max_statements:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def slowest_statements(self):
+        """
+        Returns:
+            list[tuple[float, str]]: Durations in milliseconds and statements,
+            slowest first.
+        """
+        return [
+            (round(duration * 1000, 3), statement)
+            for duration, _, statement in sorted(self.slowest, reverse=True)
+        ]
+
+
+class Instrumentation:
+    """
+    Request and SQL instrumentation of an application.
+
+    The SQL listeners find the request through ``flask.g``, so one pair per
+    engine serves every application; it is installed while at least one of
+    them is enabled.
+
+    Args:
+        app (Flask): The application.
+        engine (Engine): The engine whose statements are profiled.
+    """
+
+    _enabled_counts = {}
+    _listeners_lock = threading.Lock()
+
+    def __init__(self, app, engine):
+        self.app = app
+        self.engine = engine
+        self.enabled = False
+        self.histograms = {}
+        self.query_counts = {}
+        self._lock = threading.Lock()
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions["instrumentation"] = self
+        if app.config["INSTRUMENTATION_ENABLED"]:
+            self.enable()
+
+    def enable(self):
+        """
+        Start recording requests and installing the SQL listeners.
+        """
+        if self.enabled:
+            return
+        with self._listeners_lock:
+            count = self._enabled_counts.get(self.engine, 0)
+            if not count:
+                event.listen(self.engine, "before_cursor_execute", self._before_cursor)
+                event.listen(self.engine, "after_cursor_execute", self._after_cursor)
+            self._enabled_counts[self.engine] = count + 1
+            self.enabled = True
+
+    def disable(self):
+        """
+        Stop recording, and remove the SQL listeners if no other application
+        uses them.
+        """
+        if not self.enabled:
+            return
+        with self._listeners_lock:
+            count = self._enabled_counts.pop(self.engine) - 1
+            if count:
+                self._enabled_counts[self.engine] = count
+            else:
+                event.remove(self.engine, "before_cursor_execute", self._before_cursor)
+                event.remove(self.engine, "after_cursor_execute", self._after_cursor)
+            self.enabled = False
+
+    def histogram(self, endpoint):
+        """
+        Return the latency histogram of ``endpoint``, creating it if needed.
+        """
+        histogram = self.histograms.get(endpoint)
+        if histogram is None:
+            buckets = self.app.config["INSTRUMENTATION_LATENCY_BUCKETS"]
+            with self._lock:
+                histogram = self.histograms.setdefault(
+                    endpoint, LatencyHistogram(buckets)
+                )
+        return histogram
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Per endpoint, the latency histogram and the number of queries.
+        """
+        return {
+            endpoint: {
+                "latency_ms": histogram.snapshot(),
+                "queries": self.query_counts.get(endpoint, 0),
+            }
+            for endpoint, histogram in list(self.histograms.items())
+        }
+
+    @staticmethod
+    def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        if has_app_context():
+            profile = g.get("_request_profile")
+            if profile is not None:
+                profile.record_query(statement, duration)
+
+    def _start_request(self):
+        if self.enabled:
+            g._request_profile = RequestProfile(
+                self.app.config["INSTRUMENTATION_SLOW_STATEMENTS"]
+            )
+
+    def _finish_request(self, response):
+        profile = g.pop("_request_profile", None)
+        if profile is None:
+            return response
+
+        config = self.app.config
+        duration = (time.perf_counter() - profile.start) * 1000
+        query_time = profile.query_time * 1000
+        endpoint = request.endpoint or "unmatched"
+        self.histogram(endpoint).observe(duration)
+        with self._lock:
+            self.query_counts[endpoint] = (
+                self.query_counts.get(endpoint, 0) + profile.queries
+            )
+
+        if config["INSTRUMENTATION_SERVER_TIMING"]:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={query_time:.2f};desc="{profile.queries} queries", '
+                f"app;dur={duration - query_time:.2f}, "
+                f"total;dur={duration:.2f}",
+            )
+        if duration >= config["INSTRUMENTATION_SLOW_REQUEST_MS"]:
+            self.app.logger.warning(
+                "Slow request to %s took %.1f ms with %d queries.",
+                endpoint,
+                duration,
+                profile.queries,
+                extra={
+                    "endpoint": endpoint,
+                    "duration_ms": round(duration, 3),
+                    "queries": profile.queries,
+                    "query_ms": round(query_time, 3),
+                    "slowest_statements": profile.slowest_statements(),
+                },
+            )
+        return response
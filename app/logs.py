@@ -0,0 +1,185 @@
+"""
+Non-blocking logging through a bounded queue.
+
+Request threads only put records on a queue; a ``QueueListener`` thread
+formats them as JSON lines and does the file I/O, rotation included. When the
+queue is full, records are dropped (and counted) or the caller blocks for a
+bounded time, depending on ``LOG_QUEUE_POLICY``.
+
+Noisy paths, such as invalid logins, pass ``extra={"sampled": True}`` and are
+then only kept at the rate configured for their level in ``LOG_SAMPLE_RATES``.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask.logging import default_handler
+
+
+# Attributes of every LogRecord; anything else was passed through ``extra``.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Format records as single-line JSON objects.
+
+    Values passed through ``extra`` are included as additional keys.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records marked with ``sampled=True``.
+
+    Args:
+        rates (Mapping[str, float]): Fraction kept per level name, e.g.
+                                     ``{"WARNING": 0.1}``. Levels not listed
+                                     are kept in full.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {
+            logging.getLevelName(level.upper()): rate for level, rate in rates.items()
+        }
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False):
+            return True
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0:
+            return True
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Queue handler that drops records or blocks briefly when the queue is full.
+
+    Args:
+        log_queue (queue.Queue): A bounded queue.
+        policy (str): ``"drop"`` to discard records when the queue is full, or
+                      ``"block"`` to wait up to ``timeout`` seconds first.
+        timeout (float): Longest wait of the ``"block"`` policy.
+    """
+
+    def __init__(self, log_queue, policy="drop", timeout=1.0):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown log queue policy: {policy}")
+        super().__init__(log_queue)
+        self.policy = policy
+        self.timeout = timeout
+        self.dropped = 0
+        self.listener = None
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Only merge the arguments here; formatting happens on the listener
+        # thread. Exception info is kept for the listener to format.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+def configure_logging(app):
+    """
+    Route the application's and libraries' logging through a bounded queue.
+
+    Records are written as JSON lines to ``LOG_FILE`` and as plain text to
+    stderr by a listener thread that is stopped, after draining the queue, at
+    interpreter exit. Configuring another application replaces the handler
+    and listener installed for the previous one.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        QueueListener: The started listener.
+    """
+    config = app.config
+    log_directory = os.path.dirname(config["LOG_FILE"])
+    if log_directory:
+        try:
+            os.makedirs(log_directory, exist_ok=True)
+        except OSError as e:
+            raise RuntimeError(f"Failed to create log directory: {e}") from e
+
+    file_handler = RotatingFileHandler(
+        config["LOG_FILE"],
+        maxBytes=config["LOG_FILE_MAX_BYTES"],
+        backupCount=config["LOG_FILE_BACKUP_COUNT"],
+    )
+    file_handler.setFormatter(JSONFormatter())
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+
+    queue_handler = BoundedQueueHandler(
+        queue.Queue(maxsize=config["LOG_QUEUE_SIZE"]),
+        policy=config["LOG_QUEUE_POLICY"],
+        timeout=config["LOG_QUEUE_BLOCK_TIMEOUT"],
+    )
+    queue_handler.addFilter(SamplingFilter(config["LOG_SAMPLE_RATES"]))
+    listener = QueueListener(
+        queue_handler.queue,
+        file_handler,
+        console_handler,
+        respect_handler_level=True,
+    )
+
+    root = logging.getLogger()
+    root.setLevel(config["LOG_LEVEL"])
+    for handler in root.handlers[:]:
+        if isinstance(handler, BoundedQueueHandler):
+            root.removeHandler(handler)
+            if handler.listener is not None:
+                atexit.unregister(handler.listener.stop)
+                handler.listener.stop()
+    queue_handler.listener = listener
+    root.addHandler(queue_handler)
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(config["LOG_LEVEL"])
+
+    listener.start()
+    atexit.register(listener.stop)
+    app.extensions["log_queue_handler"] = queue_handler
+    return listener
@@ -0,0 +1,566 @@
+"""
+Application metrics in the Prometheus text exposition format.
+
+Counters and histograms are kept in process memory behind a single
+uncontended lock. Gauges such as the password hash queue depth, and counters
+kept by other objects such as cache hits, are read from their sources when
+metrics are collected.
+
+With several worker processes, set ``METRICS_MULTIPROCESS_DIR`` to a directory
+shared by the workers. Every process then writes a snapshot of its metrics to
+its own file there, at most every ``METRICS_WRITE_INTERVAL`` seconds and on
+exit, and ``/metrics`` adds up the snapshots of all processes. Counters of
+exited processes are kept, so totals never decrease; their gauges are ignored.
+Snapshot files are named after the process ID and a random token, so a new
+process reusing an ID never overwrites an old file. When a process starts or
+exits, the snapshots of exited processes are folded into a single
+``metrics-retired.json`` file and deleted.
+"""
+
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from flask import g, request
+from sqlalchemy import event
+
+from .instrumentation import LatencyHistogram
+
+
+_LATENCY_METRIC = "http_request_duration_seconds"
+_WAIT_METRIC = "db_pool_checkout_wait_seconds"
+_HOLD_METRIC = "db_pool_connection_hold_seconds"
+
+_RETIRED_SNAPSHOT = "metrics-retired.json"
+
+# Snapshot files written in this process, as (pid, file name); a process may
+# hold several registries, e.g. one per application.
+_local_snapshots = set()
+
+_DESCRIPTIONS = {
+    "http_requests_total": ("counter", "Requests handled."),
+    _LATENCY_METRIC: ("histogram", "Time spent handling requests."),
+    "db_pool_checkouts_total": ("counter", "Connections checked out of the pool."),
+    _WAIT_METRIC: ("histogram", "Time spent waiting for a pooled connection."),
+    _HOLD_METRIC: ("histogram", "Time connections stay checked out."),
+    "db_pool_checked_out": ("gauge", "Connections currently checked out."),
+    "cache_hits_total": ("counter", "Cache lookups that found an entry."),
+    "cache_misses_total": ("counter", "Cache lookups that found no entry."),
+    "cache_hit_ratio": ("gauge", "Share of cache lookups that found an entry."),
+    "session_tokens_active": ("gauge", "Unexpired session tokens."),
+    "password_hash_queue_depth": ("gauge", "Password hashes running or waiting."),
+    "log_records_dropped_total": ("counter", "Log records dropped on a full queue."),
+}
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    Registry of counters, histograms and gauges.
+
+    Args:
+        buckets (Sequence[float]): Upper bounds, in seconds, of histogram buckets.
+        multiprocess_dir (str | None): Directory shared by all worker processes,
+                                       or None for single-process metrics.
+        write_interval (float): Minimum seconds between snapshot writes.
+    """
+
+    def __init__(self, buckets, multiprocess_dir=None, write_interval=5.0):
+        self.buckets = tuple(buckets)
+        self.multiprocess_dir = multiprocess_dir
+        self.write_interval = write_interval
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = []
+        self._shared_gauges = []
+        self._counter_callbacks = []
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        self._snapshot_pid = None
+        self._snapshot_file = None
+        if multiprocess_dir:
+            os.makedirs(multiprocess_dir, exist_ok=True)
+            atexit.register(self.close)
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Add ``amount`` to a counter.
+        """
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """
+        Record a value in a histogram.
+        """
+        key = (name, _labels_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    key, LatencyHistogram(self.buckets)
+                )
+        histogram.observe(value)
+
+    def add_gauge(self, name, callback, shared=False, **labels):
+        """
+        Register a gauge whose value is read from ``callback`` on collection.
+
+        Args:
+            name (str): The metric name.
+            callback (Callable[[], float]): Returns the current value.
+            shared (bool): Whether the value is the same in all processes, e.g.
+                           a row count, so it is read once instead of summed.
+            **labels: Labels of the metric.
+        """
+        gauges = self._shared_gauges if shared else self._gauges
+        gauges.append((name, _labels_key(labels), callback))
+
+    def add_counter(self, name, callback, **labels):
+        """
+        Register a counter kept by another object, read from ``callback``.
+        """
+        self._counter_callbacks.append((name, _labels_key(labels), callback))
+
+    @staticmethod
+    def _read(callbacks):
+        values = []
+        for name, labels, callback in callbacks:
+            try:
+                values.append([name, labels, callback()])
+            except Exception:  # A failing source must not break the endpoint.
+                continue
+        return values
+
+    def snapshot(self):
+        """
+        Collect the current values of this process.
+
+        Returns:
+            dict: JSON-serializable counters, histograms and gauges.
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+        return {
+            "pid": os.getpid(),
+            "counters": [[name, labels, value] for (name, labels), value in counters]
+            + self._read(self._counter_callbacks),
+            "histograms": [
+                [name, labels, histogram.snapshot()]
+                for (name, labels), histogram in histograms
+            ],
+            "gauges": self._read(self._gauges),
+        }
+
+    def _snapshot_path(self):
+        # The registry may be created before the server forks its workers, so
+        # the file is chosen per process, on its first write.
+        pid = os.getpid()
+        started = self._snapshot_pid != pid
+        if started:
+            self._snapshot_pid = pid
+            self._snapshot_file = f"metrics-{pid}-{uuid.uuid4().hex}.json"
+            _local_snapshots.add((pid, self._snapshot_file))
+        return os.path.join(self.multiprocess_dir, self._snapshot_file), started
+
+    def write_snapshot(self):
+        """
+        Write this process's snapshot to the multiprocess directory.
+
+        The first write of a process also retires the snapshots of exited
+        processes.
+        """
+        if not self.multiprocess_dir:
+            return
+        self._last_write = time.monotonic()
+        path, started = self._snapshot_path()
+        _write_json(self.multiprocess_dir, path, self.snapshot())
+        if started:
+            self.retire_snapshots()
+
+    def close(self):
+        """
+        Write the final snapshot of this process and retire it.
+        """
+        if not self.multiprocess_dir:
+            return
+        self.write_snapshot()
+        _local_snapshots.discard((self._snapshot_pid, self._snapshot_file))
+        self.retire_snapshots()
+
+    def retire_snapshots(self):
+        """
+        Fold the snapshots of exited processes into the retired totals.
+
+        Counters and histograms are added to ``metrics-retired.json`` and the
+        snapshot files deleted, under an exclusive lock on the directory. The
+        names of the folded files are kept until the next run, so a file left
+        behind by an interrupted run is deleted rather than counted twice.
+        Without ``fcntl`` the files are left in place.
+        """
+        if not self.multiprocess_dir or fcntl is None:
+            return
+        with _directory_lock(self.multiprocess_dir):
+            retired_path = os.path.join(self.multiprocess_dir, _RETIRED_SNAPSHOT)
+            retired = _read_json(retired_path) or {}
+            for name in retired.get("folded", []):
+                try:
+                    os.remove(os.path.join(self.multiprocess_dir, name))
+                except FileNotFoundError:
+                    pass
+            snapshots = {
+                path: _read_json(path) for path in self._dead_snapshot_paths()
+            }
+            paths = [path for path, snapshot in snapshots.items() if snapshot]
+            if not paths:
+                return
+            snapshots = [snapshots[path] for path in paths]
+            counters, histograms, _ = _merge([retired, *snapshots])
+            _write_json(
+                self.multiprocess_dir,
+                retired_path,
+                {
+                    "pid": None,
+                    "counters": [
+                        [name, labels, value]
+                        for (name, labels), value in counters.items()
+                    ],
+                    "histograms": [
+                        [name, labels, value]
+                        for (name, labels), value in histograms.items()
+                    ],
+                    "gauges": [],
+                    "folded": [os.path.basename(path) for path in paths],
+                },
+            )
+            for path in paths:
+                os.remove(path)
+
+    def maybe_write_snapshot(self):
+        """
+        Write the snapshot if ``write_interval`` has passed since the last one.
+        """
+        if (
+            self.multiprocess_dir
+            and time.monotonic() - self._last_write >= self.write_interval
+        ):
+            self.write_snapshot()
+
+    def _snapshot_paths(self):
+        paths = glob.glob(os.path.join(self.multiprocess_dir, "metrics-*.json"))
+        return [path for path in paths if not path.endswith(_RETIRED_SNAPSHOT)]
+
+    def _dead_snapshot_paths(self):
+        # A process ID may be reused, so of another process only its latest
+        # file is live; the files of this process are known.
+        current = os.getpid()
+        latest = {}
+        dead = []
+        for path in self._snapshot_paths():
+            name = os.path.basename(path)
+            try:
+                pid = int(name.split("-")[1].split(".")[0])
+                modified = os.path.getmtime(path)
+            except (ValueError, OSError):
+                continue
+            if pid == current:
+                if (pid, name) not in _local_snapshots:
+                    dead.append(path)
+            elif pid not in latest or modified > latest[pid][0]:
+                if pid in latest:
+                    dead.append(latest[pid][1])
+                latest[pid] = (modified, path)
+            else:
+                dead.append(path)
+        dead.extend(
+            path for pid, (_, path) in latest.items() if not _process_alive(pid)
+        )
+        return dead
+
+    def _snapshots(self):
+        if not self.multiprocess_dir:
+            return [self.snapshot()]
+        self.write_snapshot()
+        snapshots = []
+        # Retiring moves counts between files; read them all in one state.
+        with _directory_lock(self.multiprocess_dir, shared=True):
+            dead = set(self._dead_snapshot_paths())
+            pattern = os.path.join(self.multiprocess_dir, "metrics-*.json")
+            for path in glob.glob(pattern):
+                snapshot = _read_json(path)
+                if snapshot is None:
+                    continue
+                if path in dead or snapshot["pid"] is None:
+                    snapshot["gauges"] = []
+                snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """
+        Render the metrics of all processes in the Prometheus text format.
+
+        Returns:
+            str: The exposition text.
+        """
+        counters, histograms, gauges = _merge(self._snapshots())
+        for name, labels, value in self._read(self._shared_gauges):
+            gauges[(name, labels)] = gauges.get((name, labels), 0) + value
+
+        # Ratios cannot be summed across processes, so derive them here.
+        for (name, labels), hits in list(counters.items()):
+            if name == "cache_hits_total":
+                misses = counters.get(("cache_misses_total", labels), 0)
+                if hits + misses:
+                    gauges[("cache_hit_ratio", labels)] = hits / (hits + misses)
+
+        lines = []
+        for values in (counters, gauges, histograms):
+            for name in sorted({name for name, _ in values}):
+                metric_type, description = _DESCRIPTIONS.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for (metric, labels), value in sorted(values.items()):
+                    if metric != name:
+                        continue
+                    if values is histograms:
+                        lines.extend(_histogram_lines(name, labels, value))
+                    else:
+                        lines.append(
+                            f"{name}{_format_labels(labels)} {_format_value(value)}"
+                        )
+        return "\n".join(lines) + "\n"
+
+
+def _merge(snapshots):
+    counters, histograms, gauges = {}, {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get("counters", []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in snapshot.get("gauges", []):
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+        for name, labels, value in snapshot.get("histograms", []):
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(
+                key,
+                {
+                    "buckets": value["buckets"],
+                    "counts": [0] * len(value["counts"]),
+                    "count": 0,
+                    "sum": 0.0,
+                },
+            )
+            total["counts"] = [a + b for a, b in zip(total["counts"], value["counts"])]
+            total["count"] += value["count"]
+            total["sum"] += value["sum"]
+    return counters, histograms, gauges
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(directory, path, data):
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=".")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temporary_path, path)
+
+
+@contextmanager
+def _directory_lock(directory, shared=False):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _histogram_lines(name, labels, histogram):
+    cumulative = 0
+    bounds = [*map(_format_value, map(float, histogram["buckets"])), "+Inf"]
+    for bound, count in zip(bounds, histogram["counts"]):
+        cumulative += count
+        bucket_labels = _format_labels((*labels, ("le", bound)))
+        yield f"{name}_bucket{bucket_labels} {cumulative}"
+    yield f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}"
+    yield f"{name}_count{_format_labels(labels)} {histogram['count']}"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_pool_registries = weakref.WeakKeyDictionary()
+_pool_lock = threading.Lock()
+
+
+def _each_registry(pool):
+    for reference in _pool_registries.get(pool, ()):
+        metrics = reference()
+        if metrics is not None:
+            yield metrics
+
+
+def instrument_pool(metrics, engine):
+    """
+    Record connection checkouts, the time spent waiting for them and how long
+    connections stay checked out.
+
+    SQLAlchemy has no event before a checkout starts, so the wait is measured
+    by wrapping the pool's ``connect``. The pool is instrumented once, however
+    many applications share it, and records into the registry of each of them;
+    registries are held by weak reference.
+
+    Args:
+        metrics (Metrics): The registry to record in.
+        engine (Engine): The engine whose pool is instrumented.
+    """
+    pool = engine.pool
+    with _pool_lock:
+        references = _pool_registries.get(pool)
+        if references is None:
+            _install_pool_listeners(pool)
+            references = []
+        # Copied on write, so checkouts can iterate the list without the lock.
+        _pool_registries[pool] = [
+            reference for reference in references if reference() is not None
+        ] + [weakref.ref(metrics)]
+
+    if hasattr(pool, "checkedout"):
+        metrics.add_gauge("db_pool_checked_out", pool.checkedout)
+
+
+def _install_pool_listeners(pool):
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            wait = time.perf_counter() - start
+            for metrics in _each_registry(pool):
+                metrics.observe(_WAIT_METRIC, wait)
+
+    pool.connect = timed_connect
+
+    @event.listens_for(pool, "checkout")
+    def checked_out(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        for metrics in _each_registry(pool):
+            metrics.inc("db_pool_checkouts_total")
+
+    @event.listens_for(pool, "checkin")
+    def checked_in(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            hold = time.perf_counter() - checked_out_at
+            for metrics in _each_registry(pool):
+                metrics.observe(_HOLD_METRIC, hold)
+
+
+def init_metrics(app, engine):
+    """
+    Count requests and pool usage and register the ``/metrics`` route.
+
+    Args:
+        app (Flask): The application.
+        engine (Engine): The engine whose pool is instrumented.
+
+    Returns:
+        Metrics: The registry, for registering further metrics.
+    """
+    metrics = Metrics(
+        app.config["METRICS_LATENCY_BUCKETS"],
+        multiprocess_dir=app.config["METRICS_MULTIPROCESS_DIR"],
+        write_interval=app.config["METRICS_WRITE_INTERVAL"],
+    )
+    app.extensions["metrics"] = metrics
+    instrument_pool(metrics, engine)
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            endpoint = request.endpoint or "unmatched"
+            metrics.inc(
+                "http_requests_total",
+                endpoint=endpoint,
+                method=request.method,
+                status=response.status_code,
+            )
+            metrics.observe(
+                _LATENCY_METRIC, time.perf_counter() - start, endpoint=endpoint
+            )
+            metrics.maybe_write_snapshot()
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        """
+        Publishes the application metrics in the Prometheus text format.
+
+        Returns:
+            Response: The metrics.
+        """
+        return (
+            metrics.render(),
+            200,
+            {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    return metrics
@@ -0,0 +1,305 @@
+"""
+Sliding-window rate limiting for expensive form posts such as login.
+
+Each key (client IP or submitted identifier) is counted in fixed windows, and
+the current rate is estimated from the current and previous window weighted by
+how far the current window has progressed. This needs two integers per key
+instead of a timestamp per hit. Limits are checked before the view runs, so a
+rejected request costs neither a database query nor a password hash.
+
+All limits of a request are checked together and only counted when none of
+them rejects it, so a request refused for its identifier does not use up the
+client's IP allowance.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, render_template, request
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
+
+from db import engine, write_transaction, RateLimitCounter
+
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limit(limit):
+    """
+    Parse a limit such as ``"10/minute"`` or ``"100/5 minutes"``.
+
+    Args:
+        limit (str): Number of hits, a slash, and a period.
+
+    Returns:
+        tuple[int, int]: The number of hits and the period in seconds.
+
+    Raises:
+        ValueError: If the limit cannot be parsed.
+    """
+    hits, _, period = limit.partition("/")
+    amount, _, unit = period.strip().rpartition(" ")
+    unit = unit.rstrip("s")
+    if unit not in _PERIODS:
+        raise ValueError(f"Invalid rate limit: {limit}")
+    return int(hits), int(amount or 1) * _PERIODS[unit]
+
+
+def _estimate(previous, current, now, period):
+    """
+    Estimate the hits in the sliding window ending now and the wait until the
+    estimate drops below the next whole hit.
+    """
+    elapsed = (now % period) / period
+    return previous * (1 - elapsed) + current, math.ceil(period * (1 - elapsed))
+
+
+class MemoryRateLimiter:
+    """
+    Rate limiter keeping its counters in process memory.
+    """
+
+    def __init__(self, max_keys=100000):
+        """
+        Args:
+            max_keys (int): Counters kept before the least recently used are dropped.
+        """
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period):
+        """
+        Record a hit for ``key`` unless it is over its limit.
+
+        Args:
+            key (str): The rate limit key.
+            limit (int): Hits allowed per period.
+            period (int): Length of the window in seconds.
+
+        Returns:
+            tuple[bool, int]: Whether the hit is allowed, and the seconds to wait
+            before retrying when it is not.
+        """
+        allowed, retry_after, _ = self.hit_many([(key, limit, period)])
+        return allowed, retry_after
+
+    def hit_many(self, hits):
+        """
+        Record a hit for every key, unless any of them is over its limit.
+
+        Args:
+            hits (Iterable[tuple[str, int, int]]): Keys with their limit and
+                                                   period, as for ``hit``.
+
+        Returns:
+            tuple[bool, int, str | None]: Whether the hits are allowed, the
+            seconds to wait before retrying, and the key over its limit.
+        """
+        now = time.time()
+        with self._lock:
+            counted = []
+            for key, limit, period in hits:
+                window = int(now // period)
+                counter_window, previous, current = self._counters.get(
+                    key, (window, 0, 0)
+                )
+                if counter_window == window - 1:
+                    previous, current = current, 0
+                elif counter_window != window:
+                    previous, current = 0, 0
+
+                estimated, retry_after = _estimate(previous, current, now, period)
+                if estimated >= limit:
+                    return False, retry_after, key
+                counted.append((key, (window, previous, current + 1)))
+
+            for key, entry in counted:
+                self._counters[key] = entry
+                self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+            return True, 0, None
+
+
+class SQLiteRateLimiter:
+    """
+    Rate limiter keeping its counters in the ``rate_limit_counters`` table so that
+    all worker processes share them.
+    """
+
+    def __init__(self, bind, purge_interval=60.0, purge_batch_size=1000):
+        self.bind = bind
+        self.purge_interval = purge_interval
+        self.purge_batch_size = purge_batch_size
+        self._last_purge = time.monotonic()
+
+    def hit(self, key, limit, period):
+        """
+        Record a hit for ``key`` unless it is over its limit.
+
+        See ``MemoryRateLimiter.hit``.
+        """
+        allowed, retry_after, _ = self.hit_many([(key, limit, period)])
+        return allowed, retry_after
+
+    def hit_many(self, hits):
+        """
+        Record a hit for every key, unless any of them is over its limit.
+
+        The counters are incremented in one ``BEGIN IMMEDIATE`` transaction,
+        which is rolled back if a limit is exceeded, so concurrent hits from
+        other processes cannot both pass the last free slot.
+
+        See ``MemoryRateLimiter.hit_many``.
+
+        Raises:
+            OperationalError: If the database stays locked for longer than its
+                              busy timeout.
+        """
+        now = time.time()
+        with write_transaction(self.bind) as connection:
+            for key, limit, period in hits:
+                window = int(now // period)
+                current = connection.scalar(
+                    sqlite_insert(RateLimitCounter)
+                    .values(
+                        key=key,
+                        window=window,
+                        count=1,
+                        expires_at=(window + 2) * period,
+                    )
+                    .on_conflict_do_update(
+                        index_elements=[RateLimitCounter.key, RateLimitCounter.window],
+                        set_={"count": RateLimitCounter.count + 1},
+                    )
+                    .returning(RateLimitCounter.count)
+                )
+                previous = connection.scalar(
+                    select(RateLimitCounter.count).where(
+                        RateLimitCounter.key == key,
+                        RateLimitCounter.window == window - 1,
+                    )
+                )
+                estimated, retry_after = _estimate(
+                    previous or 0, current - 1, now, period
+                )
+                if estimated >= limit:
+                    connection.rollback()
+                    return False, retry_after, key
+
+        self._maybe_purge()
+        return True, 0, None
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        expired = (
+            select(RateLimitCounter.key, RateLimitCounter.window)
+            .where(RateLimitCounter.expires_at <= time.time())
+            .limit(self.purge_batch_size)
+        )
+        with self.bind.begin() as connection:
+            connection.execute(
+                delete(RateLimitCounter).where(
+                    tuple_(RateLimitCounter.key, RateLimitCounter.window).in_(expired)
+                )
+            )
+
+
+def build_rate_limiter(config, bind=None):
+    """
+    Create the rate limiter selected by ``RATE_LIMIT_BACKEND``.
+
+    Args:
+        config (Mapping): The application configuration.
+        bind (Engine | None): The engine of the ``"sqlite"`` backend, the
+                              process-wide ``engine`` by default.
+
+    Returns:
+        MemoryRateLimiter | SQLiteRateLimiter: The limiter for ``"memory"`` or
+        ``"sqlite"``.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    backend = config["RATE_LIMIT_BACKEND"]
+    if backend == "memory":
+        return MemoryRateLimiter()
+    if backend == "sqlite":
+        return SQLiteRateLimiter(bind or engine)
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+def rate_limited(limiter, scope):
+    """
+    Decorate a view so that POST requests are rate limited per client IP and per
+    submitted identifier, as configured in ``RATE_LIMITS[scope]``.
+
+    The configuration of a scope may contain ``per_ip`` and ``per_identifier``
+    limits, and the ``identifier_field`` form field the latter is keyed by.
+    Requests over a limit get a 429 response before the view runs. When the
+    counters cannot be updated because the database is locked, the request is
+    let through: the limiter protects the expensive view, and a busy database
+    must not lock every user out.
+
+    Args:
+        limiter (MemoryRateLimiter | SQLiteRateLimiter): The limiter to count with.
+        scope (str): Name of the limited route in ``RATE_LIMITS``.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            settings = current_app.config["RATE_LIMITS"].get(scope)
+            if (
+                request.method != "POST"
+                or not settings
+                or not current_app.config["RATE_LIMIT_ENABLED"]
+            ):
+                return view(*args, **kwargs)
+
+            keys = []
+            if settings.get("per_ip"):
+                keys.append((f"{scope}:ip:{request.remote_addr}", settings["per_ip"]))
+            identifier = request.form.get(settings.get("identifier_field", ""), "")
+            if settings.get("per_identifier") and identifier:
+                keys.append(
+                    (
+                        f"{scope}:id:{identifier.strip().lower()}",
+                        settings["per_identifier"],
+                    )
+                )
+
+            hits = [(key, *parse_limit(limit)) for key, limit in keys]
+            try:
+                allowed, retry_after, rejected = limiter.hit_many(hits)
+            except OperationalError as error:
+                current_app.logger.warning(
+                    "Rate limits of %s not checked: %s", scope, error.orig
+                )
+                return view(*args, **kwargs)
+            if not allowed:
+                current_app.logger.warning(
+                    "Rate limit exceeded for %s.", rejected, extra={"sampled": True}
+                )
+                return (
+                    render_template(
+                        "error.html",
+                        error="Too many attempts. Please try again later.",
+                    ),
+                    429,
+                    {"Retry-After": str(retry_after)},
+                )
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
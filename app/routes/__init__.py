@@ -1,41 +1,50 @@
 """
-Initialize logging and import route modules.
+Route modules of the application.
 
-This module sets up logging for the application and imports the route modules
-for error handling, default routes, authentication, and guides.
+Each module defines its routes on a ``RouteBlueprint`` named ``bp``. The
+modules are imported when ``register_blueprints`` is called by ``create_app``,
+not when this package is imported.
 """
 
-import logging
-import os
-from logging.handlers import RotatingFileHandler
-from ..config import app
-
-# Define log file constants
-LOG_DIRECTORY = "logs"
-LOG_FILE_PATH = os.path.join(LOG_DIRECTORY, "application.log")
-
-# Ensure the logs directory exists
-if not os.path.exists(LOG_DIRECTORY):
-    try:
-        os.makedirs(LOG_DIRECTORY)
-    except OSError as e:
-        raise RuntimeError(f"Failed to create log directory: {e}") from e
-
-# Set up the logging handler
-handler = RotatingFileHandler(
-    LOG_FILE_PATH, maxBytes=100000, backupCount=1
-)  # Adjust maxBytes as needed
-handler.setLevel(logging.INFO)  # Set to DEBUG for development
-
-# Set up the logging format
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-handler.setFormatter(formatter)
-
-# Add the handler to the app's logger
-app.logger.addHandler(handler)
-app.logger.setLevel(
-    logging.INFO
-)  # Ensure the app logger is set to the appropriate level
-
-# Import route modules
-from . import errors, default, auth, guide
+from importlib import import_module
+
+from flask import Blueprint
+from flask.blueprints import BlueprintSetupState
+
+
+ROUTE_MODULES = ("errors", "default", "auth", "guide", "api")
+
+
+class _UnprefixedSetupState(BlueprintSetupState):
+    def add_url_rule(self, rule, endpoint=None, view_func=None, **options):
+        if self.url_prefix is not None:
+            rule = "/".join((self.url_prefix.rstrip("/"), rule.lstrip("/")))
+        options.setdefault("subdomain", self.subdomain)
+        if endpoint is None:
+            endpoint = view_func.__name__
+        defaults = dict(self.url_defaults, **options.pop("defaults", {}))
+        self.app.add_url_rule(rule, endpoint, view_func, defaults=defaults, **options)
+
+
+class RouteBlueprint(Blueprint):
+    """
+    Blueprint whose endpoints keep the bare view function names.
+
+    Templates, cache policies and rate limits refer to endpoints such as
+    ``"index"`` and ``"login"``, so the blueprint name is not prepended.
+    """
+
+    def make_setup_state(self, app, options, first_registration=False):
+        return _UnprefixedSetupState(self, app, options, first_registration)
+
+
+def register_blueprints(app):
+    """
+    Import the route modules and register their blueprints on ``app``.
+
+    Args:
+        app (Flask): The application.
+    """
+    for name in ROUTE_MODULES:
+        module = import_module(f"{__name__}.{name}")
+        app.register_blueprint(module.bp)
@@ -0,0 +1,193 @@
+"""
+Versioned JSON API for games and guides.
+
+List endpoints are keyset-paginated with ``after`` (the last ID of the previous
+page) and ``limit``, and every endpoint accepts ``fields``, a comma-separated
+list of the fields to return. Rows are selected column by column and serialized
+directly, without loading ORM objects.
+
+Like the pages they mirror, the endpoints are only available to logged-in
+users; anonymous clients get a JSON 401 instead of a redirect to the login page.
+"""
+
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, jsonify, request, url_for
+from flask_login import current_user
+from flask_login.config import EXEMPT_METHODS
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import db_session
+from db.queries import (
+    GAME_FIELDS,
+    GUIDE_FIELDS,
+    api_games_page,
+    api_guide,
+    api_guides_page,
+)
+from . import RouteBlueprint
+
+
+bp = RouteBlueprint("api", __name__)
+
+# ``content`` can be large, so it is only returned when asked for.
+DEFAULT_GUIDE_FIELDS = tuple(name for name in GUIDE_FIELDS if name != "content")
+DEFAULT_GAME_FIELDS = tuple(GAME_FIELDS)
+
+
+def _error(message, status):
+    return jsonify({"error": message}), status
+
+
+def api_login_required(view):
+    """
+    Reject anonymous requests to ``view`` with a JSON 401 error.
+
+    Behaves like ``flask_login.login_required``, including ``LOGIN_DISABLED``,
+    except that API clients are not redirected to the login page.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if (
+            request.method not in EXEMPT_METHODS
+            and not current_app.config.get("LOGIN_DISABLED")
+            and not current_user.is_authenticated
+        ):
+            return _error("Authentication required.", 401)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _requested_fields(available, default):
+    """
+    Parse the ``fields`` query parameter.
+
+    Raises:
+        ValueError: If a requested field is unknown.
+    """
+    requested = request.args.get("fields")
+    if not requested:
+        return default
+    fields = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _page_arguments():
+    after = request.args.get("after", type=int)
+    limit = request.args.get("limit", current_app.config["GUIDES_PAGE_SIZE"], type=int)
+    return after, max(1, min(limit, current_app.config["GUIDES_MAX_PAGE_SIZE"]))
+
+
+def _serialize(row):
+    return {
+        key: (
+            value.replace(tzinfo=timezone.utc).isoformat()
+            if isinstance(value, datetime)
+            else value
+        )
+        for key, value in row._mapping.items()
+    }
+
+
+def _page_response(endpoint, rows, next_after):
+    next_url = None
+    if next_after is not None:
+        arguments = request.args.to_dict()
+        arguments["after"] = next_after
+        next_url = url_for(endpoint, **arguments)
+    return jsonify(
+        {
+            "data": [_serialize(row) for row in rows],
+            "next_after": next_after,
+            "next": next_url,
+        }
+    )
+
+
+@bp.route("/api/v1/games")
+@api_login_required
+def api_games():
+    """
+    List games.
+
+    Returns:
+        Response: JSON with a page of games in ``data`` and the ``next_after``
+        cursor and ``next`` URL of the following page.
+    """
+    try:
+        fields = _requested_fields(GAME_FIELDS, DEFAULT_GAME_FIELDS)
+    except ValueError as error:
+        return _error(str(error), 400)
+    after, limit = _page_arguments()
+
+    try:
+        rows, next_after = api_games_page(db_session, fields, after=after, limit=limit)
+        return _page_response("api_games", rows, next_after)
+    except SQLAlchemyError as error:
+        current_app.logger.error("Database error: %s", str(error))
+        return _error("An error occurred while fetching games.", 500)
+
+
+@bp.route("/api/v1/guides")
+@api_login_required
+def api_guides():
+    """
+    List guides, optionally only those of one game (``game_id``) or author
+    (``author_id``).
+
+    Returns:
+        Response: JSON with a page of guides in ``data`` and the ``next_after``
+        cursor and ``next`` URL of the following page.
+    """
+    try:
+        fields = _requested_fields(GUIDE_FIELDS, DEFAULT_GUIDE_FIELDS)
+    except ValueError as error:
+        return _error(str(error), 400)
+    after, limit = _page_arguments()
+
+    try:
+        rows, next_after = api_guides_page(
+            db_session,
+            fields,
+            game_id=request.args.get("game_id", type=int),
+            author_id=request.args.get("author_id", type=int),
+            after=after,
+            limit=limit,
+        )
+        return _page_response("api_guides", rows, next_after)
+    except SQLAlchemyError as error:
+        current_app.logger.error("Database error: %s", str(error))
+        return _error("An error occurred while fetching guides.", 500)
+
+
+@bp.route("/api/v1/guides/<int:guide_id>")
+@api_login_required
+def api_guide_detail(guide_id: int):
+    """
+    Return one guide, including its content unless ``fields`` says otherwise.
+
+    Args:
+        guide_id (int): The guide ID.
+
+    Returns:
+        Response: JSON of the guide, or a 404 error.
+    """
+    try:
+        fields = _requested_fields(GUIDE_FIELDS, tuple(GUIDE_FIELDS))
+    except ValueError as error:
+        return _error(str(error), 400)
+
+    try:
+        row = api_guide(db_session, guide_id, fields)
+    except SQLAlchemyError as error:
+        current_app.logger.error("Database error: %s", str(error))
+        return _error("An error occurred while fetching the guide.", 500)
+    if row is None:
+        return _error(f"Guide {guide_id} not found.", 404)
+    return jsonify(_serialize(row))
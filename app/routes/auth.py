@@ -4,6 +4,7 @@ Authentication routes for user registration, login, logout, and profile manageme
 
 import secrets
 from flask import (
+    current_app,
     flash,
     jsonify,
     redirect,
@@ -21,11 +22,37 @@ from flask_login import (
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from app.utils import update_user_info
-from db import db_session, User, Guide
-from ..config import app, tokens
+from db import db_session, commit_with_retry, search_guides, User
+from db.queries import find_user_by_identifier, user_guides
+from ..extensions import (
+    tokens,
+    invalidate_cached_user,
+    password_hasher,
+    rate_limiter,
+)
+from ..hashing import HashingBusyError
+from ..ratelimit import rate_limited
+from . import RouteBlueprint
+
+
+bp = RouteBlueprint("auth", __name__)
 
 
-@app.route("/register", methods=["GET", "POST"])
+def _server_busy():
+    """
+    Render the response sent when password hashing cannot accept more work.
+    """
+    return (
+        render_template(
+            "error.html", error="The server is busy. Please try again shortly."
+        ),
+        503,
+        {"Retry-After": "1"},
+    )
+
+
+@bp.route("/register", methods=["GET", "POST"])
+@rate_limited(rate_limiter, "register")
 def register():
     """
     Handle user registration. If the request method is POST,
@@ -38,25 +65,25 @@ def register():
         ]
 
         if not all([username, email, phone, password]):
-            app.logger.warning("Registration attempt with missing fields.")
+            current_app.logger.warning("Registration attempt with missing fields.")
             return render_template(
                 "register.html",
                 error="Username, email, phone, and password are required",
             )
 
         user = User(username=username, email=email, phone=phone)
-        user.set_password(password)
-        db_session.add(user)
 
         try:
-            db_session.commit()
-            app.logger.info("User %s registered successfully.", username)
+            password_hasher.set_password(user, password)
+            db_session.add(user)
+            commit_with_retry(db_session)
+            current_app.logger.info("User %s registered successfully.", username)
             return render_template(
                 "register.html", message="User registered successfully"
             )
         except IntegrityError:
             db_session.rollback()
-            app.logger.warning(
+            current_app.logger.warning(
                 "Registration attempt with existing username, email, or phone: %s, %s, %s.",
                 username,
                 email,
@@ -67,18 +94,24 @@ def register():
             )
         except SQLAlchemyError as e:
             db_session.rollback()
-            app.logger.error("Database error: %s", e)
+            current_app.logger.error("Database error: %s", e)
             return (
                 render_template(
                     "error.html", error="An error occurred during registration."
                 ),
                 500,
             )
+        except HashingBusyError:
+            current_app.logger.warning(
+                "Registration rejected: password hashing pool is busy."
+            )
+            return _server_busy()
 
     return render_template("register.html")
 
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
+@rate_limited(rate_limiter, "login")
 def login():
     """
     Handle user login. Process the login form for POST requests;
@@ -91,50 +124,55 @@ def login():
         ]
 
         if not all([identifier, password]):
-            app.logger.warning("Login attempt with missing fields.")
+            current_app.logger.warning(
+                "Login attempt with missing fields.", extra={"sampled": True}
+            )
             return render_template(
                 "login.html", error="Identifier and password are required"
             )
 
         try:
-            user = (
-                db_session.query(User)
-                .filter(
-                    (User.username == identifier)
-                    | (User.email == identifier)
-                    | (User.phone == identifier)
-                )
-                .first()
-            )
+            user = find_user_by_identifier(db_session, identifier)
 
-            if not user or not user.check_password(password):
-                app.logger.warning(
-                    "Invalid login attempt for identifier: %s.", identifier
+            if not user or not password_hasher.check_password(user, password):
+                current_app.logger.warning(
+                    "Invalid login attempt for identifier: %s.",
+                    identifier,
+                    extra={"sampled": True},
                 )
                 return render_template(
                     "login.html", error="Invalid identifier or password"
                 )
 
+            if db_session.is_modified(user):
+                # The password was rehashed with the current hash parameters.
+                commit_with_retry(db_session)
+                invalidate_cached_user(user.id)
+
             token = secrets.token_urlsafe()
-            tokens[user.id] = token
+            tokens.set(user.id, token)
 
             login_user(user)
             session.update({"token": token, "logged_in": True, "user_id": user.id})
             flash("Login successful", "success")
-            app.logger.info("User %s logged in successfully.", identifier)
+            current_app.logger.info("User %s logged in successfully.", identifier)
             return redirect(url_for("index"))
 
         except SQLAlchemyError as e:
-            app.logger.error("Database error: %s", e)
+            db_session.rollback()
+            current_app.logger.error("Database error: %s", e)
             return (
                 render_template("error.html", error="An error occurred during login."),
                 500,
             )
+        except HashingBusyError:
+            current_app.logger.warning("Login rejected: password hashing pool is busy.")
+            return _server_busy()
 
     return render_template("login.html")
 
 
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     """
@@ -143,7 +181,8 @@ def logout():
     user_id = session.pop("user_id", None)
     try:
         if user_id:
-            tokens.pop(user_id, None)
+            tokens.delete(user_id)
+            invalidate_cached_user(user_id)
 
         session.pop("logged_in", None)
         session.pop("token", None)
@@ -151,43 +190,43 @@ def logout():
         logout_user()
 
         flash("You have been logged out", "success")
-        app.logger.info("User %s logged out successfully.", user_id)
+        current_app.logger.info("User %s logged out successfully.", user_id)
         return redirect(url_for("index"))
     except SQLAlchemyError as e:
-        app.logger.error("Database error during logout: %s", e)
+        current_app.logger.error("Database error during logout: %s", e)
         return (
             render_template("error.html", error="An error occurred during logout."),
             500,
         )
 
 
-@app.route("/edit_user", methods=["POST"])
+@bp.route("/edit_user", methods=["POST"])
 @login_required
 def edit_user():
     """
     Handle user profile update. Updates user details based on the submitted data.
     """
-    data = request.get_json() or request.form
+    data = request.get_json(silent=True) or request.form
     user_id = session.get("user_id")
 
     if not user_id:
         return jsonify({"error": "User ID is missing"}), 400
 
     try:
-        user = db_session.query(User).get(user_id)
+        user = db_session.get(User, user_id)
         if user is None:
             return jsonify({"error": "User not found"}), 404
 
-        update_user_info(user, data)
-        db_session.commit()
+        commit_with_retry(db_session, lambda: update_user_info(user, data))
+        invalidate_cached_user(user_id)
 
-        app.logger.info("User %s updated successfully.", user_id)
+        current_app.logger.info("User %s updated successfully.", user_id)
         flash("User updated successfully", "success")
         return render_template("edit_user.html", user=user)
 
     except IntegrityError:
         db_session.rollback()
-        app.logger.warning(
+        current_app.logger.warning(
             "Update attempt with existing username, email, or phone for user %s.",
             user_id,
         )
@@ -198,7 +237,7 @@ def edit_user():
 
     except SQLAlchemyError as e:
         db_session.rollback()
-        app.logger.error("Database error: %s", e)
+        current_app.logger.error("Database error: %s", e)
         return (
             render_template(
                 "error.html", error="An error occurred while updating the user."
@@ -206,8 +245,15 @@ def edit_user():
             500,
         )
 
+    except HashingBusyError:
+        db_session.rollback()
+        current_app.logger.warning(
+            "User update rejected: password hashing pool is busy."
+        )
+        return _server_busy()
+
 
-@app.route("/profile", methods=["GET", "POST"])
+@bp.route("/profile", methods=["GET", "POST"])
 @login_required
 def profile():
     """
@@ -216,18 +262,12 @@ def profile():
     try:
         search_query = request.args.get("search", "")
         if search_query:
-            guides = (
-                db_session.query(Guide)
-                .filter(
-                    Guide.user_id == current_user.id, Guide.title.contains(search_query)
-                )
-                .all()
-            )
+            guides = search_guides(db_session, search_query, user_id=current_user.id)
         else:
-            guides = db_session.query(Guide).filter_by(user_id=current_user.id).all()
+            guides = user_guides(db_session, current_user.id)
         return render_template("profile.html", user=current_user, guides=guides)
     except SQLAlchemyError as e:
-        app.logger.error("Database error: %s", e)
+        current_app.logger.error("Database error: %s", e)
         return (
             render_template(
                 "error.html", error="An error occurred while fetching user profile."
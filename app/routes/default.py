@@ -5,34 +5,38 @@ This module defines the routes for the index and help pages,
 and handles fetching data from the database.
 """
 
-from flask import render_template
+from flask import current_app, render_template, request
 from sqlalchemy.exc import SQLAlchemyError
-from db import db_session, Game, Guide  # Third-party import
-from ..config import app  # Local import
+from db import db_session, search_guides  # Third-party import
+from db.queries import games_with_guides
+from ..extensions import leaderboard
+from . import RouteBlueprint  # Local import
 
 
-@app.route("/")
+bp = RouteBlueprint("default", __name__)
+
+
+@bp.route("/")
 def index():
     """
-    Render the index page with a list of games, guides, and top guides.
+    Render the index page with a list of games, their guides, and top guides.
+
+    Top guides come from the in-memory leaderboard, so the page does not sort
+    the guides table on every request. Games are passed as a callable so they
+    are only queried when the cached games fragment has expired.
 
     Returns:
-        Rendered template of the index page with games, guides, and top guides data.
+        Rendered template of the index page with games, top and trending guides.
     """
     try:
-        games = db_session.query(Game).all()
-        guides = db_session.query(Guide).all()
-        top_guides = (
-            db_session.query(Guide).order_by(Guide.usage_count.desc()).limit(5).all()
-        )
         return render_template(
             "index.html",
-            games=games,
-            guides=guides,
-            top_guides=top_guides,
+            games=lambda: games_with_guides(db_session),
+            top_guides=leaderboard.top(5),
+            trending_guides=leaderboard.top_in_window(24 * 7, 5),
         )
     except SQLAlchemyError as e:
-        app.logger.error("Database error: %s", e)
+        current_app.logger.error("Database error: %s", e)
         return (
             render_template(
                 "error.html", error="An error occurred while fetching data."
@@ -41,7 +45,27 @@ def index():
         )
 
 
-@app.route("/help")
+@bp.route("/search")
+def search():
+    """
+    Render site-wide full-text search results over guide titles and content.
+
+    Returns:
+        Rendered template of the search page with ranked results.
+    """
+    search_query = request.args.get("q", "")
+    try:
+        results = search_guides(db_session, search_query, limit=50)
+        return render_template("search.html", query=search_query, results=results)
+    except SQLAlchemyError as e:
+        current_app.logger.error("Database error: %s", e)
+        return (
+            render_template("error.html", error="An error occurred while searching."),
+            500,
+        )
+
+
+@bp.route("/help")
 def help_page():
     """
     Render the help page.
@@ -4,11 +4,14 @@ Error handling routes for the application.
 This module defines error handlers for various HTTP error codes.
 """
 
-from flask import render_template
-from . import app
+from flask import current_app, render_template
+from . import RouteBlueprint
 
 
-@app.errorhandler(Exception)
+bp = RouteBlueprint("errors", __name__)
+
+
+@bp.app_errorhandler(Exception)
 def handle_error(error):
     """
     Handle various HTTP errors and log the error.
@@ -20,7 +23,7 @@ def handle_error(error):
         Rendered template of an error page with the appropriate HTTP status code.
     """
     # Log the error
-    app.logger.error("Error occurred: %s", error)
+    current_app.logger.error("Error occurred: %s", error)
 
     # Determine the error code and provide a suitable error message
     error_code = getattr(error, "code", 500)
@@ -2,34 +2,55 @@
 Guide-related routes for the application.
 
 This module includes routes for viewing, adding, editing, and deleting guides,
-as well as adding new games and viewing guides for games other than 'Raid 
-Shadow Legends'.
+as well as adding new games, bulk importing and exporting guides, and viewing
+guides for games other than 'Raid Shadow Legends'.
 """
 
+import io
+
 from flask import (
+    current_app,
     jsonify,
+    make_response,
     render_template,
     request,
     session,
     Response,
 )
-from flask_login import login_required
+from flask_login import current_user, login_required
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
-from db import db_session, Game, Guide
-from ..config import app
+from db import db_session, commit_with_retry, get_engine, Game, Guide
+from db.queries import guide_last_modified, guides_page
+from ..catalogue import (
+    EXPORT_FORMATS,
+    IMPORT_FORMATS,
+    ImportInterrupted,
+    export_guides,
+    format_from_filename,
+    import_guides,
+)
+from ..extensions import usage_counter
+from ..http_cache import not_modified, page_validators, with_validators
+from . import RouteBlueprint
 from .validators import GuideForm, GameForm
 
 
-@app.route("/guide/<int:guide_id>", methods=["GET"])
+bp = RouteBlueprint("guide", __name__)
+
+
+@bp.route("/guide/<int:guide_id>", methods=["GET"])
 @login_required
 def view_guide(guide_id: int) -> Response:
     """
     View a specific guide by its ID.
 
     This endpoint allows logged-in users to view the details of a guide specified
-    by its ID. If the guide is not found, a 404 error is returned. If there is
-    a database error during the query, a 500 error is returned.
+    by its ID. Each view is counted in memory and written to ``usage_count`` in
+    batches. When the client's cached copy is still current, a 304 response is
+    returned without loading or rendering the guide. If the guide is not found,
+    a 404 error is returned. If there is a database error during the query,
+    a 500 error is returned.
 
     Args:
         guide_id (int): The unique identifier of the guide to retrieve.
@@ -39,9 +60,9 @@ def view_guide(guide_id: int) -> Response:
                   otherwise renders the 'error.html' template with a 404 status code.
     """
     try:
-        guide = db_session.query(Guide).filter_by(id=guide_id).first()
-        if guide is None:
-            app.logger.warning("Guide with ID %d not found.", guide_id)
+        modified = guide_last_modified(db_session, guide_id)
+        if modified is None:
+            current_app.logger.warning("Guide with ID %d not found.", guide_id)
             return (
                 render_template(
                     "error.html", error=f"Guide with ID {guide_id} not found."
@@ -49,10 +70,20 @@ def view_guide(guide_id: int) -> Response:
                 404,
             )
 
-        return render_template("view_guide.html", guide=guide)
+        usage_counter.increment(guide_id)
+        etag, last_modified = page_validators(
+            "guide", guide_id, timestamps=modified
+        )
+        cached = not_modified(etag, last_modified)
+        if cached is not None:
+            return cached
+
+        guide = db_session.get(Guide, guide_id)
+        response = make_response(render_template("view_guide.html", guide=guide))
+        return with_validators(response, etag, last_modified)
 
     except SQLAlchemyError as error:
-        app.logger.error("Database error: %s", str(error))
+        current_app.logger.error("Database error: %s", str(error))
         return (
             render_template(
                 "error.html", error="An error occurred while fetching the guide."
@@ -61,7 +92,7 @@ def view_guide(guide_id: int) -> Response:
         )
 
 
-@app.route("/help_o_r", methods=["GET", "POST"])
+@bp.route("/help_o_r", methods=["GET", "POST"])
 @login_required
 def add_guide_all_games() -> Response:
     """
@@ -82,7 +113,7 @@ def add_guide_all_games() -> Response:
 
     if request.method == "POST":
         if not form.validate():
-            app.logger.warning("Guide addition attempt with invalid fields.")
+            current_app.logger.warning("Guide addition attempt with invalid fields.")
             error_message = "All fields are required"
         else:
             form_data = {
@@ -96,7 +127,7 @@ def add_guide_all_games() -> Response:
 
             user_id = session.get("user_id")
             if not user_id:
-                app.logger.warning("Unauthenticated guide addition attempt.")
+                current_app.logger.warning("Unauthenticated guide addition attempt.")
                 return (
                     jsonify({"error": "User not authenticated"}),
                     401,
@@ -107,7 +138,7 @@ def add_guide_all_games() -> Response:
             try:
                 game = db_session.query(Game).filter_by(name=game_name).first()
                 if game is None:
-                    app.logger.warning(
+                    current_app.logger.warning(
                         "Guide addition attempt for non-existent game: %s.", game_name
                     )
                     error_message = f"Game {game_name} not found"
@@ -122,8 +153,8 @@ def add_guide_all_games() -> Response:
                         user_id=user_id,
                     )
                     db_session.add(new_guide)
-                    db_session.commit()
-                    app.logger.info(
+                    commit_with_retry(db_session)
+                    current_app.logger.info(
                         "New guide added successfully for game %s by user %d.",
                         game_name,
                         user_id,
@@ -137,7 +168,7 @@ def add_guide_all_games() -> Response:
                     )
             except IntegrityError:
                 db_session.rollback()
-                app.logger.warning(
+                current_app.logger.warning(
                     "Guide addition failed due to database integrity error."
                 )
                 error_message = (
@@ -145,7 +176,7 @@ def add_guide_all_games() -> Response:
                 )
             except SQLAlchemyError as error:
                 db_session.rollback()
-                app.logger.error("Database error: %s", str(error))
+                current_app.logger.error("Database error: %s", str(error))
                 error_message = "An error occurred while adding the guide."
 
         return render_template("help_request_other.html", error=error_message), 400
@@ -153,7 +184,7 @@ def add_guide_all_games() -> Response:
     return render_template("help_request_other.html")
 
 
-@app.route("/add_game", methods=["GET", "POST"])
+@bp.route("/add_game", methods=["GET", "POST"])
 @login_required
 def add_game() -> Response:
     """
@@ -170,7 +201,7 @@ def add_game() -> Response:
 
     if request.method == "POST":
         if not form.validate():
-            app.logger.warning("Game addition attempt with invalid fields.")
+            current_app.logger.warning("Game addition attempt with invalid fields.")
             return render_template("add_game.html", error="Game name is required")
 
         game_name = form.game_name.data
@@ -178,22 +209,24 @@ def add_game() -> Response:
         try:
             existing_game = db_session.query(Game).filter_by(name=game_name).first()
             if existing_game:
-                app.logger.warning(
+                current_app.logger.warning(
                     "Game addition attempt for existing game: %s.", game_name
                 )
                 return render_template("add_game.html", error="Game already exists")
 
             game = Game(name=game_name)
             db_session.add(game)
-            db_session.commit()
-            app.logger.info("New game %s added successfully.", game_name)
+            commit_with_retry(db_session)
+            current_app.logger.info("New game %s added successfully.", game_name)
             return render_template(
                 "add_game.html", message="New game added successfully"
             )
 
         except IntegrityError:
             db_session.rollback()
-            app.logger.warning("Game addition failed due to database integrity error.")
+            current_app.logger.warning(
+                "Game addition failed due to database integrity error."
+            )
             return (
                 render_template(
                     "add_game.html", error="An error occurred while adding the game"
@@ -203,7 +236,7 @@ def add_game() -> Response:
 
         except SQLAlchemyError as error:
             db_session.rollback()
-            app.logger.error("Database error: %s", str(error))
+            current_app.logger.error("Database error: %s", str(error))
             return (
                 render_template(
                     "error.html", error="An error occurred while adding the game."
@@ -214,30 +247,59 @@ def add_game() -> Response:
     return render_template("add_game.html")
 
 
-@app.route("/help_o")
+@bp.route("/help_o")
 def help_other_games() -> Response:
     """
     Display guides for games other than 'Raid Shadow Legends'.
 
-    This endpoint retrieves and displays all guides related to games other than
-    'Raid Shadow Legends'. It fetches all games excluding 'Raid Shadow Legends'
-    and then collects all guides associated with those games.
+    This endpoint retrieves one page of guides related to games other than
+    'Raid Shadow Legends' with a single join query. Pages are selected with the
+    ``after`` (last guide ID of the previous page) and ``limit`` query parameters.
+    A page whose guides and games are unchanged is answered with 304.
 
     Returns:
-        Response: Renders the 'help_other.html' template with a list of guides.
+        Response: Renders the 'help_other.html' template with a page of guides.
     """
+    after = request.args.get("after", type=int)
+    limit = request.args.get("limit", current_app.config["GUIDES_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, current_app.config["GUIDES_MAX_PAGE_SIZE"]))
+
     try:
-        games = db_session.query(Game).filter(Game.name != "Raid Shadow Legends").all()
-        other_guides = [
-            guide
-            for game in games
-            for guide in db_session.query(Guide).filter_by(game_id=game.id).all()
-        ]
+        other_guides, next_after = guides_page(
+            db_session, exclude_game="Raid Shadow Legends", after=after, limit=limit
+        )
 
-        return render_template("help_other.html", guides=other_guides)
+        # The page links to the next one, so its ETag must change when a
+        # new guide makes a next page appear.
+        etag, last_modified = page_validators(
+            "help_other",
+            limit,
+            after,
+            next_after,
+            *(guide.id for guide in other_guides),
+            timestamps=[
+                timestamp
+                for guide in other_guides
+                for timestamp in (guide.updated_at, guide.game_updated_at)
+            ],
+        )
+        cached = not_modified(etag, last_modified)
+        if cached is not None:
+            return cached
+
+        response = make_response(
+            render_template(
+                "help_other.html",
+                other_guides=other_guides,
+                after=after,
+                next_after=next_after,
+                limit=limit,
+            )
+        )
+        return with_validators(response, etag, last_modified)
 
     except SQLAlchemyError as error:
-        app.logger.error("Database error: %s", str(error))
+        current_app.logger.error("Database error: %s", str(error))
         return (
             render_template(
                 "error.html",
@@ -245,3 +307,96 @@ def help_other_games() -> Response:
             ),
             500,
         )
+
+
+@bp.route("/guides/import", methods=["POST"])
+@login_required
+def import_guides_upload() -> Response:
+    """
+    Import guides authored by the current user from an uploaded file.
+
+    The ``file`` upload is a JSONL or CSV file with the fields of the guide form,
+    and its format is taken from the ``format`` field or the file name. Unknown
+    games are rejected unless ``create_games`` is set.
+
+    Batches are committed as they are read, so an import that fails keeps the
+    guides before the failure; the error response reports them too.
+
+    Returns:
+        Response: JSON with the numbers of imported and failed records and the
+                  first errors, or an error message.
+    """
+    upload = request.files.get("file")
+    if upload is None:
+        return jsonify({"error": "No file uploaded."}), 400
+    file_format = request.form.get("format") or format_from_filename(upload.filename)
+    if file_format not in IMPORT_FORMATS:
+        return jsonify({"error": "Unknown file format; use jsonl or csv."}), 400
+
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8", newline="")
+    try:
+        report = import_guides(
+            stream,
+            file_format,
+            current_user.id,
+            create_games=bool(request.form.get("create_games")),
+        )
+    except ImportInterrupted as interrupted:
+        report = interrupted.report
+        if isinstance(interrupted.__cause__, UnicodeDecodeError):
+            error, status = "The file is not valid UTF-8.", 400
+        else:
+            current_app.logger.error("Database error: %s", str(interrupted.__cause__))
+            error, status = "An error occurred while importing guides.", 500
+        current_app.logger.warning(
+            "User %d import stopped after line %d; %d guides imported.",
+            current_user.id,
+            report.committed_line,
+            report.imported,
+        )
+        return jsonify({"error": error, **report.to_dict()}), status
+
+    current_app.logger.info(
+        "User %d imported %d guides (%d failed).",
+        current_user.id,
+        report.imported,
+        report.failed,
+    )
+    return jsonify(report.to_dict())
+
+
+@bp.route("/admin/guides/export")
+@login_required
+def export_guides_download() -> Response:
+    """
+    Download every guide with its game name and author, for users listed in
+    ``ADMIN_USERNAMES``.
+
+    The ``format`` query parameter selects ``jsonl`` (default) or ``csv``, and
+    ``gzip=1`` compresses the download. The export is streamed as it is read.
+
+    Returns:
+        Response: The streamed export, or a 400 or 403 error.
+    """
+    if current_user.username not in current_app.config["ADMIN_USERNAMES"]:
+        current_app.logger.warning("User %d denied guide export.", current_user.id)
+        return jsonify({"error": "Forbidden"}), 403
+
+    file_format = request.args.get("format", "jsonl")
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({"error": "Unknown export format; use jsonl or csv."}), 400
+    compress = request.args.get("gzip", type=int) == 1
+
+    filename = f"guides.{file_format}" + (".gz" if compress else "")
+    if compress:
+        mimetype = "application/gzip"
+    elif file_format == "csv":
+        mimetype = "text/csv"
+    else:
+        mimetype = "application/x-ndjson"
+    current_app.logger.info("User %d exported guides as %s.", current_user.id, filename)
+    return Response(
+        export_guides(file_format, compress=compress, bind=get_engine()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -0,0 +1,184 @@
+"""
+Pluggable, expiring storage for the session tokens issued at login.
+
+Two backends are provided: an in-process TTL/LRU store for single-worker setups
+and tests, and a store backed by the ``session_tokens`` table that every worker
+process sharing the database can see.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from db import engine, SessionToken
+from .cache import TTLCache
+
+
+class TokenStore(ABC):
+    """
+    Interface of a session token store keyed by user ID.
+    """
+
+    @abstractmethod
+    def set(self, user_id, token):
+        """
+        Store ``token`` for ``user_id``, replacing any previous token.
+        """
+
+    @abstractmethod
+    def get(self, user_id):
+        """
+        Return the unexpired token of ``user_id``, or None.
+        """
+
+    @abstractmethod
+    def delete(self, user_id):
+        """
+        Remove the token of ``user_id`` if there is one.
+        """
+
+    @abstractmethod
+    def purge_expired(self):
+        """
+        Remove one batch of expired tokens.
+
+        Returns:
+            int: Number of tokens removed.
+        """
+
+    @abstractmethod
+    def __len__(self):
+        """
+        Return the number of stored tokens.
+        """
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    Token store kept in process memory with TTL expiry and LRU eviction.
+    """
+
+    def __init__(self, ttl, max_entries=10000, purge_batch_size=500):
+        self.purge_batch_size = purge_batch_size
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl)
+
+    def set(self, user_id, token):
+        self._cache.set(user_id, token)
+
+    def get(self, user_id):
+        return self._cache.get(user_id)
+
+    def delete(self, user_id):
+        self._cache.delete(user_id)
+
+    def purge_expired(self):
+        return self._cache.purge_expired(self.purge_batch_size)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class SQLiteTokenStore(TokenStore):
+    """
+    Token store backed by the ``session_tokens`` table, shared by all workers.
+
+    Lookups are primary-key reads. Expired rows are deleted in bounded batches,
+    at most once per ``purge_interval`` seconds, piggybacking on writes.
+    """
+
+    def __init__(self, bind, ttl, purge_batch_size=500, purge_interval=60.0):
+        self.bind = bind
+        self.ttl = ttl
+        self.purge_batch_size = purge_batch_size
+        self.purge_interval = purge_interval
+        self._last_purge = time.monotonic()
+        self._purge_lock = threading.Lock()
+
+    def set(self, user_id, token):
+        expires_at = time.time() + self.ttl
+        statement = sqlite_insert(SessionToken).values(
+            user_id=user_id, token=token, expires_at=expires_at
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[SessionToken.user_id],
+            set_={"token": token, "expires_at": expires_at},
+        )
+        with self.bind.begin() as connection:
+            connection.execute(statement)
+        self._maybe_purge()
+
+    def get(self, user_id):
+        statement = select(SessionToken.token).where(
+            SessionToken.user_id == user_id, SessionToken.expires_at > time.time()
+        )
+        with self.bind.connect() as connection:
+            return connection.execute(statement).scalar()
+
+    def delete(self, user_id):
+        with self.bind.begin() as connection:
+            connection.execute(
+                delete(SessionToken).where(SessionToken.user_id == user_id)
+            )
+
+    def purge_expired(self):
+        expired = (
+            select(SessionToken.user_id)
+            .where(SessionToken.expires_at <= time.time())
+            .limit(self.purge_batch_size)
+        )
+        with self.bind.begin() as connection:
+            result = connection.execute(
+                delete(SessionToken).where(SessionToken.user_id.in_(expired))
+            )
+        return result.rowcount
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < self.purge_interval:
+            return
+        if not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_purge = now
+            self.purge_expired()
+        finally:
+            self._purge_lock.release()
+
+    def __len__(self):
+        statement = select(func.count()).where(SessionToken.expires_at > time.time())
+        with self.bind.connect() as connection:
+            return connection.execute(statement).scalar()
+
+
+def build_token_store(config, bind=None):
+    """
+    Create the token store selected by ``TOKEN_STORE_BACKEND``.
+
+    Args:
+        config (Mapping): The application configuration.
+        bind (Engine | None): The engine of the ``"sqlite"`` backend, the
+                              process-wide ``engine`` by default.
+
+    Returns:
+        TokenStore: A ``MemoryTokenStore`` for ``"memory"`` or a
+        ``SQLiteTokenStore`` for ``"sqlite"``.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    backend = config["TOKEN_STORE_BACKEND"]
+    ttl = config["TOKEN_TTL"]
+    if backend == "memory":
+        return MemoryTokenStore(
+            ttl,
+            max_entries=config["TOKEN_STORE_MAX_ENTRIES"],
+            purge_batch_size=config["TOKEN_PURGE_BATCH_SIZE"],
+        )
+    if backend == "sqlite":
+        return SQLiteTokenStore(
+            bind or engine, ttl, purge_batch_size=config["TOKEN_PURGE_BATCH_SIZE"]
+        )
+    raise ValueError(f"Unknown token store backend: {backend}")
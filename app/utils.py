@@ -4,6 +4,9 @@ Authentication routes for user registration, login, logout, and profile manageme
 
 from typing import Dict, Any
 
+from .extensions import password_hasher
+
+
 def update_user_info(user: Any, data: Dict[str, Any]) -> None:
     """
     Update the user object with the provided data.
@@ -20,5 +23,5 @@ def update_user_info(user: Any, data: Dict[str, Any]) -> None:
         user.email = data["email"]
     if "phone" in data:
         user.phone = data["phone"]
-    if "password" in data:
-        user.set_password(data["password"])
+    if data.get("password"):
+        password_hasher.set_password(user, data["password"])
@@ -0,0 +1,12 @@
+"""
+Reproducible benchmarks of the Flask routes.
+
+- ``python -m benchmarks.seed`` fills the database with generated users, games
+  and guides.
+- ``python -m benchmarks.micro`` times single routes through the test client.
+- ``python -m benchmarks.load`` drives a local server from concurrent threads.
+
+Both benchmarks report p50/p95/p99 latency and queries per request as JSON, so
+results of different commits can be compared. Point ``DATABASE_URL`` at a
+scratch database to keep ``helps.db`` untouched.
+"""
@@ -0,0 +1,151 @@
+"""
+Concurrent load against a local server.
+
+A threaded Werkzeug server runs the application in this process, so the
+statements executed per request can be counted. Every worker thread logs in as
+a seeded user (see ``benchmarks.seed``) and then requests a weighted mix of
+pages for ``--duration`` seconds. ``--url`` targets an already
+running server instead; queries per request are then not reported.
+"""
+
+import argparse
+import itertools
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from werkzeug.serving import make_server
+
+from db import engine
+from benchmarks.report import QueryCounter, summarize, write_report
+from benchmarks.seed import SEED_PASSWORD
+
+
+# Relative weight of each page in the request mix.
+MIX = {
+    "/": 4,
+    "/help_o": 3,
+    "/guide/{guide_id}": 6,
+    "/search?q=boss": 1,
+}
+
+
+def _login(opener, base_url, user_id):
+    data = urllib.parse.urlencode(
+        {"identifier": f"user{user_id}@example.com", "password": SEED_PASSWORD}
+    )
+    with opener.open(base_url + "/login", data.encode(), timeout=30) as response:
+        response.read()
+
+
+def _worker(base_url, deadline, guides, user_id, seed, latencies, errors):
+    rng = random.Random(seed)
+    paths, weights = zip(*MIX.items())
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(CookieJar())
+    )
+    _login(opener, base_url, user_id)
+    while time.monotonic() < deadline:
+        path = rng.choices(paths, weights)[0].format(
+            guide_id=rng.randint(1, guides)
+        )
+        start = time.perf_counter()
+        try:
+            with opener.open(base_url + path, timeout=30) as response:
+                response.read()
+        except (urllib.error.URLError, OSError):
+            errors.append(path)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def run(threads=8, duration=10.0, guides=1000, users=100, url=None, seed=42):
+    """
+    Request the page mix from concurrent threads.
+
+    Args:
+        threads (int): Number of client threads.
+        duration (float): Seconds to generate load for.
+        guides (int): Highest guide ID requested.
+        users (int): Number of seeded users the threads log in as.
+        url (str | None): Base URL of a running server; None starts one.
+        seed (int): Seed of the request mix.
+
+    Returns:
+        dict: The latency summary, throughput and error count.
+    """
+    server = None
+    if url is None:
+        from app import app
+
+        app.config["RATE_LIMIT_ENABLED"] = False
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+
+    latencies, errors = [], []
+    seeds = itertools.count(seed)
+    with QueryCounter(engine) as queries:
+        deadline = time.monotonic() + duration
+        workers = [
+            threading.Thread(
+                target=_worker,
+                args=(
+                    url,
+                    deadline,
+                    guides,
+                    number % users + 1,
+                    next(seeds),
+                    latencies,
+                    errors,
+                ),
+            )
+            for number in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        executed = queries.take() if server is not None else None
+
+    if server is not None:
+        server.shutdown()
+
+    summary = summarize(latencies, executed)
+    summary["errors"] = len(errors)
+    summary["requests_per_second"] = round(len(latencies) / elapsed, 1)
+    return {"mix": summary}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--guides", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--url", help="base URL of an already running server")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    settings = {
+        "threads": args.threads,
+        "duration": args.duration,
+        "guides": args.guides,
+        "users": args.users,
+        "url": args.url,
+        "seed": args.seed,
+    }
+    results = run(**settings)
+    settings["mix"] = MIX
+    write_report("load", settings, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Micro-benchmarks of single routes through the Flask test client.
+
+Every scenario runs ``--warmup`` untimed requests and then ``--iterations``
+timed ones against the seeded database (see ``benchmarks.seed``). Rate limiting
+is switched off so that repeated logins are measured rather than rejected.
+"""
+
+import argparse
+import itertools
+import time
+
+from sqlalchemy import func, select
+
+from db import db_session, engine, Guide, User
+from benchmarks.report import QueryCounter, summarize, write_report
+from benchmarks.seed import SEED_PASSWORD
+
+
+def _scenarios(client, guide_count, user_count):
+    guide_ids = itertools.cycle(range(1, guide_count + 1))
+    user_ids = itertools.cycle(range(1, user_count + 1))
+    search_terms = itertools.cycle(("boss", "speedrun", "secret ending", "raid"))
+
+    def login():
+        return client.post(
+            "/login",
+            data={
+                "identifier": f"user{next(user_ids)}@example.com",
+                "password": SEED_PASSWORD,
+            },
+        )
+
+    return {
+        "index": lambda: client.get("/"),
+        "help_other_games": lambda: client.get("/help_o"),
+        "view_guide": lambda: client.get(f"/guide/{next(guide_ids)}"),
+        "profile_search": lambda: client.get(
+            "/profile", query_string={"search": next(search_terms)}
+        ),
+        "login": login,
+    }
+
+
+def run(iterations=200, warmup=20, login_iterations=20, fragment_cache=True):
+    """
+    Run every scenario and summarize its latencies and queries.
+
+    Args:
+        iterations (int): Timed requests per scenario.
+        warmup (int): Untimed requests per scenario before timing.
+        login_iterations (int): Timed requests of the login scenario, which is
+                                dominated by password hashing.
+        fragment_cache (bool): Whether rendered fragments are cached.
+
+    Returns:
+        dict: Summaries keyed by scenario name.
+    """
+    from app import app
+
+    app.config["RATE_LIMIT_ENABLED"] = False
+    app.jinja_env.fragment_cache.enabled = fragment_cache
+    with app.app_context():
+        guide_count = db_session.scalar(select(func.count()).select_from(Guide))
+        user_count = db_session.scalar(select(func.count()).select_from(User))
+    if not guide_count:
+        raise SystemExit("The database is empty; run python -m benchmarks.seed first.")
+
+    client = app.test_client()
+    client.post(
+        "/login", data={"identifier": "user1@example.com", "password": SEED_PASSWORD}
+    )
+
+    results = {}
+    with QueryCounter(engine) as queries:
+        for name, request in _scenarios(client, guide_count, user_count).items():
+            for _ in range(warmup):
+                request()
+            timed = login_iterations if name == "login" else iterations
+            latencies = []
+            queries.take()
+            for _ in range(timed):
+                start = time.perf_counter()
+                response = request()
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    raise SystemExit(f"{name} failed with {response.status_code}.")
+            results[name] = summarize(latencies, queries.take())
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--login-iterations", type=int, default=20)
+    parser.add_argument(
+        "--no-fragment-cache",
+        dest="fragment_cache",
+        action="store_false",
+        help="render every fragment instead of serving it from the cache",
+    )
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    settings = {
+        "iterations": args.iterations,
+        "warmup": args.warmup,
+        "login_iterations": args.login_iterations,
+        "fragment_cache": args.fragment_cache,
+    }
+    results = run(**settings)
+    write_report("micro", settings, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
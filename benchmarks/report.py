@@ -0,0 +1,131 @@
+"""
+Latency statistics, query counting and JSON reports shared by the benchmarks.
+"""
+
+import json
+import platform
+import subprocess
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+
+def percentile(sorted_values, fraction):
+    """
+    Linearly interpolated percentile of already sorted values.
+
+    Args:
+        sorted_values (Sequence[float]): The values in ascending order.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float | None: The percentile, or None without values.
+    """
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def summarize(latencies, queries=None):
+    """
+    Summarize request latencies in seconds.
+
+    Args:
+        latencies (Iterable[float]): Latency of each request in seconds.
+        queries (int | None): Statements executed by all the requests, if known.
+
+    Returns:
+        dict: Request count, mean and p50/p95/p99 latency in milliseconds, and
+        queries per request.
+    """
+    values = sorted(latency * 1000 for latency in latencies)
+    count = len(values)
+
+    def rounded(value):
+        return None if value is None else round(value, 3)
+
+    return {
+        "requests": count,
+        "mean_ms": rounded(sum(values) / count if count else None),
+        "p50_ms": rounded(percentile(values, 0.50)),
+        "p95_ms": rounded(percentile(values, 0.95)),
+        "p99_ms": rounded(percentile(values, 0.99)),
+        "queries_per_request": (
+            round(queries / count, 3) if queries is not None and count else None
+        ),
+    }
+
+
+class QueryCounter:
+    """
+    Count the statements executed on an engine while the counter is active.
+
+    Use it as a context manager.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _executed(self, *args):
+        with self._lock:
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "after_cursor_execute", self._executed)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "after_cursor_execute", self._executed)
+
+    def take(self):
+        """
+        Return the count so far and reset it.
+        """
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(benchmark, settings, results, output=None):
+    """
+    Write a benchmark report as JSON.
+
+    Args:
+        benchmark (str): Name of the benchmark.
+        settings (dict): Parameters the benchmark ran with.
+        results (dict): Summaries keyed by scenario name.
+        output (str | None): Path of the report file; None prints it.
+    """
+    report = {
+        "benchmark": benchmark,
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "settings": settings,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output is None:
+        print(text)
+    else:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
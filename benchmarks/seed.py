@@ -0,0 +1,132 @@
+"""
+Seed the database with generated users, games and guides.
+
+The data is derived from a random seed, so the same arguments always produce
+the same database. All users share the password ``SEED_PASSWORD`` and are named
+``user<N>`` with the email ``user<N>@example.com``.
+"""
+
+import argparse
+import random
+
+from sqlalchemy import delete, insert
+
+from db import (
+    engine as default_engine,
+    Game,
+    Guide,
+    GuideViewStat,
+    SessionToken,
+    User,
+)
+from db.base import utcnow
+from db.models.user import normalize_email, normalize_phone
+from db.migrations import migrate
+
+
+SEED_PASSWORD = "benchmark-password"
+
+_WORDS = (
+    "boss dungeon speedrun secret ending quest build strategy raid puzzle "
+    "level map weapon armor skill combo glitch route guide tips farming"
+).split()
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def seed_database(
+    password_hash,
+    users=100,
+    games=20,
+    guides=1000,
+    seed=42,
+    engine=default_engine,
+    batch_size=1000,
+):
+    """
+    Replace the users, games and guides with generated ones.
+
+    Args:
+        password_hash (str): Password hash stored for every user.
+        users (int): Number of users.
+        games (int): Number of games.
+        guides (int): Number of guides, spread randomly over users and games.
+        seed (int): Seed of the random generator.
+        engine (Engine): The database engine.
+        batch_size (int): Rows inserted per statement.
+    """
+    rng = random.Random(seed)
+    now = utcnow()
+    migrate(engine)
+
+    with engine.begin() as connection:
+        for model in (GuideViewStat, SessionToken, Guide, Game, User):
+            connection.execute(delete(model))
+
+        connection.execute(
+            insert(User),
+            [
+                {
+                    "id": number,
+                    "username": f"user{number}",
+                    "email": f"user{number}@example.com",
+                    "email_normalized": normalize_email(f"user{number}@example.com"),
+                    "phone": f"+1555{number:07d}",
+                    "phone_normalized": normalize_phone(f"+1555{number:07d}"),
+                    "password_hash": password_hash,
+                }
+                for number in range(1, users + 1)
+            ],
+        )
+        connection.execute(
+            insert(Game),
+            [
+                {"id": number, "name": f"Game {number}", "updated_at": now}
+                for number in range(1, games + 1)
+            ],
+        )
+        for start in range(1, guides + 1, batch_size):
+            connection.execute(
+                insert(Guide),
+                [
+                    {
+                        "id": number,
+                        "title": _sentence(rng, 4).capitalize(),
+                        "content": _sentence(rng, 80),
+                        "link": f"http://example.com/guides/{number}",
+                        "video": f"http://example.com/videos/{number}",
+                        "image": f"http://example.com/images/{number}.png",
+                        "usage_count": rng.randint(0, 1000),
+                        "user_id": rng.randint(1, users),
+                        "game_id": rng.randint(1, games),
+                        "updated_at": now,
+                    }
+                    for number in range(start, min(start + batch_size, guides + 1))
+                ],
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--guides", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from app import app
+
+    seed_database(
+        app.extensions["password_hasher"].hash_password(SEED_PASSWORD),
+        users=args.users,
+        games=args.games,
+        guides=args.guides,
+        seed=args.seed,
+    )
+    print(f"Seeded {args.users} users, {args.games} games and {args.guides} guides.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Cold-start benchmark: time fresh interpreters importing and creating the app.
+
+Every scenario starts ``--runs`` new Python processes that execute one
+statement, so nothing is shared between runs but the operating system's file
+cache. ``interpreter`` is the cost of starting Python itself.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.report import summarize, write_report
+
+
+SCENARIOS = {
+    "interpreter": "pass",
+    "import_app": "import app",
+    "create_app": "from app import create_app; create_app()",
+    "import_main": "import main",
+}
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _time_process(statement):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def run(runs, warmup):
+    """
+    Time every scenario.
+
+    Args:
+        runs (int): Timed processes per scenario.
+        warmup (int): Untimed processes started first, to warm the file cache.
+
+    Returns:
+        dict: Latency summaries keyed by scenario name.
+    """
+    results = {}
+    for name, statement in SCENARIOS.items():
+        for _ in range(warmup):
+            _time_process(statement)
+        latencies = [_time_process(statement) for _ in range(runs)]
+        results[name] = summarize(latencies)
+        results[name]["min_ms"] = round(min(latencies) * 1000, 3)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    settings = {"runs": args.runs, "warmup": args.warmup}
+    write_report("startup", settings, run(**settings), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,50 @@ This module initializes the database package by exposing key components such as
 Base, engine, session, and models (User, Game, Guide).
 """
 
-from .base import Base, engine, Session, session as db_session
+from .base import (
+    Base,
+    engine,
+    Session,
+    session as db_session,
+    build_engine,
+    get_engine,
+    DATABASE_CONFIG,
+    PROCESS_SETTINGS,
+    commit_with_retry,
+    write_transaction,
+)
 from .models.user import User
 from .models.game import Game
 from .models.guide import Guide
+from .models.view_stat import GuideViewStat
+from .models.session_token import SessionToken
+from .models.rate_limit import RateLimitCounter
+from .search import ensure_search_index, search_guides
+from .counters import usage_counter
+from .leaderboard import leaderboard
+from .services import DatabaseServices, build_database_services
 
 __all__ = [
     "Base",
     "engine",
     "Session",
     "db_session",
+    "build_engine",
+    "get_engine",
+    "DATABASE_CONFIG",
+    "PROCESS_SETTINGS",
+    "commit_with_retry",
+    "write_transaction",
     "User",
     "Game",
     "Guide",
+    "GuideViewStat",
+    "SessionToken",
+    "RateLimitCounter",
+    "ensure_search_index",
+    "search_guides",
+    "usage_counter",
+    "leaderboard",
+    "DatabaseServices",
+    "build_database_services",
 ]
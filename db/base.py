@@ -1,7 +1,23 @@
 # db/base.py
 
-from sqlalchemy import create_engine, Integer
-from sqlalchemy.orm import declarative_base, sessionmaker, Mapped, mapped_column
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, event, inspect, Integer
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import (
+    declarative_base,
+    sessionmaker,
+    scoped_session,
+    Mapped,
+    mapped_column,
+)
+from flask import current_app, has_app_context
+from flask.globals import app_ctx
 
 
 Base = declarative_base()
@@ -17,6 +33,230 @@ class BaseModel(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
 
-engine = create_engine("sqlite:///helps.db")
-Session = sessionmaker(bind=engine)
-session = Session()
+# Engine settings, overridable through environment variables so every worker
+# process (Werkzeug threaded server, gunicorn) can be tuned without code changes.
+DATABASE_CONFIG = {
+    "DATABASE_URL": os.environ.get("DATABASE_URL", "sqlite:///helps.db"),
+    "DB_POOL_SIZE": int(os.environ.get("DB_POOL_SIZE", "5")),
+    "DB_MAX_OVERFLOW": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+    "DB_POOL_TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+    "DB_POOL_RECYCLE": int(os.environ.get("DB_POOL_RECYCLE", "3600")),
+    "DB_POOL_PRE_PING": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    "SQLITE_PROFILE": os.environ.get("SQLITE_PROFILE", "production"),
+    "SQLITE_BUSY_TIMEOUT": int(os.environ.get("SQLITE_BUSY_TIMEOUT", "5000")),
+    "DB_COMMIT_RETRIES": int(os.environ.get("DB_COMMIT_RETRIES", "5")),
+    "DB_COMMIT_BACKOFF": float(os.environ.get("DB_COMMIT_BACKOFF", "0.05")),
+    "USAGE_COUNTER_FLUSH_INTERVAL": float(
+        os.environ.get("USAGE_COUNTER_FLUSH_INTERVAL", "5")
+    ),
+    "USAGE_COUNTER_FLUSH_THRESHOLD": int(
+        os.environ.get("USAGE_COUNTER_FLUSH_THRESHOLD", "500")
+    ),
+    "LEADERBOARD_CAPACITY": int(os.environ.get("LEADERBOARD_CAPACITY", "50")),
+    "LEADERBOARD_REFRESH_INTERVAL": float(
+        os.environ.get("LEADERBOARD_REFRESH_INTERVAL", "60")
+    ),
+}
+
+# Settings read when an engine and its background services are created. An
+# application overriding one of them gets services of its own (see
+# ``db.services``); the others are read from the configuration on every use.
+PROCESS_SETTINGS = frozenset(DATABASE_CONFIG) - {
+    "DB_COMMIT_RETRIES",
+    "DB_COMMIT_BACKOFF",
+}
+
+# PRAGMA statements applied to every new SQLite connection, by profile name.
+# WAL lets readers keep going while a writer commits; NORMAL synchronous is
+# durable across application crashes in WAL mode and avoids an fsync per commit.
+SQLITE_PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def build_engine(config=None):
+    """
+    Create the SQLAlchemy engine from a configuration mapping.
+
+    Args:
+        config (Mapping): Settings using the keys of ``DATABASE_CONFIG``. Missing
+                          keys fall back to the module defaults.
+
+    Returns:
+        Engine: A configured engine with a connection pool sized for threaded workers.
+    """
+    settings = {**DATABASE_CONFIG, **(config or {})}
+    url = settings["DATABASE_URL"]
+
+    options = {"pool_pre_ping": settings["DB_POOL_PRE_PING"]}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # In-memory databases live in a single connection; keep the default pool.
+        return create_engine(url, **options)
+
+    if url.startswith("sqlite"):
+        # File databases can be shared between the threads of one process.
+        options["connect_args"] = {"check_same_thread": False}
+    options.update(
+        pool_size=settings["DB_POOL_SIZE"],
+        max_overflow=settings["DB_MAX_OVERFLOW"],
+        pool_timeout=settings["DB_POOL_TIMEOUT"],
+        pool_recycle=settings["DB_POOL_RECYCLE"],
+    )
+    new_engine = create_engine(url, **options)
+
+    if url.startswith("sqlite"):
+        pragmas = dict(SQLITE_PROFILES[settings["SQLITE_PROFILE"]])
+        pragmas["busy_timeout"] = settings["SQLITE_BUSY_TIMEOUT"]
+        _install_sqlite_pragmas(new_engine, pragmas)
+    return new_engine
+
+
+def _install_sqlite_pragmas(target_engine, pragmas):
+    """
+    Apply the given PRAGMA settings to every connection the engine opens.
+
+    Args:
+        target_engine (Engine): The SQLite engine to configure.
+        pragmas (dict): PRAGMA names mapped to their values.
+    """
+
+    @event.listens_for(target_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _session_scope():
+    """
+    Scope sessions to the current Flask application context, falling back to the
+    current thread when no context is active (CLI scripts, background threads).
+    """
+    if has_app_context():
+        return id(app_ctx._get_current_object())
+    return threading.get_ident()
+
+
+def utcnow():
+    """
+    Return the current UTC time as a naive datetime, as stored in the database.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def get_engine():
+    """
+    Return the engine of the current application.
+
+    Returns:
+        Engine: The engine of the application in context if it has its own
+        database settings, otherwise the process-wide ``engine``.
+    """
+    if has_app_context():
+        services = current_app.extensions.get("database")
+        if services is not None:
+            return services.engine
+    return engine
+
+
+# The process-wide engine, built from ``DATABASE_CONFIG``.
+engine = build_engine()
+Session = sessionmaker()
+session = scoped_session(lambda: Session(bind=get_engine()), scopefunc=_session_scope)
+
+
+@contextmanager
+def write_transaction(target_engine):
+    """
+    Open a connection in a transaction that holds the write lock from the start.
+
+    On SQLite the transaction starts with ``BEGIN IMMEDIATE``, so it waits for
+    the lock up front (honouring ``busy_timeout``) instead of failing when a
+    read turns into a write.
+
+    Args:
+        target_engine (Engine): The database engine.
+
+    Yields:
+        Connection: The connection; committed on exit, rolled back on errors.
+    """
+    with target_engine.connect() as connection:
+        if target_engine.dialect.name == "sqlite":
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+
+def _is_lock_error(error):
+    """
+    Check whether an OperationalError was raised because SQLite was busy.
+    """
+    message = str(error.orig).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def commit_with_retry(db_session, apply=None, retries=None, backoff=None):
+    """
+    Commit the session, retrying with exponential backoff while SQLite is locked.
+
+    Objects that were pending before the first attempt are added back after each
+    rollback, and ``apply`` is re-run so changes to persistent objects survive it.
+
+    Args:
+        db_session (Session): The session to commit.
+        apply (callable): Optional function applying changes, called before every attempt.
+        retries (int): Maximum number of retries, defaults to ``DB_COMMIT_RETRIES``.
+        backoff (float): Base delay in seconds, defaults to ``DB_COMMIT_BACKOFF``.
+
+    The defaults come from the current application's configuration, or from
+    ``DATABASE_CONFIG`` outside an application context.
+
+    Raises:
+        OperationalError: If the database stays locked after all retries, or for
+                          any other operational error.
+    """
+    settings = current_app.config if has_app_context() else DATABASE_CONFIG
+    retries = settings["DB_COMMIT_RETRIES"] if retries is None else retries
+    backoff = settings["DB_COMMIT_BACKOFF"] if backoff is None else backoff
+
+    pending = [
+        (obj, {attr.key: getattr(obj, attr.key) for attr in _primary_key_attrs(obj)})
+        for obj in db_session.new
+    ]
+    for attempt in range(retries + 1):
+        try:
+            if apply is not None:
+                apply()
+            db_session.commit()
+            return
+        except OperationalError as error:
+            db_session.rollback()
+            if attempt == retries or not _is_lock_error(error):
+                raise
+            for obj, identity in pending:
+                for key, value in identity.items():
+                    setattr(obj, key, value)
+                db_session.add(obj)
+            time.sleep(backoff * (2**attempt) * (1 + random.random()))
+
+
+def _primary_key_attrs(obj):
+    """
+    Return the mapped attributes making up the primary key of an ORM object.
+    """
+    mapper = inspect(obj).mapper
+    return [mapper.get_property_by_column(column) for column in mapper.primary_key]
@@ -0,0 +1,207 @@
+"""
+This module implements a write-behind counter for ``Guide.usage_count``.
+
+Views are accumulated in memory and written as one batched ``UPDATE ... CASE``
+statement, either periodically or once enough increments are pending, so
+counting a view never turns a read request into a database write. The same
+flush adds the views to hourly ``guide_view_stats`` buckets for time-windowed
+rankings.
+
+The buckets are updated with plain UPDATE and INSERT statements inside a
+write transaction rather than a dialect-specific upsert, and only for guides
+that still exist.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import bindparam, case, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.base import DATABASE_CONFIG, engine, write_transaction
+from db.models.guide import Guide
+from db.models.view_stat import GuideViewStat
+
+
+logger = logging.getLogger(__name__)
+
+
+class UsageCounter:
+    """
+    Thread-safe in-memory accumulator of guide views with background flushing.
+    """
+
+    def __init__(self, bind, flush_interval=5.0, flush_threshold=500):
+        """
+        Args:
+            bind (Engine): The engine used to write the counts.
+            flush_interval (float): Seconds between periodic flushes.
+            flush_threshold (int): Number of pending increments that triggers an
+                                   early flush.
+        """
+        self.bind = bind
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending = Counter()
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def increment(self, guide_id, amount=1):
+        """
+        Record views of a guide. Only touches memory; the write happens later.
+
+        Args:
+            guide_id (int): The guide that was viewed.
+            amount (int): Number of views to add.
+        """
+        with self._lock:
+            self._pending[guide_id] += amount
+            self._pending_total += amount
+            over_threshold = self._pending_total >= self.flush_threshold
+        if self._thread is None:
+            self.start()
+        if over_threshold:
+            self._wake.set()
+
+    def pending(self):
+        """
+        Return a snapshot of the increments not yet written to the database.
+        """
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """
+        Write all pending increments in a single UPDATE statement.
+
+        Increments are put back if the write fails, so no views are lost.
+
+        Returns:
+            dict: The increments that were written, keyed by guide ID.
+        """
+        with self._flush_lock:
+            with self._lock:
+                counts, self._pending = self._pending, Counter()
+                self._pending_total = 0
+            if not counts:
+                return {}
+
+            statement = (
+                update(Guide)
+                .where(Guide.id.in_(counts))
+                .values(
+                    usage_count=Guide.usage_count
+                    + case(counts, value=Guide.id, else_=0),
+                    # View counts do not change the page, so keep its validators.
+                    updated_at=Guide.updated_at,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            try:
+                with write_transaction(self.bind) as connection:
+                    connection.execute(statement)
+                    self._add_hourly_views(connection, counts)
+            except SQLAlchemyError as error:
+                logger.error("Failed to flush guide usage counts: %s", error)
+                with self._lock:
+                    self._pending.update(counts)
+                    self._pending_total += sum(counts.values())
+                return {}
+
+        for listener in self._listeners:
+            listener(counts)
+        return dict(counts)
+
+    @staticmethod
+    def _add_hourly_views(connection, counts):
+        hour = int(time.time() // 3600)
+        existing = set(
+            connection.scalars(select(Guide.id).where(Guide.id.in_(counts)))
+        )
+        counted = set(
+            connection.scalars(
+                select(GuideViewStat.guide_id).where(
+                    GuideViewStat.hour == hour, GuideViewStat.guide_id.in_(existing)
+                )
+            )
+        )
+        rows = [
+            {"stat_guide_id": guide_id, "stat_hour": hour, "stat_views": views}
+            for guide_id, views in counts.items()
+            if guide_id in existing
+        ]
+        updates = [row for row in rows if row["stat_guide_id"] in counted]
+        inserts = [row for row in rows if row["stat_guide_id"] not in counted]
+        if updates:
+            connection.execute(
+                update(GuideViewStat)
+                .where(
+                    GuideViewStat.guide_id == bindparam("stat_guide_id"),
+                    GuideViewStat.hour == bindparam("stat_hour"),
+                )
+                .values(views=GuideViewStat.views + bindparam("stat_views"))
+                .execution_options(synchronize_session=False),
+                updates,
+            )
+        if inserts:
+            connection.execute(
+                insert(GuideViewStat).values(
+                    guide_id=bindparam("stat_guide_id"),
+                    hour=bindparam("stat_hour"),
+                    views=bindparam("stat_views"),
+                ),
+                inserts,
+            )
+
+    def add_flush_listener(self, listener):
+        """
+        Register a callable that receives the written increments after every flush.
+
+        Args:
+            listener (callable): Called with a mapping of guide ID to views added.
+        """
+        self._listeners.append(listener)
+
+    def start(self):
+        """
+        Start the background flush thread and register the shutdown flush.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="usage-counter-flush", daemon=True
+            )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Stop the background thread and flush whatever is still pending.
+        """
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+usage_counter = UsageCounter(
+    engine,
+    flush_interval=DATABASE_CONFIG["USAGE_COUNTER_FLUSH_INTERVAL"],
+    flush_threshold=DATABASE_CONFIG["USAGE_COUNTER_FLUSH_THRESHOLD"],
+)
@@ -0,0 +1,229 @@
+"""
+This module keeps the most used guides in memory for the homepage ranking.
+
+The leaderboard holds the top ``capacity`` guides ordered by ``usage_count``.
+It is updated incrementally from the usage counter's flushes, fully re-synced
+from the ``usage_count`` index periodically or after guides or games change,
+and serves per-game and time-windowed rankings from indexed queries.
+"""
+
+import threading
+import time
+import weakref
+from typing import NamedTuple
+
+from sqlalchemy import event, func, select
+
+from db.base import DATABASE_CONFIG, engine
+from db.counters import usage_counter
+from db.models.game import Game
+from db.models.guide import Guide
+from db.models.view_stat import GuideViewStat
+
+
+class LeaderboardEntry(NamedTuple):
+    """
+    A ranked guide with the columns the templates display.
+    """
+
+    id: int
+    title: str
+    game_name: str
+    usage_count: int
+
+
+_ENTRY_COLUMNS = (
+    Guide.id,
+    Guide.title,
+    Game.name.label("game_name"),
+    Guide.usage_count,
+)
+
+
+# Every leaderboard of the process, invalidated together when guides change.
+_leaderboards = weakref.WeakSet()
+
+
+def _sort_key(entry):
+    return (-entry.usage_count, entry.id)
+
+
+class Leaderboard:
+    """
+    In-process top-K ranking of guides by usage count.
+    """
+
+    def __init__(self, bind, capacity=50, refresh_interval=60.0):
+        """
+        Args:
+            bind (Engine): The engine used to query rankings.
+            capacity (int): Number of guides kept in memory; larger than any page
+                            requests so increments rarely need a full re-sync.
+            refresh_interval (float): Maximum age in seconds of the in-memory ranking
+                                      and of cached time-windowed rankings.
+        """
+        self.bind = bind
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self._entries = []
+        self._synced_at = None
+        self._windows = {}
+        self._lock = threading.Lock()
+        _leaderboards.add(self)
+
+    def top(self, limit=5):
+        """
+        Return the most used guides without querying the database on a warm cache.
+
+        Args:
+            limit (int): Number of guides to return, at most ``capacity``.
+
+        Returns:
+            list[LeaderboardEntry]: Guides ordered by usage count, highest first.
+        """
+        with self._lock:
+            stale = (
+                self._synced_at is None
+                or time.monotonic() - self._synced_at > self.refresh_interval
+            )
+        if stale:
+            self.sync()
+        with self._lock:
+            return self._entries[:limit]
+
+    def sync(self):
+        """
+        Reload the top ``capacity`` guides from the ``usage_count`` index.
+        """
+        statement = (
+            select(*_ENTRY_COLUMNS)
+            .join(Game, Guide.game_id == Game.id)
+            .order_by(Guide.usage_count.desc(), Guide.id)
+            .limit(self.capacity)
+        )
+        with self.bind.connect() as connection:
+            entries = [LeaderboardEntry(*row) for row in connection.execute(statement)]
+        with self._lock:
+            self._entries = entries
+            self._synced_at = time.monotonic()
+
+    def invalidate(self):
+        """
+        Force a re-sync and drop cached windows on the next read.
+        """
+        with self._lock:
+            self._synced_at = None
+            self._windows.clear()
+
+    def apply_increments(self, counts):
+        """
+        Merge freshly flushed usage counts into the in-memory ranking.
+
+        Only the flushed guides are re-read, so the cost is one indexed lookup per
+        flush rather than a sort per page view.
+
+        Args:
+            counts (Mapping[int, int]): Views added per guide ID.
+        """
+        with self._lock:
+            if self._synced_at is None:
+                return
+        statement = (
+            select(*_ENTRY_COLUMNS)
+            .join(Game, Guide.game_id == Game.id)
+            .where(Guide.id.in_(list(counts)))
+        )
+        with self.bind.connect() as connection:
+            updated = {
+                row.id: LeaderboardEntry(*row) for row in connection.execute(statement)
+            }
+        with self._lock:
+            merged = {entry.id: entry for entry in self._entries}
+            merged.update(updated)
+            self._entries = sorted(merged.values(), key=_sort_key)[: self.capacity]
+
+    def top_for_game(self, game_id, limit=5):
+        """
+        Return the most used guides of one game.
+
+        Served by the ``(game_id, usage_count)`` index, so no sort is needed.
+
+        Args:
+            game_id (int): The game ID.
+            limit (int): Number of guides to return.
+
+        Returns:
+            list[LeaderboardEntry]: Guides ordered by usage count, highest first.
+        """
+        statement = (
+            select(*_ENTRY_COLUMNS)
+            .join(Game, Guide.game_id == Game.id)
+            .where(Guide.game_id == game_id)
+            .order_by(Guide.usage_count.desc(), Guide.id)
+            .limit(limit)
+        )
+        with self.bind.connect() as connection:
+            return [LeaderboardEntry(*row) for row in connection.execute(statement)]
+
+    def top_in_window(self, hours, limit=5):
+        """
+        Return the most viewed guides during the last ``hours`` hours.
+
+        Counts come from the hourly ``guide_view_stats`` buckets; results are cached
+        for ``refresh_interval`` seconds per window.
+
+        Args:
+            hours (int): Size of the window, e.g. 24 or 24 * 7.
+            limit (int): Number of guides to return.
+
+        Returns:
+            list[LeaderboardEntry]: Guides with their views inside the window as
+            ``usage_count``, highest first.
+        """
+        key = (hours, limit)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._windows.get(key)
+            if cached is not None and now - cached[0] <= self.refresh_interval:
+                return cached[1]
+
+        first_hour = int(time.time() // 3600) - hours + 1
+        views = func.sum(GuideViewStat.views).label("views")
+        window = (
+            select(GuideViewStat.guide_id, views)
+            .where(GuideViewStat.hour >= first_hour)
+            .group_by(GuideViewStat.guide_id)
+            .subquery()
+        )
+        statement = (
+            select(
+                Guide.id, Guide.title, Game.name.label("game_name"), window.c.views
+            )
+            .join(window, window.c.guide_id == Guide.id)
+            .join(Game, Guide.game_id == Game.id)
+            .order_by(window.c.views.desc(), Guide.id)
+            .limit(limit)
+        )
+        with self.bind.connect() as connection:
+            entries = [LeaderboardEntry(*row) for row in connection.execute(statement)]
+        with self._lock:
+            self._windows[key] = (now, entries)
+        return entries
+
+
+leaderboard = Leaderboard(
+    engine,
+    capacity=DATABASE_CONFIG["LEADERBOARD_CAPACITY"],
+    refresh_interval=DATABASE_CONFIG["LEADERBOARD_REFRESH_INTERVAL"],
+)
+usage_counter.add_flush_listener(leaderboard.apply_increments)
+
+
+@event.listens_for(Guide, "after_insert")
+@event.listens_for(Guide, "after_update")
+@event.listens_for(Guide, "after_delete")
+@event.listens_for(Game, "after_update")
+@event.listens_for(Game, "after_delete")
+def _invalidate_leaderboard(mapper, connection, target):
+    for board in list(_leaderboards):
+        board.invalidate()
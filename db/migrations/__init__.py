@@ -0,0 +1,42 @@
+"""
+Schema migrations.
+
+Migrations are numbered functions registered in ``db.migrations.versions``.
+The versions applied to a database are recorded in ``schema_migrations``.
+Run them with ``flask --app main db upgrade``.
+
+Long data changes go through ``backfill`` and ``rebuild_table``, which work in
+short, resumable transactions so a migration can run against a live database.
+"""
+
+from .operations import backfill, create_indexes, rebuild_table, write_transaction
+from .runner import (
+    MIGRATIONS,
+    Migration,
+    MigrationLocked,
+    applied_versions,
+    current_version,
+    migrate,
+    migration,
+    migration_lock,
+    pending_migrations,
+    release_migration_lock,
+)
+from . import versions
+
+__all__ = [
+    "MIGRATIONS",
+    "Migration",
+    "MigrationLocked",
+    "applied_versions",
+    "backfill",
+    "create_indexes",
+    "current_version",
+    "migrate",
+    "migration",
+    "migration_lock",
+    "pending_migrations",
+    "rebuild_table",
+    "release_migration_lock",
+    "write_transaction",
+]
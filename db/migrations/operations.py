@@ -0,0 +1,413 @@
+"""
+Schema operations that keep write locks short.
+
+SQLite has one writer at a time, so a long transaction stalls every request
+that writes. Backfills therefore run in primary key ranges, each in its own
+``BEGIN IMMEDIATE`` transaction. The size of a range adapts so that a
+transaction takes about ``max_batch_seconds``. The last finished range of every
+task is stored in ``schema_migration_progress`` in the same transaction as its
+changes, so an interrupted backfill resumes where it stopped.
+
+Table rebuilds follow SQLite's procedure for schema changes that ``ALTER
+TABLE`` cannot do. The new table gets its indexes, under temporary names,
+while it is still empty. Rows are then copied into it in chunks while triggers
+mirror concurrent writes. A single short transaction then swaps the tables,
+renames the indexes and recreates the old table's triggers. Finally the old
+rows are deleted in chunks. Indexes on large tables are added the same way,
+because ``CREATE INDEX`` holds the write lock while it sorts the whole table.
+"""
+
+import logging
+import time
+
+from sqlalchemy import (
+    Column,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex, CreateTable, DropIndex
+
+from db.base import write_transaction
+
+
+logger = logging.getLogger(__name__)
+
+migration_metadata = MetaData()
+
+progress_table = Table(
+    "schema_migration_progress",
+    migration_metadata,
+    Column("task", String, primary_key=True),
+    Column("position", Integer, nullable=False),
+)
+
+MAX_BATCH_SIZE = 50000
+
+# Tables up to this size get new indexes with a plain ``CREATE INDEX``, which
+# sorts about 200,000 rows per 0.1 s; larger ones are rebuilt instead.
+MAX_DIRECT_INDEX_ROWS = 100000
+
+
+def _position(connection, task):
+    position = connection.scalar(
+        select(progress_table.c.position).where(progress_table.c.task == task)
+    )
+    return 0 if position is None else position
+
+
+def _save_position(connection, task, position):
+    saved = connection.execute(
+        update(progress_table)
+        .where(progress_table.c.task == task)
+        .values(position=position)
+    )
+    if not saved.rowcount:
+        connection.execute(insert(progress_table).values(task=task, position=position))
+
+
+def backfill(
+    engine, task, table, apply, batch_size=500, max_batch_seconds=0.2, pause=0.01
+):
+    """
+    Run ``apply`` over consecutive ``id`` ranges of ``table``.
+
+    Args:
+        engine (Engine): The database engine.
+        task (str): Unique name of the backfill, under which progress is saved.
+        table (Table): The table whose ``id`` column defines the ranges.
+        apply (Callable[[Connection, int, int], int]): Processes the rows with
+            ``low < id <= high`` and returns how many it changed.
+        batch_size (int): Rows in the first range.
+        max_batch_seconds (float): Target duration of one transaction; ranges
+                                   shrink when slower and grow when faster.
+        pause (float): Seconds to wait between transactions, so that other
+                       writers can take the lock.
+
+    Returns:
+        int: Total of the values returned by ``apply``.
+    """
+    migration_metadata.create_all(engine)
+    key = table.c.id
+    changed = 0
+    while True:
+        started = time.perf_counter()
+        with write_transaction(engine) as connection:
+            low = _position(connection, task)
+            ids = select(key).where(key > low).order_by(key)
+            high = connection.scalar(ids.offset(batch_size - 1).limit(1))
+            if high is None:
+                high = connection.scalar(select(func.max(key)).where(key > low))
+            if high is None:
+                connection.execute(
+                    delete(progress_table).where(progress_table.c.task == task)
+                )
+                return changed
+            changed += apply(connection, low, high) or 0
+            _save_position(connection, task, high)
+        elapsed = time.perf_counter() - started
+
+        if elapsed > max_batch_seconds:
+            batch_size = max(1, batch_size // 2)
+        elif elapsed < max_batch_seconds / 4:
+            batch_size = min(MAX_BATCH_SIZE, batch_size * 2)
+        logger.debug("Backfill %s reached id %d in %.3f s.", task, high, elapsed)
+        time.sleep(pause)
+
+
+def create_indexes(engine, table_name, indexes, unique=False, **backfill_options):
+    """
+    Create the indexes missing from a table.
+
+    An existing index of the same name that is not unique when ``unique`` is
+    requested, or the other way round, is replaced.
+
+    Small tables are indexed in place. Larger ones are rebuilt with
+    ``rebuild_table`` from their current definition plus the new indexes, so
+    the write lock is never held for a full sort.
+
+    Args:
+        engine (Engine): The database engine.
+        table_name (str): The indexed table.
+        indexes (Mapping[str, Sequence[str]]): Index names mapped to columns.
+        unique (bool): Whether the indexes are unique.
+        **backfill_options: Passed to ``rebuild_table``.
+
+    Raises:
+        IntegrityError: If ``unique`` is set and the table has duplicate values.
+    """
+    existing = {
+        index["name"]: bool(index["unique"])
+        for index in inspect(engine).get_indexes(table_name)
+    }
+    missing = {
+        name: columns
+        for name, columns in indexes.items()
+        if existing.get(name) is not unique
+    }
+    if not missing:
+        return
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    replaced = [index for index in table.indexes if index.name in missing]
+    for index in replaced:
+        table.indexes.remove(index)
+    for name, columns in missing.items():
+        Index(name, *(table.c[column] for column in columns), unique=unique)
+
+    with engine.connect() as connection:
+        rows = connection.scalar(select(func.count()).select_from(table))
+    if rows > MAX_DIRECT_INDEX_ROWS:
+        rebuild_table(engine, table, **backfill_options)
+        return
+    with write_transaction(engine) as connection:
+        for index in replaced:
+            connection.execute(DropIndex(index))
+        for index in table.indexes:
+            if index.name in missing:
+                index.create(connection)
+
+
+def _temporary_name(name):
+    return f"_rebuild_{name}"
+
+
+def _copy_table(table, name):
+    # Compiling foreign keys needs the referenced tables in the same metadata.
+    metadata = MetaData()
+    for other in table.metadata.sorted_tables:
+        if other is not table:
+            other.to_metadata(metadata)
+    copy = table.to_metadata(metadata, name=name)
+    # Index names must not clash with the live table's until the swap, and
+    # generated ones would include the copy's name; use temporary names.
+    names = {
+        tuple(column.name for column in index.columns): index.name
+        for index in table.indexes
+    }
+    for index in copy.indexes:
+        index.name = _temporary_name(
+            names[tuple(column.name for column in index.columns)]
+        )
+    return copy
+
+
+def _rename_indexes(connection, table):
+    """
+    Give the indexes of the swapped-in table their final names.
+
+    SQLite cannot rename an index, so the schema entries are edited in place
+    with ``writable_schema``, following SQLite's procedure for schema changes
+    that do not touch stored data. The indexes keep their pages and nothing is
+    sorted inside the swap.
+
+    Connections in defensive mode (``SQLITE_DBCONFIG_DEFENSIVE``) may not
+    write the schema. The indexes then keep their temporary names through the
+    swap and ``_recreate_indexes`` builds them under their final names after
+    it. Each ``CREATE INDEX`` holds the write lock while it sorts the table,
+    the cost the rename avoids, but the temporary indexes serve queries
+    meanwhile and the database is never edited behind SQLite's back.
+
+    Args:
+        connection (Connection): The connection running the swap transaction.
+        table (Table): The table as it should be.
+
+    Returns:
+        bool: Whether the indexes were renamed.
+    """
+    version = connection.exec_driver_sql("PRAGMA schema_version").scalar()
+    connection.exec_driver_sql("PRAGMA writable_schema=ON")
+    connection.exec_driver_sql("SAVEPOINT rename_indexes")
+    try:
+        for index in table.indexes:
+            connection.execute(
+                text(
+                    "UPDATE sqlite_master SET name = :name, sql = :sql "
+                    "WHERE type = 'index' AND name = :temporary"
+                ),
+                {
+                    "name": index.name,
+                    "sql": str(CreateIndex(index).compile(dialect=connection.dialect)),
+                    "temporary": _temporary_name(index.name),
+                },
+            )
+    except OperationalError as error:
+        connection.exec_driver_sql("ROLLBACK TO rename_indexes")
+        logger.warning(
+            "Cannot rename the indexes of %s in place (%s); recreating them.",
+            table.name,
+            error.orig,
+        )
+        return False
+    else:
+        connection.exec_driver_sql(f"PRAGMA schema_version={version + 1}")
+        return True
+    finally:
+        connection.exec_driver_sql("RELEASE rename_indexes")
+        connection.exec_driver_sql("PRAGMA writable_schema=OFF")
+
+
+def _recreate_indexes(engine, table):
+    # One transaction per index, so other writers get the lock between sorts.
+    for index in table.indexes:
+        with write_transaction(engine) as connection:
+            index.create(connection)
+            connection.exec_driver_sql(f"DROP INDEX {_temporary_name(index.name)}")
+
+
+def rebuild_table(engine, table, **backfill_options):
+    """
+    Rebuild a SQLite table to match ``table``, keeping its rows.
+
+    This covers changes ``ALTER TABLE`` cannot make, such as adding NOT NULL
+    or a default to an existing column. Columns present in both the old table
+    and ``table`` are copied. Rows must be keyed by an integer ``id``, which is
+    preserved.
+
+    The indexes of ``table`` are built on the new table while it is empty and
+    take their names in the swap, or are built again after it when the
+    connection may not write the schema (see ``_rename_indexes``). Indexes of
+    the old table that ``table`` does not define are dropped. The old table's
+    triggers are recreated in the swap. The old table is renamed aside in the
+    swap and dropped afterwards with ``drop_table``.
+
+    Rows that break a constraint of ``table``, such as NULL in a new NOT NULL
+    column, make the copy fail with an ``IntegrityError`` and are never
+    dropped. Backfill them first. An interrupted or failed rebuild continues
+    where it stopped when run again.
+
+    Args:
+        engine (Engine): The database engine.
+        table (Table): The table as it should be.
+        **backfill_options: Passed to ``backfill`` for copying the rows.
+    """
+    name = table.name
+    temporary = _temporary_name(name)
+    retired = f"_retired_{name}"
+    drop_table(engine, retired, **backfill_options)
+    inspector = inspect(engine)
+    existing = {column["name"] for column in inspector.get_columns(name)}
+    columns = [column.name for column in table.columns if column.name in existing]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+
+    if temporary not in inspector.get_table_names():
+        with write_transaction(engine) as connection:
+            new_table = _copy_table(table, temporary)
+            connection.execute(CreateTable(new_table))
+            for index in new_table.indexes:
+                index.create(connection)
+            # Plain inserts, so rows the new schema rejects fail the write.
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER {temporary}_insert AFTER INSERT ON {name} BEGIN "
+                f"DELETE FROM {temporary} WHERE id = new.id; "
+                f"INSERT INTO {temporary} ({column_list}) "
+                f"VALUES ({new_values}); END"
+            )
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER {temporary}_update AFTER UPDATE ON {name} BEGIN "
+                f"DELETE FROM {temporary} WHERE id IN (old.id, new.id); "
+                f"INSERT INTO {temporary} ({column_list}) "
+                f"VALUES ({new_values}); END"
+            )
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER {temporary}_delete AFTER DELETE ON {name} BEGIN "
+                f"DELETE FROM {temporary} WHERE id = old.id; END"
+            )
+
+    # Rows already written by the triggers are newer than the copy; keep them.
+    # Only the id conflict is skipped: ``OR IGNORE`` would also drop rows that
+    # violate NOT NULL or CHECK constraints instead of failing.
+    copy_rows = text(
+        f"INSERT INTO {temporary} ({column_list}) "
+        f"SELECT {column_list} FROM {name} WHERE id > :low AND id <= :high "
+        "ON CONFLICT (id) DO NOTHING"
+    )
+
+    def copy(connection, low, high):
+        return connection.execute(copy_rows, {"low": low, "high": high}).rowcount
+
+    copied = backfill(engine, f"rebuild:{name}", table, copy, **backfill_options)
+    logger.info("Copied %d rows of %s.", copied, name)
+
+    with engine.connect() as connection:
+        # With foreign keys off and legacy renames, references to the table from
+        # other tables keep pointing at ``name`` instead of following the rename.
+        pragmas = {
+            pragma: connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+            for pragma in ("foreign_keys", "legacy_alter_table")
+        }
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.exec_driver_sql("PRAGMA legacy_alter_table=ON")
+        connection.commit()
+        started = time.perf_counter()
+        try:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            schema = connection.execute(
+                text(
+                    "SELECT type, name, sql FROM sqlite_master "
+                    "WHERE tbl_name = :name AND type IN ('index', 'trigger') "
+                    "AND sql IS NOT NULL"
+                ),
+                {"name": name},
+            ).all()
+            for kind, object_name, _ in schema:
+                connection.exec_driver_sql(f"DROP {kind.upper()} {object_name}")
+            connection.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {retired}")
+            connection.exec_driver_sql(f"ALTER TABLE {temporary} RENAME TO {name}")
+            renamed = _rename_indexes(connection, table)
+            for kind, object_name, definition in schema:
+                if kind == "trigger" and not object_name.startswith(temporary):
+                    connection.exec_driver_sql(definition)
+            connection.commit()
+            logger.info(
+                "Swapped in the rebuilt %s in %.3f s.",
+                name,
+                time.perf_counter() - started,
+            )
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            for pragma, value in pragmas.items():
+                connection.exec_driver_sql(f"PRAGMA {pragma}={int(value)}")
+            connection.commit()
+
+    if not renamed:
+        _recreate_indexes(engine, table)
+    drop_table(engine, retired, **backfill_options)
+
+
+def drop_table(engine, name, **backfill_options):
+    """
+    Drop a table after deleting its rows in chunks.
+
+    Dropping a large table in one statement holds the write lock while every
+    page is freed. Rows must be keyed by an integer ``id``.
+
+    Args:
+        engine (Engine): The database engine.
+        name (str): The table; nothing happens if it does not exist.
+        **backfill_options: Passed to ``backfill`` for deleting the rows.
+    """
+    if name not in inspect(engine).get_table_names():
+        return
+    table = Table(name, MetaData(), Column("id", Integer, primary_key=True))
+
+    def delete_rows(connection, low, high):
+        return connection.execute(
+            delete(table).where(table.c.id > low, table.c.id <= high)
+        ).rowcount
+
+    backfill(engine, f"drop:{name}", table, delete_rows, **backfill_options)
+    with write_transaction(engine) as connection:
+        connection.exec_driver_sql(f"DROP TABLE {name}")
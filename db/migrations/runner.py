@@ -0,0 +1,213 @@
+"""
+Numbered migrations and the table recording which ones were applied.
+"""
+
+import logging
+import os
+import socket
+from contextlib import contextmanager
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Table,
+    delete,
+    insert,
+    inspect,
+    select,
+)
+
+from db.base import Base, utcnow
+from db.search import ensure_search_index
+from .operations import migration_metadata, write_transaction
+
+
+logger = logging.getLogger(__name__)
+
+version_table = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+lock_table = Table(
+    "schema_migration_lock",
+    migration_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("owner", String, nullable=False),
+    Column("locked_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+class MigrationLocked(RuntimeError):
+    """
+    Raised when another process holds the migration lock.
+    """
+
+
+class Migration:
+    """
+    A schema change.
+
+    Args:
+        version (int): Position in the migration order.
+        description (str): What the migration changes.
+        upgrade (Callable[[Engine], None]): Applies the change. It manages its
+                                            own transactions and must be safe
+                                            to run again after an interruption.
+    """
+
+    def __init__(self, version, description, upgrade):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+
+    def __repr__(self):
+        return f"<Migration {self.version}: {self.description}>"
+
+
+def migration(version, description):
+    """
+    Register the decorated function as the migration to ``version``.
+    """
+
+    def register(upgrade):
+        if any(existing.version == version for existing in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version: {version}")
+        MIGRATIONS.append(Migration(version, description, upgrade))
+        MIGRATIONS.sort(key=lambda existing: existing.version)
+        return upgrade
+
+    return register
+
+
+def applied_versions(engine):
+    """
+    Returns:
+        set[int]: Versions of the migrations applied to the database.
+    """
+    migration_metadata.create_all(engine)
+    with engine.connect() as connection:
+        return set(connection.scalars(select(version_table.c.version)))
+
+
+def current_version(engine):
+    """
+    Returns:
+        int: The highest applied version, or 0 for an unversioned database.
+    """
+    return max(applied_versions(engine), default=0)
+
+
+def pending_migrations(engine, target=None):
+    """
+    Returns:
+        list[Migration]: Migrations not yet applied, up to ``target`` if given.
+    """
+    applied = applied_versions(engine)
+    return [
+        pending
+        for pending in MIGRATIONS
+        if pending.version not in applied
+        and (target is None or pending.version <= target)
+    ]
+
+
+@contextmanager
+def migration_lock(engine):
+    """
+    Hold the lock that lets one process at a time run migrations.
+
+    The lock is a row of ``schema_migration_lock``, taken in a ``BEGIN
+    IMMEDIATE`` transaction so two processes cannot both see it free. A process
+    killed while migrating leaves the row behind; ``release_migration_lock``
+    removes it.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Raises:
+        MigrationLocked: If another process holds the lock.
+    """
+    migration_metadata.create_all(engine)
+    with write_transaction(engine) as connection:
+        holder = connection.execute(select(lock_table)).first()
+        if holder is not None:
+            raise MigrationLocked(
+                f"Migrations are locked by {holder.owner} since "
+                f"{holder.locked_at:%Y-%m-%d %H:%M:%S} UTC."
+            )
+        connection.execute(
+            insert(lock_table).values(
+                id=1,
+                owner=f"{socket.gethostname()}:{os.getpid()}",
+                locked_at=utcnow(),
+            )
+        )
+    try:
+        yield
+    finally:
+        release_migration_lock(engine)
+
+
+def release_migration_lock(engine):
+    """
+    Remove the migration lock, whoever holds it.
+    """
+    migration_metadata.create_all(engine)
+    with write_transaction(engine) as connection:
+        connection.execute(delete(lock_table))
+
+
+def _record(engine, migrations):
+    with engine.begin() as connection:
+        for applied in migrations:
+            connection.execute(
+                insert(version_table).values(
+                    version=applied.version,
+                    description=applied.description,
+                    applied_at=utcnow(),
+                )
+            )
+
+
+def migrate(engine, target=None):
+    """
+    Bring the database schema up to date.
+
+    An empty database gets the tables of the current models and is marked as
+    fully migrated. Otherwise the pending migrations run in order, each
+    recorded as soon as it finishes, so a failed run resumes from the failed
+    migration. The whole run holds ``migration_lock``.
+
+    Args:
+        engine (Engine): The database engine.
+        target (int | None): Stop after this version instead of the latest.
+
+    Returns:
+        list[Migration]: The migrations applied.
+
+    Raises:
+        MigrationLocked: If another process is running migrations.
+    """
+    with migration_lock(engine):
+        pending = pending_migrations(engine, target)
+        existing = set(inspect(engine).get_table_names())
+        if not existing & set(Base.metadata.tables):
+            Base.metadata.create_all(engine)
+            ensure_search_index(engine)
+            _record(engine, pending)
+            logger.info("Created the schema at version %d.", current_version(engine))
+            return pending
+
+        for step in pending:
+            logger.info("Applying migration %d: %s", step.version, step.description)
+            step.upgrade(engine)
+            _record(engine, [step])
+        return pending
@@ -0,0 +1,444 @@
+"""
+The migrations, in order.
+
+Version 1 brings databases created before migrations were tracked up to date.
+It does what ``db.upgrade`` did at every start.
+
+Migrations work on the schema as it was at their version, written out below,
+and never on the models: a migration must keep doing the same thing after the
+models change, or later migrations would find their work already done.
+"""
+
+import logging
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    bindparam,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    update,
+)
+
+from db.base import utcnow
+from db.models.user import normalize_email, normalize_phone
+from .operations import (
+    backfill,
+    create_indexes,
+    migration_metadata,
+    progress_table,
+    rebuild_table,
+    write_transaction,
+)
+from .runner import migration
+
+
+logger = logging.getLogger(__name__)
+
+schema_v1 = MetaData()
+
+users_v1 = Table(
+    "users",
+    schema_v1,
+    Column("id", Integer, primary_key=True),
+    Column("username", String, unique=True, nullable=False),
+    Column("email", String, unique=True, nullable=False),
+    Column("phone", String, unique=True, nullable=False),
+    Column("email_normalized", String, index=True),
+    Column("phone_normalized", String, index=True),
+    Column("password_hash", String, nullable=False),
+)
+
+games_v1 = Table(
+    "games",
+    schema_v1,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, unique=True, nullable=False),
+    Column("updated_at", DateTime),
+)
+
+guides_v1 = Table(
+    "guides",
+    schema_v1,
+    Column("id", Integer, primary_key=True),
+    Column("title", String, nullable=False),
+    Column("content", String, nullable=False),
+    Column("link", String, nullable=False),
+    Column("video", String, nullable=False),
+    Column("image", String, nullable=False),
+    Column("usage_count", Integer, nullable=False, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("game_id", Integer, ForeignKey("games.id"), nullable=False),
+    Column("updated_at", DateTime),
+    Index("ix_guides_game_id_usage_count", "game_id", "usage_count"),
+)
+
+Table(
+    "guide_view_stats",
+    schema_v1,
+    Column(
+        "guide_id",
+        Integer,
+        ForeignKey("guides.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column("hour", Integer, primary_key=True, index=True),
+    Column("views", Integer, nullable=False),
+)
+
+Table(
+    "session_tokens",
+    schema_v1,
+    Column(
+        "user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    ),
+    Column("token", String, nullable=False),
+    Column("expires_at", Float, nullable=False, index=True),
+)
+
+Table(
+    "rate_limit_counters",
+    schema_v1,
+    Column("key", String, primary_key=True),
+    Column("window", Integer, primary_key=True),
+    Column("count", Integer, nullable=False),
+    Column("expires_at", Float, nullable=False, index=True),
+)
+
+schema_v3 = MetaData()
+users_v1.to_metadata(schema_v3)
+games_v1.to_metadata(schema_v3)
+
+guides_v3 = Table(
+    "guides",
+    schema_v3,
+    Column("id", Integer, primary_key=True),
+    Column("title", String, nullable=False),
+    Column("content", String, nullable=False),
+    Column("link", String, nullable=False),
+    Column("video", String, nullable=False),
+    Column("image", String, nullable=False),
+    Column("usage_count", Integer, nullable=False, server_default="0", index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False, index=True),
+    Column("game_id", Integer, ForeignKey("games.id"), nullable=False, index=True),
+    Column("updated_at", DateTime),
+    Index("ix_guides_game_id_usage_count", "game_id", "usage_count"),
+)
+
+
+SEARCH_INDEX_TASK = "guides_fts"
+
+SEARCH_TABLE_V1 = (
+    "CREATE VIRTUAL TABLE guides_fts USING fts5("
+    "title, content, content='guides', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+
+def search_triggers_v1(while_filling=False):
+    """
+    Return the statements creating the triggers that keep ``guides_fts`` in sync.
+
+    Args:
+        while_filling (bool): Only maintain guides the search index backfill
+                              has reached; later ones are copied by the
+                              backfill with their current values.
+
+    Returns:
+        list[str]: The ``CREATE TRIGGER`` statements.
+    """
+
+    def when(row):
+        if not while_filling:
+            return ""
+        return (
+            f"WHEN {row}.id <= COALESCE((SELECT position FROM "
+            f"{progress_table.name} WHERE task = '{SEARCH_INDEX_TASK}'), "
+            f"{row}.id) "
+        )
+
+    return [
+        f"CREATE TRIGGER guides_fts_insert AFTER INSERT ON guides {when('new')}"
+        "BEGIN INSERT INTO guides_fts(rowid, title, content) "
+        "VALUES (new.id, new.title, new.content); END",
+        f"CREATE TRIGGER guides_fts_delete AFTER DELETE ON guides {when('old')}"
+        "BEGIN INSERT INTO guides_fts(guides_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); END",
+        "CREATE TRIGGER guides_fts_update AFTER UPDATE OF title, content ON guides "
+        f"{when('old')}"
+        "BEGIN INSERT INTO guides_fts(guides_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); "
+        "INSERT INTO guides_fts(rowid, title, content) "
+        "VALUES (new.id, new.title, new.content); END",
+    ]
+
+
+def add_missing_columns(engine, metadata):
+    """
+    Add columns of ``metadata`` missing from existing tables.
+
+    SQLite cannot add NOT NULL or UNIQUE columns to a populated table, so the
+    columns are added as plain nullable columns and filled by backfills.
+
+    Args:
+        engine (Engine): The database engine.
+        metadata (MetaData): The schema to add columns from.
+
+    Returns:
+        list[str]: The added columns as ``table.column``.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with write_transaction(engine) as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {
+                column["name"] for column in inspector.get_columns(table.name)
+            }
+            for column in table.columns:
+                if column.name in existing or column.primary_key:
+                    continue
+                column_type = column.type.compile(engine.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def backfill_normalized_identifiers(engine, users, **options):
+    """
+    Fill ``email_normalized`` and ``phone_normalized`` of the ``users`` table.
+
+    Returns:
+        int: Number of users updated.
+    """
+    fill = (
+        update(users)
+        .where(users.c.id == bindparam("user_id"))
+        .values(
+            email_normalized=bindparam("email_value"),
+            phone_normalized=bindparam("phone_value"),
+        )
+    )
+
+    def apply(connection, low, high):
+        rows = connection.execute(
+            select(users.c.id, users.c.email, users.c.phone).where(
+                users.c.id > low,
+                users.c.id <= high,
+                users.c.email_normalized.is_(None)
+                | users.c.phone_normalized.is_(None),
+            )
+        ).all()
+        if rows:
+            connection.execute(
+                fill,
+                [
+                    {
+                        "user_id": row.id,
+                        "email_value": normalize_email(row.email),
+                        "phone_value": normalize_phone(row.phone),
+                    }
+                    for row in rows
+                ],
+            )
+        return len(rows)
+
+    return backfill(engine, "users.normalized_identifiers", users, apply, **options)
+
+
+def clear_duplicate_normalized(engine, users, column):
+    """
+    Clear a normalized identifier of users sharing it with an older account.
+
+    Emails and phone numbers only had to be unique as typed, so
+    ``Name@example.com`` and ``name@example.com``, or ``+1 555 0100`` and
+    ``15550100``, may belong to different accounts. The newer accounts keep
+    logging in with the identifier exactly as registered, which
+    ``find_user_by_identifier`` looks up first.
+
+    Args:
+        engine (Engine): The database engine.
+        users (Table): The ``users`` table.
+        column (str): ``"email_normalized"`` or ``"phone_normalized"``.
+
+    Returns:
+        list[int]: IDs of the users cleared.
+    """
+    normalized = users.c[column]
+    shared = (
+        select(normalized)
+        .where(normalized.is_not(None))
+        .group_by(normalized)
+        .having(func.count() > 1)
+    )
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(users.c.id, normalized)
+            .where(normalized.in_(shared))
+            .order_by(users.c.id)
+        ).all()
+    seen = set()
+    cleared = []
+    for user_id, value in rows:
+        if value in seen:
+            cleared.append(user_id)
+        seen.add(value)
+    if cleared:
+        with write_transaction(engine) as connection:
+            connection.execute(
+                update(users).where(users.c.id.in_(cleared)).values({column: None})
+            )
+    return cleared
+
+
+def make_normalized_unique(engine, users, column):
+    """
+    Clear duplicates of a normalized identifier and index it as unique.
+    """
+    cleared = clear_duplicate_normalized(engine, users, column)
+    if cleared:
+        logger.warning(
+            "Cleared %s of users %s, shared with older accounts.", column, cleared
+        )
+    create_indexes(engine, "users", {f"ix_users_{column}": [column]}, unique=True)
+
+
+def create_search_index(engine, **options):
+    """
+    Create the search index of an existing ``guides`` table and fill it.
+
+    The FTS5 'rebuild' command would index every guide in one transaction, so
+    the index is filled with ``backfill`` in ``id`` ranges instead. Until the
+    backfill finishes, the triggers only maintain guides it has copied; its
+    progress row is created with the index, so an interrupted fill resumes.
+
+    Args:
+        engine (Engine): The database engine.
+        **options: Passed to ``backfill``.
+
+    Returns:
+        int: Number of guides indexed.
+    """
+    table_names = inspect(engine).get_table_names()
+    if engine.dialect.name != "sqlite" or "guides" not in table_names:
+        return 0
+    migration_metadata.create_all(engine)
+    if "guides_fts" not in table_names:
+        with write_transaction(engine) as connection:
+            connection.exec_driver_sql(SEARCH_TABLE_V1)
+            for statement in search_triggers_v1(while_filling=True):
+                connection.exec_driver_sql(statement)
+            connection.execute(
+                insert(progress_table).values(task=SEARCH_INDEX_TASK, position=0)
+            )
+    else:
+        with engine.connect() as connection:
+            filling = connection.scalar(
+                select(progress_table.c.task).where(
+                    progress_table.c.task == SEARCH_INDEX_TASK
+                )
+            )
+        if filling is None:
+            return 0
+
+    fill = text(
+        "INSERT INTO guides_fts(rowid, title, content) "
+        "SELECT id, title, content FROM guides WHERE id > :low AND id <= :high"
+    )
+
+    def apply(connection, low, high):
+        return connection.execute(fill, {"low": low, "high": high}).rowcount
+
+    indexed = backfill(engine, SEARCH_INDEX_TASK, guides_v1, apply, **options)
+    with write_transaction(engine) as connection:
+        for name in ("guides_fts_insert", "guides_fts_delete", "guides_fts_update"):
+            connection.exec_driver_sql(f"DROP TRIGGER {name}")
+        for statement in search_triggers_v1():
+            connection.exec_driver_sql(statement)
+    return indexed
+
+
+def backfill_column(engine, table, column, value, **options):
+    """
+    Set ``column`` of ``table`` to ``value`` where it is NULL.
+
+    Returns:
+        int: Number of rows updated.
+    """
+
+    def apply(connection, low, high):
+        return connection.execute(
+            update(table)
+            .where(table.c.id > low, table.c.id <= high, table.c[column].is_(None))
+            .values({column: value})
+        ).rowcount
+
+    return backfill(engine, f"{table.name}.{column}", table, apply, **options)
+
+
+@migration(1, "Add missing tables, columns and indexes and the search index")
+def baseline(engine):
+    schema_v1.create_all(engine)
+    for column in add_missing_columns(engine, schema_v1):
+        logger.info("Added column %s.", column)
+    for table in schema_v1.sorted_tables:
+        indexes = {
+            index.name: [column.name for column in index.columns]
+            for index in table.indexes
+        }
+        if indexes:
+            create_indexes(engine, table.name, indexes)
+    indexed = create_search_index(engine)
+    if indexed:
+        logger.info("Indexed %d guides for search.", indexed)
+    backfill_normalized_identifiers(engine, users_v1)
+    now = utcnow()
+    backfill_column(engine, games_v1, "updated_at", now)
+    backfill_column(engine, guides_v1, "updated_at", now)
+
+
+@migration(2, "Index the foreign keys of guides")
+def index_guides(engine):
+    create_indexes(
+        engine,
+        "guides",
+        {"ix_guides_game_id": ["game_id"], "ix_guides_user_id": ["user_id"]},
+    )
+
+
+@migration(3, "Make guides.usage_count NOT NULL with a default of 0")
+def usage_count_not_null(engine):
+    # Columns added by version 1 are nullable and NULL in existing rows.
+    columns = inspect(engine).get_columns("guides")
+    usage_count = next(column for column in columns if column["name"] == "usage_count")
+    if not usage_count["nullable"]:
+        return
+    backfill_column(engine, guides_v1, "usage_count", 0)
+    rebuild_table(engine, guides_v3)
+
+
+@migration(4, "Make users.email_normalized unique")
+def unique_normalized_emails(engine):
+    make_normalized_unique(engine, users_v1, "email_normalized")
+
+
+@migration(5, "Make users.phone_normalized unique")
+def unique_normalized_phones(engine):
+    make_normalized_unique(engine, users_v1, "phone_normalized")
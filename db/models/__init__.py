@@ -5,3 +5,6 @@ This module imports all database models.
 from .user import User
 from .game import Game
 from .guide import Guide
+from .view_stat import GuideViewStat
+from .session_token import SessionToken
+from .rate_limit import RateLimitCounter
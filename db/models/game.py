@@ -2,8 +2,10 @@
 This module defines the Game model.
 """
 
+from datetime import datetime
+
 from sqlalchemy.orm import relationship, Mapped, mapped_column
-from db.base import BaseModel
+from db.base import BaseModel, utcnow
 
 
 class Game(BaseModel):
@@ -14,4 +16,7 @@ class Game(BaseModel):
     __tablename__ = "games"
 
     name: Mapped[str] = mapped_column(unique=True, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        default=utcnow, onupdate=utcnow, nullable=True
+    )
     guides = relationship("Guide", back_populates="game")
@@ -2,9 +2,11 @@
 This module defines the Guide model.
 """
 
+from datetime import datetime
+
 from sqlalchemy.orm import relationship, Mapped, mapped_column
-from sqlalchemy import ForeignKey
-from db.base import BaseModel
+from sqlalchemy import ForeignKey, Index
+from db.base import BaseModel, utcnow
 
 
 class Guide(BaseModel):
@@ -19,8 +21,21 @@ class Guide(BaseModel):
     link: Mapped[str] = mapped_column(nullable=False)
     video: Mapped[str] = mapped_column(nullable=False)
     image: Mapped[str] = mapped_column(nullable=False)
-    usage_count: Mapped[int] = mapped_column(default=0)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    game_id: Mapped[int] = mapped_column(ForeignKey("games.id"), nullable=False)
+    usage_count: Mapped[int] = mapped_column(
+        default=0, server_default="0", index=True
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"), nullable=False, index=True
+    )
+    game_id: Mapped[int] = mapped_column(
+        ForeignKey("games.id"), nullable=False, index=True
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        default=utcnow, onupdate=utcnow, nullable=True
+    )
 
     game = relationship("Game", back_populates="guides")
+
+    __table_args__ = (
+        Index("ix_guides_game_id_usage_count", "game_id", "usage_count"),
+    )
@@ -0,0 +1,19 @@
+"""
+This module defines the RateLimitCounter model.
+"""
+
+from sqlalchemy.orm import Mapped, mapped_column
+from db.base import Base
+
+
+class RateLimitCounter(Base):
+    """
+    Represents the number of hits a rate limit key received in one time window.
+    """
+
+    __tablename__ = "rate_limit_counters"
+
+    key: Mapped[str] = mapped_column(primary_key=True)
+    window: Mapped[int] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(nullable=False, default=0)
+    expires_at: Mapped[float] = mapped_column(nullable=False, index=True)
@@ -0,0 +1,21 @@
+"""
+This module defines the SessionToken model.
+"""
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from db.base import Base
+
+
+class SessionToken(Base):
+    """
+    Represents the session token issued to a logged-in user.
+    """
+
+    __tablename__ = "session_tokens"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    token: Mapped[str] = mapped_column(nullable=False)
+    expires_at: Mapped[float] = mapped_column(nullable=False, index=True)
@@ -2,13 +2,57 @@
 This module defines the User model.
 """
 
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+import re
+
+from sqlalchemy.orm import relationship, Mapped, mapped_column, validates
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from db.base import BaseModel
 import secrets
 
 
+_PHONE_PATTERN = re.compile(r"^\+?[\d\s().-]{7,}$")
+
+
+def normalize_email(email):
+    """
+    Normalizes an email address for lookups by trimming and lower-casing it.
+    """
+    return email.strip().lower() if email else None
+
+
+def normalize_phone(phone):
+    """
+    Normalizes a phone number to E.164 form (``+`` followed by digits).
+
+    Formatting characters are dropped and an international ``00`` prefix becomes
+    ``+``. Numbers are expected to include their country code.
+    """
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if phone.strip().startswith("00"):
+        digits = digits[2:]
+    return f"+{digits}" if digits else None
+
+
+def classify_identifier(identifier):
+    """
+    Determines whether a login identifier is an email, a phone number or a username.
+
+    Usernames may contain ``@`` too, so an ``"email"`` identifier can still be a
+    username; ``find_user_by_identifier`` falls back to it.
+
+    Returns:
+        str: ``"email"``, ``"phone"`` or ``"username"``.
+    """
+    if "@" in identifier:
+        return "email"
+    if _PHONE_PATTERN.match(identifier.strip()):
+        return "phone"
+    return "username"
+
+
 class User(BaseModel, UserMixin):
     """
     Represents a user in the system.
@@ -19,9 +63,25 @@ class User(BaseModel, UserMixin):
     username: Mapped[str] = mapped_column(unique=True, nullable=False)
     email: Mapped[str] = mapped_column(unique=True, nullable=False)
     phone: Mapped[str] = mapped_column(unique=True, nullable=False)
+    email_normalized: Mapped[str] = mapped_column(
+        nullable=True, unique=True, index=True
+    )
+    phone_normalized: Mapped[str] = mapped_column(
+        nullable=True, unique=True, index=True
+    )
     password_hash: Mapped[str] = mapped_column(nullable=False)
     guides = relationship("Guide", backref="author", lazy=True)
 
+    @validates("email")
+    def _sync_email_normalized(self, key, email):
+        self.email_normalized = normalize_email(email)
+        return email
+
+    @validates("phone")
+    def _sync_phone_normalized(self, key, phone):
+        self.phone_normalized = normalize_phone(phone)
+        return phone
+
     def set_password(self, password: str) -> None:
         """
         Sets the user's password, storing the hashed version.
@@ -0,0 +1,29 @@
+"""
+This module defines the GuideViewStat model.
+"""
+
+from sqlalchemy import ForeignKey, delete, event
+from sqlalchemy.orm import Mapped, mapped_column
+from db.base import Base
+from db.models.guide import Guide
+
+
+class GuideViewStat(Base):
+    """
+    Represents the number of views a guide received during one hour.
+    """
+
+    __tablename__ = "guide_view_stats"
+
+    guide_id: Mapped[int] = mapped_column(
+        ForeignKey("guides.id", ondelete="CASCADE"), primary_key=True
+    )
+    hour: Mapped[int] = mapped_column(primary_key=True, index=True)
+    views: Mapped[int] = mapped_column(nullable=False, default=0)
+
+
+@event.listens_for(Guide, "before_delete")
+def _delete_view_stats(mapper, connection, guide):
+    # SQLite does not enforce foreign keys here, so ON DELETE CASCADE never
+    # fires; delete the stats of a deleted guide explicitly.
+    connection.execute(delete(GuideViewStat).where(GuideViewStat.guide_id == guide.id))
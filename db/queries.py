@@ -0,0 +1,261 @@
+"""
+This module defines read queries shared by the route modules.
+
+Each function loads only the columns its page needs and eager-loads
+relationships up front, so page cost does not grow with the number of games.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.orm import load_only, selectinload
+
+from db.models.game import Game
+from db.models.guide import Guide
+from db.models.user import User, classify_identifier, normalize_email, normalize_phone
+
+
+def games_with_guides(db_session):
+    """
+    Fetch every game together with the id and title of its guides.
+
+    Guides are loaded with a single ``SELECT ... WHERE game_id IN (...)`` instead of
+    one lazy load per game.
+
+    Args:
+        db_session (Session): The database session.
+
+    Returns:
+        list[Game]: Games ordered by name with ``guides`` already populated.
+    """
+    statement = (
+        select(Game)
+        .options(
+            load_only(Game.id, Game.name),
+            selectinload(Game.guides).load_only(Guide.id, Guide.title),
+        )
+        .order_by(Game.name)
+    )
+    return db_session.scalars(statement).all()
+
+
+def _keyset_page(db_session, statement, key, after, limit):
+    statement = statement.order_by(key).limit(limit + 1)
+    if after is not None:
+        statement = statement.where(key > after)
+    rows = db_session.execute(statement).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+def guides_page(db_session, exclude_game=None, after=None, limit=20):
+    """
+    Fetch one keyset-paginated page of guides with the name of their game.
+
+    Pages are ordered by ``Guide.id`` and continue after the last id of the previous
+    page, so every page costs one indexed range scan regardless of its position.
+
+    Args:
+        db_session (Session): The database session.
+        exclude_game (str): Optional name of a game whose guides are left out.
+        after (int): Only return guides with an id greater than this one.
+        limit (int): Maximum number of guides on the page.
+
+    Returns:
+        tuple[list[Row], int | None]: Rows with ``id``, ``title``, ``game_name``,
+        ``updated_at`` and ``game_updated_at`` attributes, and the cursor for the
+        next page or None on the last page.
+    """
+    statement = (
+        select(
+            Guide.id,
+            Guide.title,
+            Game.name.label("game_name"),
+            Guide.updated_at,
+            Game.updated_at.label("game_updated_at"),
+        )
+        .join(Game, Guide.game_id == Game.id)
+    )
+    if exclude_game is not None:
+        statement = statement.where(Game.name != exclude_game)
+    return _keyset_page(db_session, statement, Guide.id, after, limit)
+
+
+def user_guides(db_session, user_id):
+    """
+    Fetch the guides written by a user with the name of their game.
+
+    Args:
+        db_session (Session): The database session.
+        user_id (int): The author's user ID.
+
+    Returns:
+        list[Row]: Rows with ``id``, ``title`` and ``game_name`` attributes.
+    """
+    statement = (
+        select(Guide.id, Guide.title, Game.name.label("game_name"))
+        .join(Game, Guide.game_id == Game.id)
+        .where(Guide.user_id == user_id)
+        .order_by(Guide.id)
+    )
+    return db_session.execute(statement).all()
+
+
+def find_user_by_identifier(db_session, identifier):
+    """
+    Find the user a login identifier belongs to with single-column indexed lookups.
+
+    The identifier is classified as an email, phone number or username first and
+    matched exactly against the corresponding column, then against its
+    normalized form, which is unique. The exact match comes first so that an
+    account whose normalized identifier was cleared as a duplicate of an older
+    account's still finds itself. Usernames are tried last, which covers
+    usernames that look like emails or phone numbers.
+
+    Args:
+        db_session (Session): The database session.
+        identifier (str): The username, email or phone entered at login.
+
+    Returns:
+        User: The matching user, or None.
+    """
+    kind = classify_identifier(identifier)
+    if kind == "email":
+        lookups = [
+            User.email == identifier,
+            User.email_normalized == normalize_email(identifier),
+            User.username == identifier,
+        ]
+    elif kind == "phone":
+        lookups = [
+            User.phone == identifier,
+            User.phone_normalized == normalize_phone(identifier),
+            User.username == identifier,
+        ]
+    else:
+        lookups = [User.username == identifier]
+
+    for condition in lookups:
+        user = db_session.scalars(select(User).where(condition).limit(1)).first()
+        if user is not None:
+            return user
+    return None
+
+
+def guide_last_modified(db_session, guide_id):
+    """
+    Fetch when a guide or its game last changed, without loading the guide.
+
+    Args:
+        db_session (Session): The database session.
+        guide_id (int): The guide ID.
+
+    Returns:
+        Row | None: A row with ``updated_at`` and ``game_updated_at`` attributes, or
+        None if the guide does not exist.
+    """
+    statement = (
+        select(Guide.updated_at, Game.updated_at.label("game_updated_at"))
+        .join(Game, Guide.game_id == Game.id)
+        .where(Guide.id == guide_id)
+    )
+    return db_session.execute(statement).first()
+
+
+# Fields the JSON API can project. Columns of ``games`` and ``users`` are only
+# joined when one of their fields is requested.
+GUIDE_FIELDS = {
+    "id": Guide.id,
+    "title": Guide.title,
+    "content": Guide.content,
+    "link": Guide.link,
+    "video": Guide.video,
+    "image": Guide.image,
+    "usage_count": Guide.usage_count,
+    "game_id": Guide.game_id,
+    "game_name": Game.name,
+    "author_id": Guide.user_id,
+    "author": User.username,
+    "updated_at": Guide.updated_at,
+}
+GAME_FIELDS = {
+    "id": Game.id,
+    "name": Game.name,
+    "updated_at": Game.updated_at,
+}
+
+
+def _projection(available, fields):
+    # The id is always selected because it is the pagination key.
+    names = ["id", *(name for name in fields if name != "id")]
+    return [available[name].label(name) for name in names]
+
+
+def _guides_select(fields):
+    statement = select(*_projection(GUIDE_FIELDS, fields)).select_from(Guide)
+    if "game_name" in fields:
+        statement = statement.join(Game, Guide.game_id == Game.id)
+    if "author" in fields:
+        statement = statement.join(User, Guide.user_id == User.id)
+    return statement
+
+
+def api_games_page(db_session, fields, after=None, limit=20):
+    """
+    Fetch one keyset-paginated page of games with only the requested columns.
+
+    Args:
+        db_session (Session): The database session.
+        fields (Sequence[str]): Names from ``GAME_FIELDS`` to select.
+        after (int): Only return games with an id greater than this one.
+        limit (int): Maximum number of games on the page.
+
+    Returns:
+        tuple[list[Row], int | None]: The rows and the cursor of the next page.
+    """
+    statement = select(*_projection(GAME_FIELDS, fields))
+    return _keyset_page(db_session, statement, Game.id, after, limit)
+
+
+def api_guides_page(
+    db_session, fields, game_id=None, author_id=None, after=None, limit=20
+):
+    """
+    Fetch one keyset-paginated page of guides with only the requested columns.
+
+    Large columns such as ``content`` are not read unless requested, and the
+    ``games`` and ``users`` tables are only joined for ``game_name`` and
+    ``author``.
+
+    Args:
+        db_session (Session): The database session.
+        fields (Sequence[str]): Names from ``GUIDE_FIELDS`` to select.
+        game_id (int): Only return guides of this game.
+        author_id (int): Only return guides written by this user.
+        after (int): Only return guides with an id greater than this one.
+        limit (int): Maximum number of guides on the page.
+
+    Returns:
+        tuple[list[Row], int | None]: The rows and the cursor of the next page.
+    """
+    statement = _guides_select(fields)
+    if game_id is not None:
+        statement = statement.where(Guide.game_id == game_id)
+    if author_id is not None:
+        statement = statement.where(Guide.user_id == author_id)
+    return _keyset_page(db_session, statement, Guide.id, after, limit)
+
+
+def api_guide(db_session, guide_id, fields):
+    """
+    Fetch the requested columns of one guide.
+
+    Args:
+        db_session (Session): The database session.
+        guide_id (int): The guide ID.
+        fields (Sequence[str]): Names from ``GUIDE_FIELDS`` to select.
+
+    Returns:
+        Row | None: The guide's row, or None if it does not exist.
+    """
+    statement = _guides_select(fields).where(Guide.id == guide_id)
+    return db_session.execute(statement).first()
@@ -0,0 +1,157 @@
+"""
+This module maintains an SQLite FTS5 index over guide titles and content.
+
+The ``guides_fts`` virtual table uses ``guides`` as its external content table and
+is kept in sync by triggers, so no ORM code has to remember to update it.
+"""
+
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, event, inspect, text
+
+from db.models.guide import Guide
+
+
+FTS_TABLE = "guides_fts"
+
+# Control characters used as snippet markers; they cannot appear in user input
+# that survives escaping, so they are safely replaced by <mark> tags afterwards.
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+_CREATE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content,
+        content='guides', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS guides_fts_insert AFTER INSERT ON guides BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS guides_fts_delete AFTER DELETE ON guides BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS guides_fts_update
+    AFTER UPDATE OF title, content ON guides BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+for _statement in _CREATE_STATEMENTS:
+    event.listen(
+        Guide.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite")
+    )
+event.listen(
+    Guide.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"),
+)
+
+
+def ensure_search_index(engine):
+    """
+    Create the search index for an existing database and fill it from ``guides``.
+
+    Tables created through ``Base.metadata.create_all`` get the index automatically;
+    this covers databases created before the index existed.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    table_names = inspect(engine).get_table_names()
+    if "guides" not in table_names or FTS_TABLE in table_names:
+        return
+    with engine.begin() as connection:
+        for statement in _CREATE_STATEMENTS:
+            connection.execute(text(statement))
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        )
+
+
+def build_match_query(search_query):
+    """
+    Turn free-form user input into a safe FTS5 prefix query.
+
+    Every word is quoted, so FTS5 operators typed by users are matched literally,
+    and marked as a prefix so partially typed words still match.
+
+    Args:
+        search_query (str): The text entered by the user.
+
+    Returns:
+        str: The MATCH expression, or an empty string if there is nothing to search.
+    """
+    terms = re.findall(r"\w+", search_query or "")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _highlight(snippet):
+    """
+    Escape a snippet and turn its match markers into ``<mark>`` tags.
+    """
+    escaped = str(escape(snippet))
+    return Markup(
+        escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+    )
+
+
+def search_guides(db_session, search_query, user_id=None, limit=20):
+    """
+    Search guide titles and content, best matches first.
+
+    Results are ranked with bm25, weighting title matches above content matches.
+
+    Args:
+        db_session (Session): The database session.
+        search_query (str): The text entered by the user.
+        user_id (int): Optionally restrict results to guides written by this user.
+        limit (int): Maximum number of results.
+
+    Returns:
+        list[dict]: Results with ``id``, ``title``, ``game_name`` and a highlighted
+        ``snippet`` of the content.
+    """
+    match_query = build_match_query(search_query)
+    if not match_query:
+        return []
+
+    sql = f"""
+        SELECT guides.id, guides.title, games.name AS game_name,
+               snippet({FTS_TABLE}, 1, :mark_start, :mark_end, '…', 16) AS snippet
+        FROM {FTS_TABLE}
+        JOIN guides ON guides.id = {FTS_TABLE}.rowid
+        JOIN games ON games.id = guides.game_id
+        WHERE {FTS_TABLE} MATCH :match_query
+        {"AND guides.user_id = :user_id" if user_id is not None else ""}
+        ORDER BY bm25({FTS_TABLE}, 10.0, 1.0)
+        LIMIT :limit
+    """
+    rows = db_session.execute(
+        text(sql),
+        {
+            "match_query": match_query,
+            "mark_start": _MARK_START,
+            "mark_end": _MARK_END,
+            "user_id": user_id,
+            "limit": limit,
+        },
+    ).mappings()
+    return [{**row, "snippet": _highlight(row["snippet"])} for row in rows]
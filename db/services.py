@@ -0,0 +1,60 @@
+"""
+This module groups the database services of an application: its engine, the
+usage counter and the leaderboard.
+
+Applications using the database settings of the environment share the
+services created when ``db`` is imported. An application whose configuration
+overrides one of ``PROCESS_SETTINGS``, e.g. ``DATABASE_URL`` to point tests or
+a worker at another database, gets services of its own.
+"""
+
+from typing import NamedTuple
+
+from sqlalchemy.engine import Engine
+
+from db.base import DATABASE_CONFIG, PROCESS_SETTINGS, build_engine, engine
+from db.counters import UsageCounter, usage_counter
+from db.leaderboard import Leaderboard, leaderboard
+
+
+class DatabaseServices(NamedTuple):
+    """
+    The engine of an application and the services writing through it.
+    """
+
+    engine: Engine
+    usage_counter: UsageCounter
+    leaderboard: Leaderboard
+
+
+default_services = DatabaseServices(engine, usage_counter, leaderboard)
+
+
+def build_database_services(config):
+    """
+    Return the database services for an application configuration.
+
+    Args:
+        config (Mapping): The application configuration.
+
+    Returns:
+        DatabaseServices: ``default_services`` if ``config`` keeps every
+        setting of ``PROCESS_SETTINGS``, otherwise new services built from it.
+    """
+    settings = {key: config.get(key, DATABASE_CONFIG[key]) for key in DATABASE_CONFIG}
+    if all(settings[key] == DATABASE_CONFIG[key] for key in PROCESS_SETTINGS):
+        return default_services
+
+    own_engine = build_engine(settings)
+    own_counter = UsageCounter(
+        own_engine,
+        flush_interval=settings["USAGE_COUNTER_FLUSH_INTERVAL"],
+        flush_threshold=settings["USAGE_COUNTER_FLUSH_THRESHOLD"],
+    )
+    own_leaderboard = Leaderboard(
+        own_engine,
+        capacity=settings["LEADERBOARD_CAPACITY"],
+        refresh_interval=settings["LEADERBOARD_REFRESH_INTERVAL"],
+    )
+    own_counter.add_flush_listener(own_leaderboard.apply_increments)
+    return DatabaseServices(own_engine, own_counter, own_leaderboard)
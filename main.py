@@ -1,21 +1,14 @@
 """
 This module starts a Flask web application.
-"""
-
-from db import Base, engine
-
-from app import app
 
+The database schema is not touched at import; create or upgrade it once with
+``flask --app main db upgrade``.
+"""
 
-def initialize_database():
-    """
-    Create database tables if they do not exist.
-    """
-    # Create all tables that do not exist yet
-    Base.metadata.create_all(engine)
+from app import create_app
 
 
-initialize_database()
+app = create_app()
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -1,8 +1,71 @@
+import atexit
+import gzip
+import io
+import logging
+import os
+import queue
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
 import unittest
+import zlib
+from unittest import mock
 import json
+
+# Keep the database and log files of test runs out of the working tree. The
+# settings are read when ``app`` and ``db`` are imported, so set them first.
+_test_directory = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{_test_directory.name}/helps.db"
+os.environ["LOG_FILE"] = os.path.join(_test_directory.name, "application.log")
+
 from flask import url_for
-from app import app
-from db import Base, db_session, engine, User, Game, Guide
+from sqlalchemy import Column, Integer, MetaData, Table, event, inspect, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from werkzeug.security import generate_password_hash
+from app import app, create_app
+from app.assets import build_assets, minify_js
+from app.catalogue import ImportInterrupted, import_guides
+from app.compression import CompressionMiddleware
+from app.extensions import instrumentation, load_user, tokens, user_cache
+from app.fragment_cache import MemoryFragmentBackend
+from app.hashing import PasswordHasher
+from app.logs import BoundedQueueHandler, JSONFormatter, SamplingFilter
+from app.metrics import Metrics
+from app.ratelimit import (
+    MemoryRateLimiter,
+    SQLiteRateLimiter,
+    build_rate_limiter,
+    parse_limit,
+)
+from benchmarks.report import percentile, summarize
+from db import (
+    Base,
+    build_engine,
+    commit_with_retry,
+    db_session,
+    engine,
+    get_engine,
+    leaderboard,
+    usage_counter,
+    User,
+    Game,
+    Guide,
+    GuideViewStat,
+)
+from db.migrations import (
+    MIGRATIONS,
+    MigrationLocked,
+    backfill,
+    current_version,
+    migrate,
+    migration_lock,
+    rebuild_table,
+)
+from db.migrations import operations
+from db.migrations.versions import SEARCH_INDEX_TASK, create_search_index
 
 class FlaskAppTests(unittest.TestCase):
     def setUp(self):
@@ -13,17 +76,947 @@ class FlaskAppTests(unittest.TestCase):
         self.app_context = app.app_context()
         self.app_context.push()
         Base.metadata.create_all(engine)
+        # Every test starts with fresh login and register allowances.
+        app.extensions["rate_limiter"] = build_rate_limiter(app.config)
 
     def tearDown(self):
         """Tear down the test environment."""
         Base.metadata.drop_all(engine)
         self.app_context.pop()
 
+    def create_author_and_game(
+        self, game_name, username="author", email="author@example.com", phone="111"
+    ):
+        """Create a user with the password "password" and a game."""
+        user = User(username=username, email=email, phone=phone)
+        user.set_password("password")
+        game = Game(name=game_name)
+        db_session.add_all([user, game])
+        db_session.commit()
+        return user, game
+
+    def create_guide(self, game, user, title, content="content"):
+        """Create a guide for ``game`` written by ``user``."""
+        guide = Guide(
+            title=title,
+            content=content,
+            link="http://example.com",
+            video="http://example.com/video",
+            image="http://example.com/image",
+            game_id=game.id,
+            user_id=user.id,
+        )
+        db_session.add(guide)
+        db_session.commit()
+        return guide
+
+    def login(self, identifier, password="password"):
+        """Log in through the login form."""
+        return self.app.post(
+            url_for("login"), data={"identifier": identifier, "password": password}
+        )
+
     def test_index(self):
         """Test the index page."""
         response = self.app.get(url_for("index"))
         self.assertEqual(response.status_code, 200)
 
+    def test_index_lists_games_and_top_guides(self):
+        """Test the index page renders games with their guides."""
+        user, game = self.create_author_and_game("Index Game")
+        self.create_guide(game, user, "Index Guide")
+
+        response = self.app.get(url_for("index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Index Game", response.data)
+        self.assertIn(b"Index Guide", response.data)
+
+        game.name = "Renamed Game"
+        db_session.commit()
+        response = self.app.get(url_for("index"))
+        self.assertIn(b"Renamed Game", response.data)
+
+    def test_help_other_games_pagination(self):
+        """Test guides for other games are paginated by guide ID."""
+        user, game = self.create_author_and_game("Other Game")
+        for number in range(3):
+            self.create_guide(game, user, f"Other Guide {number}")
+
+        response = self.app.get(url_for("help_other_games", limit=2))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Other Guide 1", response.data)
+        self.assertNotIn(b"Other Guide 2", response.data)
+
+        response = self.app.get(url_for("help_other_games", after=2, limit=2))
+        self.assertIn(b"Other Guide 2", response.data)
+        self.assertNotIn(b"Other Guide 1", response.data)
+
+    def test_search(self):
+        """Test full-text search over guide titles and content."""
+        user, game = self.create_author_and_game("Search Game")
+        self.create_guide(
+            game,
+            user,
+            "Champion tier list",
+            content="Ranking of every <b>champion</b> for arena.",
+        )
+
+        response = self.app.get(url_for("search", q="champ"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Champion tier list", response.data)
+        self.assertIn(b"<mark>", response.data)
+        self.assertNotIn(b"<b>champion</b>", response.data)
+
+        response = self.app.get(url_for("search", q="dragon"))
+        self.assertIn(b"No guides found", response.data)
+
+    def test_view_guide_counts_usage(self):
+        """Test guide views are batched into usage_count on flush."""
+        user, game = self.create_author_and_game("Counted Game")
+        guide = self.create_guide(game, user, "Counted Guide")
+        self.login("author")
+
+        for _ in range(3):
+            response = self.app.get(url_for("view_guide", guide_id=guide.id))
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(usage_counter.pending().get(guide.id), 3)
+
+        usage_counter.flush()
+        db_session.refresh(guide)
+        self.assertEqual(guide.usage_count, 3)
+
+        self.assertEqual(leaderboard.top(1)[0].id, guide.id)
+        self.assertEqual(leaderboard.top(1)[0].usage_count, 3)
+        self.assertEqual(leaderboard.top_in_window(24, 1)[0].usage_count, 3)
+        self.assertEqual(leaderboard.top_for_game(game.id, 1)[0].title, "Counted Guide")
+
+    def test_hourly_view_stats_follow_their_guide(self):
+        """Test view stats add up per hour and are deleted with their guide."""
+        user, game = self.create_author_and_game("Stats Game")
+        guide = self.create_guide(game, user, "Stats Guide")
+        stats = select(GuideViewStat.views).where(GuideViewStat.guide_id == guide.id)
+
+        for views in [2, 3]:
+            usage_counter.increment(guide.id, views)
+            usage_counter.flush()
+        self.assertEqual(db_session.scalars(stats).all(), [5])
+
+        guide_id = guide.id
+        db_session.delete(guide)
+        db_session.commit()
+        self.assertEqual(db_session.scalars(stats).all(), [])
+
+        usage_counter.increment(guide_id)
+        self.assertEqual(usage_counter.flush(), {guide_id: 1})
+        self.assertEqual(db_session.scalars(stats).all(), [])
+
+    def test_help_other_games_conditional_get(self):
+        """Test unchanged guide pages are answered with 304 Not Modified."""
+        user, game = self.create_author_and_game("Cached Game")
+        guide = self.create_guide(game, user, "Cached Guide")
+
+        response = self.app.get(url_for("help_other_games"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        etag = response.headers["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+
+        response = self.app.get(
+            url_for("help_other_games"), headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+        guide.title = "Renamed Guide"
+        db_session.commit()
+        response = self.app.get(
+            url_for("help_other_games"), headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Renamed Guide", response.data)
+
+        # A full last page gains a "Next" link once a newer guide exists.
+        response = self.app.get(url_for("help_other_games", limit=1))
+        etag = response.headers["ETag"]
+        self.assertNotIn(b"Next", response.data)
+        newer = self.create_guide(game, user, "Newer Guide")
+        response = self.app.get(
+            url_for("help_other_games", limit=1), headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Next", response.data)
+
+        next_page = url_for("help_other_games", after=guide.id, limit=1)
+        etag = self.app.get(next_page).headers["ETag"]
+        response = self.app.get(next_page, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.login("author")
+        guide_page = url_for("view_guide", guide_id=newer.id)
+        etag = self.app.get(guide_page).headers["ETag"]
+        response = self.app.get(guide_page, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        newer.content = "Edited content"
+        db_session.commit()
+        response = self.app.get(guide_page, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Edited content", response.data)
+        usage_counter.flush()
+
+    def test_memory_fragment_cache_stays_bounded(self):
+        """Test fragments are evicted by LRU and invalidated by key prefix."""
+        backend = MemoryFragmentBackend(maxsize=3)
+        for after in range(100):
+            backend.set(f"help_other:{after}:20", "page")
+        self.assertEqual(backend.stats()["size"], 3)
+
+        for key in ["guide:5", "guide:5:header", "guide:50"]:
+            backend.set(key, "fragment")
+        backend.invalidate("guide:5")
+        self.assertIsNone(backend.get("guide:5:header"))
+        self.assertEqual(backend.get("guide:50"), "fragment")
+        self.assertEqual(backend.stats()["size"], 1)
+
+    def test_responses_compressed_above_threshold(self):
+        """Test large pages are gzip-compressed and small ones are not."""
+        response = self.app.get(url_for("index"), headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertIn(b"<html", gzip.decompress(response.data))
+
+        response = self.app.get(url_for("index"))
+        self.assertNotIn("Content-Encoding", response.headers)
+
+        response = self.app.get(url_for("logout"), headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_streamed_responses_compressed_chunk_by_chunk(self):
+        """Test each chunk of a streamed response is sent as soon as it is made."""
+        rows = [f"row {number}\n".encode() * 100 for number in range(3)]
+
+        def stream(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/csv")])
+            return iter(rows)
+
+        middleware = CompressionMiddleware(stream, app.config)
+        environ = {"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"}
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = middleware(environ, lambda status, headers, exc_info=None: None)
+        for row in rows:
+            self.assertEqual(decompressor.decompress(next(body)), row)
+        decompressor.decompress(b"".join(body))
+        self.assertTrue(decompressor.eof)
+
+    def test_logging_queue_drops_and_samples_records(self):
+        """Test the log queue drops when full and formats records as JSON."""
+        handler = BoundedQueueHandler(queue.Queue(maxsize=1), policy="drop")
+        handler.addFilter(SamplingFilter({"WARNING": 0.0}))
+        logger = logging.getLogger("test_logging_queue")
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            logger.warning("Noisy %s.", "warning", extra={"sampled": True})
+            self.assertTrue(handler.queue.empty())
+
+            logger.warning("Kept %s.", "warning", extra={"user_id": 7})
+            logger.warning("Dropped warning.")
+            self.assertEqual(handler.dropped, 1)
+        finally:
+            logger.removeHandler(handler)
+
+        entry = json.loads(JSONFormatter().format(handler.queue.get_nowait()))
+        self.assertEqual(entry["message"], "Kept warning.")
+        self.assertEqual(entry["level"], "WARNING")
+        self.assertEqual(entry["user_id"], 7)
+
+    def test_instrumentation_times_requests_and_queries(self):
+        """Test enabled instrumentation adds Server-Timing and counts queries."""
+        response = self.app.get(url_for("index"))
+        self.assertNotIn("Server-Timing", response.headers)
+
+        instrumentation.enable()
+        try:
+            response = self.app.get(url_for("help_other_games"))
+        finally:
+            instrumentation.disable()
+        self.assertIn('queries"', response.headers["Server-Timing"])
+        stats = instrumentation.snapshot()["help_other_games"]
+        self.assertEqual(stats["latency_ms"]["count"], 1)
+        self.assertGreater(stats["queries"], 0)
+
+    def test_metrics_retire_snapshots_of_exited_processes(self):
+        """Test exited processes' snapshots are folded into the retired totals."""
+        dead_pid = subprocess.Popen([sys.executable, "-c", ""]).pid
+        os.waitpid(dead_pid, 0)
+        with tempfile.TemporaryDirectory() as directory:
+            # An exited process, and an earlier process with this process's ID.
+            for pid, token in [(dead_pid, "a"), (os.getpid(), "b")]:
+                path = os.path.join(directory, f"metrics-{pid}-{token}.json")
+                with open(path, "w", encoding="utf-8") as file:
+                    json.dump(
+                        {
+                            "pid": pid,
+                            "counters": [["jobs_total", [], 2]],
+                            "histograms": [],
+                            "gauges": [["busy", [], 1]],
+                        },
+                        file,
+                    )
+                os.utime(path, (0, 0))
+
+            metrics = Metrics([1.0], multiprocess_dir=directory)
+            atexit.unregister(metrics.close)
+            metrics.inc("jobs_total")
+            metrics.add_gauge("busy", lambda: 5)
+            self.assertIn("jobs_total 5", metrics.render())
+            self.assertIn("busy 5", metrics.render())
+            files = sorted(name for name in os.listdir(directory) if name[0] != ".")
+            self.assertEqual(len(files), 2)
+            self.assertIn("metrics-retired.json", files)
+
+            metrics.close()
+            self.assertEqual(
+                [name for name in os.listdir(directory) if name[0] != "."],
+                ["metrics-retired.json"],
+            )
+            other = Metrics([1.0], multiprocess_dir=directory)
+            atexit.unregister(other.close)
+            self.assertIn("jobs_total 5", other.render())
+
+    def test_benchmark_report_statistics(self):
+        """Test percentiles interpolate between values and summaries handle no data."""
+        values = [10.0, 20.0, 30.0, 40.0]
+        self.assertEqual(percentile(values, 0.0), 10.0)
+        self.assertEqual(percentile(values, 0.5), 25.0)
+        self.assertAlmostEqual(percentile(values, 0.95), 38.5)
+        self.assertEqual(percentile(values, 1.0), 40.0)
+        self.assertEqual(percentile([7.0], 0.99), 7.0)
+        self.assertIsNone(percentile([], 0.5))
+
+        summary = summarize([0.004, 0.001, 0.002, 0.003], queries=10)
+        self.assertEqual(summary["requests"], 4)
+        self.assertEqual(summary["mean_ms"], 2.5)
+        self.assertEqual(summary["p50_ms"], 2.5)
+        self.assertEqual(summary["p99_ms"], 3.97)
+        self.assertEqual(summary["queries_per_request"], 2.5)
+        self.assertEqual(
+            summarize([]),
+            {
+                "requests": 0,
+                "mean_ms": None,
+                "p50_ms": None,
+                "p95_ms": None,
+                "p99_ms": None,
+                "queries_per_request": None,
+            },
+        )
+
+    def test_metrics_endpoint(self):
+        """Test /metrics publishes request counts, latency and gauges."""
+        self.app.get(url_for("index"))
+        response = self.app.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        body = response.get_data(as_text=True)
+        self.assertIn(
+            'http_requests_total{endpoint="index",method="GET",status="200"}', body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{endpoint="index",le="+Inf"}', body
+        )
+        self.assertIn("db_pool_checkouts_total", body)
+        self.assertIn('cache_hits_total{cache="fragment"}', body)
+        self.assertIn("session_tokens_active 0", body)
+        self.assertIn("password_hash_queue_depth 0", body)
+
+    def test_fingerprinted_static_assets(self):
+        """Test built assets are linked by hashed name and served precompressed."""
+        static_folder = app.static_folder
+        manifest = app.extensions["asset_manifest"]
+        with tempfile.TemporaryDirectory() as directory:
+            build_folder = os.path.join(directory, "static")
+            shutil.copytree(static_folder, build_folder)
+            app.static_folder = build_folder
+            app.extensions["asset_manifest"] = build_assets(build_folder)
+            try:
+                hashed = app.extensions["asset_manifest"]["style.css"]
+                response = self.app.get(url_for("index"))
+                self.assertIn(hashed.encode(), response.data)
+
+                response = self.app.get(
+                    url_for("static", filename=hashed),
+                    headers={"Accept-Encoding": "gzip"},
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.headers["Content-Encoding"], "gzip")
+                self.assertIn("immutable", response.headers["Cache-Control"])
+                self.assertIn(b"body{", gzip.decompress(response.data))
+                response.close()
+            finally:
+                app.static_folder = static_folder
+                app.extensions["asset_manifest"] = manifest
+
+    def test_minify_js_keeps_multiline_strings(self):
+        """Test scripts with template literals or continued strings are unchanged."""
+        self.assertEqual(minify_js("  // note\n\n  let a = 1;\n"), "let a = 1;")
+        for source in [
+            "let html = `\n  <p>\n\n  // kept</p>`;\n",
+            "let text = 'first \\\n  second';\n",
+        ]:
+            self.assertEqual(minify_js(source), source)
+
+    def test_import_guides_upload(self):
+        """Test uploading a JSONL file imports valid guides and reports errors."""
+        self.create_author_and_game(
+            "Known Game", "importer", "importer@example.com", "333"
+        )
+        self.login("importer")
+        guide = {
+            "title": "Imported",
+            "content": "content",
+            "link": "http://example.com",
+            "video": "http://example.com/video",
+            "image": "http://example.com/image",
+        }
+        lines = [
+            json.dumps({**guide, "game_name": "Known Game"}),
+            json.dumps({**guide, "game_name": "Unknown Game"}),
+            json.dumps({**guide, "game_name": "Known Game", "title": ""}),
+            "not json",
+            json.dumps({**guide, "game_name": "Known Game"}),
+        ]
+
+        response = self.app.post(
+            "/guides/import",
+            data={"file": (io.BytesIO("\n".join(lines).encode()), "guides.jsonl")},
+        )
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertEqual(report["imported"], 2)
+        self.assertEqual(report["failed"], 3)
+        self.assertEqual([error["line"] for error in report["errors"]], [2, 3, 4])
+        self.assertEqual(db_session.query(Guide).filter_by(title="Imported").count(), 2)
+
+        csv_data = "game_name,title,content,link,video,image\nNew Game,T,C,L,V,I\n"
+        response = self.app.post(
+            "/guides/import",
+            data={
+                "file": (io.BytesIO(csv_data.encode()), "guides.csv"),
+                "create_games": "1",
+            },
+        )
+        self.assertEqual(response.get_json()["created_games"], 1)
+
+    def test_import_guides_commits_each_batch(self):
+        """Test an import releases the write lock between batches and keeps them."""
+        user, _ = self.create_author_and_game(
+            "Batch Game", "batcher", "batcher@example.com", "444"
+        )
+        guide = {"content": "c", "link": "l", "video": "v", "image": "i"}
+        lines = [
+            json.dumps({**guide, "game_name": game_name, "title": title})
+            for game_name, title in [
+                ("Batch Game", "Batch 1"),
+                ("New Batch Game", "Batch 2"),
+                ("Batch Game", "Broken"),
+                ("Batch Game", "Batch 3"),
+            ]
+        ]
+        lock_free = []
+
+        def progress(report):
+            with engine.connect() as other:
+                other.exec_driver_sql("PRAGMA busy_timeout=0")
+                other.exec_driver_sql("BEGIN IMMEDIATE")
+                other.rollback()
+            lock_free.append(report.imported)
+
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TRIGGER reject_broken BEFORE INSERT ON guides "
+                "WHEN new.title = 'Broken' BEGIN SELECT RAISE(ABORT, 'broken'); END"
+            )
+        try:
+            with self.assertRaises(ImportInterrupted) as raised:
+                import_guides(
+                    io.StringIO("\n".join(lines)),
+                    "jsonl",
+                    user.id,
+                    create_games=True,
+                    batch_size=2,
+                    on_progress=progress,
+                )
+        finally:
+            with engine.begin() as connection:
+                connection.exec_driver_sql("DROP TRIGGER reject_broken")
+
+        report = raised.exception.report
+        self.assertIsInstance(raised.exception.__cause__, IntegrityError)
+        self.assertEqual(lock_free, [2])
+        self.assertEqual(
+            (report.imported, report.created_games, report.committed_line), (2, 1, 2)
+        )
+        titles = db_session.scalars(
+            select(Guide.title).where(Guide.user_id == user.id).order_by(Guide.id)
+        ).all()
+        self.assertEqual(titles, ["Batch 1", "Batch 2"])
+
+    def test_export_guides_download(self):
+        """Test admins can stream the catalogue as gzipped JSONL and CSV."""
+        user, game = self.create_author_and_game(
+            "Export Game", "admin", "admin@example.com", "444"
+        )
+        self.create_guide(game, user, "Exported Guide")
+        self.login("admin")
+
+        response = self.app.get("/admin/guides/export")
+        self.assertEqual(response.status_code, 403)
+
+        app.config["ADMIN_USERNAMES"] = {"admin"}
+        try:
+            response = self.app.get("/admin/guides/export?gzip=1")
+            self.assertTrue(response.is_streamed)
+            record = json.loads(gzip.decompress(response.data))
+            self.assertEqual(record["title"], "Exported Guide")
+            self.assertEqual(record["game_name"], "Export Game")
+            self.assertEqual(record["author"], "admin")
+
+            response = self.app.get(
+                "/admin/guides/export?format=csv", headers={"Accept-Encoding": "gzip"}
+            )
+            self.assertNotIn("Content-Encoding", response.headers)
+            rows = response.get_data(as_text=True).splitlines()
+            self.assertTrue(rows[0].startswith("id,game_name,title"))
+            self.assertEqual(len(rows), 2)
+        finally:
+            app.config["ADMIN_USERNAMES"] = set()
+
+    def test_create_app_and_db_init_command(self):
+        """Test the app factory applies overrides and db init creates the schema."""
+        other = create_app({"GUIDES_PAGE_SIZE": 5, "TESTING": True})
+        self.assertIsNot(other, app)
+        self.assertEqual(other.config["GUIDES_PAGE_SIZE"], 5)
+        self.assertEqual(app.config["GUIDES_PAGE_SIZE"], 20)
+        self.assertIn("index", other.view_functions)
+        self.assertIn("login", other.view_functions)
+        self.assertIs(other.extensions["database"].engine, engine)
+
+        directory = tempfile.mkdtemp()
+        scratch = create_app(
+            {"DATABASE_URL": f"sqlite:///{directory}/init.db", "TESTING": True}
+        )
+        scratch_engine = scratch.extensions["database"].engine
+        try:
+            self.assertIsNot(scratch_engine, engine)
+            self.assertIsNot(scratch.extensions["database"].leaderboard, leaderboard)
+            # The commands reuse an active context rather than push their own.
+            with scratch.app_context():
+                result = scratch.test_cli_runner().invoke(args=["db", "init"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("guides", inspect(scratch_engine).get_table_names())
+            self.assertEqual(current_version(scratch_engine), MIGRATIONS[-1].version)
+            with scratch.app_context():
+                self.assertIs(get_engine(), scratch_engine)
+                db_session.add(Game(name="Scratch Game"))
+                db_session.commit()
+            with scratch_engine.connect() as connection:
+                names = connection.scalars(select(Game.name)).all()
+            self.assertEqual(names, ["Scratch Game"])
+            self.assertIsNone(
+                db_session.query(Game).filter_by(name="Scratch Game").first()
+            )
+        finally:
+            scratch_engine.dispose()
+            shutil.rmtree(directory)
+
+    def test_create_app_installs_shared_listeners_once(self):
+        """Test more applications do not add Session or pool listeners."""
+        create_app({"TESTING": True})
+        commit_listeners = len(Session().dispatch.after_commit)
+        checkout_listeners = len(engine.pool.dispatch.checkout)
+        create_app({"TESTING": True})
+        create_app({"TESTING": True})
+        self.assertEqual(len(Session().dispatch.after_commit), commit_listeners)
+        self.assertEqual(len(engine.pool.dispatch.checkout), checkout_listeners)
+
+    def test_migrations_upgrade_legacy_database(self):
+        """Test migrations bring an unversioned database to the latest version."""
+        directory = tempfile.mkdtemp()
+        legacy = build_engine({"DATABASE_URL": f"sqlite:///{directory}/legacy.db"})
+        try:
+            with legacy.begin() as connection:
+                for statement in (
+                    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, "
+                    "email VARCHAR, phone VARCHAR, password_hash VARCHAR)",
+                    "CREATE TABLE games (id INTEGER PRIMARY KEY, name VARCHAR)",
+                    "CREATE TABLE guides (id INTEGER PRIMARY KEY, title VARCHAR, "
+                    "content VARCHAR, link VARCHAR, video VARCHAR, image VARCHAR, "
+                    "user_id INTEGER REFERENCES users(id), "
+                    "game_id INTEGER REFERENCES games(id))",
+                    "INSERT INTO users VALUES "
+                    "(1, 'old', 'Old@Example.com', '+1 555 0100', 'x')",
+                    "INSERT INTO users VALUES "
+                    "(2, 'twin', 'OLD@example.com', '15550100', 'x')",
+                    "INSERT INTO games VALUES (1, 'Old Game')",
+                ):
+                    connection.exec_driver_sql(statement)
+                for number in range(25):
+                    connection.exec_driver_sql(
+                        "INSERT INTO guides (title, content, link, video, image, "
+                        f"user_id, game_id) VALUES ('Dragon {number}', 'c', 'l', "
+                        "'v', 'i', 1, 1)"
+                    )
+
+            self.assertEqual([step.version for step in migrate(legacy, 1)], [1])
+            indexes = {index["name"] for index in inspect(legacy).get_indexes("guides")}
+            self.assertIn("ix_guides_usage_count", indexes)
+            self.assertNotIn("ix_guides_game_id", indexes)
+
+            with migration_lock(legacy), self.assertRaises(MigrationLocked):
+                migrate(legacy)
+
+            # Index the guides through a table rebuild, as for a large table.
+            with mock.patch("db.migrations.operations.MAX_DIRECT_INDEX_ROWS", 10):
+                applied = migrate(legacy)
+            self.assertEqual(
+                [step.version for step in applied],
+                [step.version for step in MIGRATIONS[1:]],
+            )
+            self.assertEqual(current_version(legacy), MIGRATIONS[-1].version)
+            self.assertEqual(migrate(legacy), [])
+
+            schema = inspect(legacy)
+            usage_count = next(
+                column
+                for column in schema.get_columns("guides")
+                if column["name"] == "usage_count"
+            )
+            self.assertFalse(usage_count["nullable"])
+            self.assertTrue(
+                {"ix_guides_game_id", "ix_guides_user_id", "ix_guides_usage_count"}
+                <= {index["name"] for index in schema.get_indexes("guides")}
+            )
+            unique = {
+                index["name"]: index["unique"] for index in schema.get_indexes("users")
+            }
+            self.assertTrue(unique["ix_users_email_normalized"])
+            self.assertTrue(unique["ix_users_phone_normalized"])
+            with legacy.connect() as connection:
+                self.assertEqual(
+                    connection.exec_driver_sql(
+                        "SELECT name FROM sqlite_master "
+                        "WHERE substr(name, 1, 9) IN ('_rebuild_', '_retired_')"
+                    ).all(),
+                    [],
+                )
+                self.assertEqual(
+                    connection.exec_driver_sql("PRAGMA integrity_check").scalar(), "ok"
+                )
+                self.assertEqual(
+                    connection.exec_driver_sql(
+                        "SELECT COUNT(*), SUM(usage_count) FROM guides"
+                    ).one(),
+                    (25, 0),
+                )
+                self.assertEqual(
+                    connection.exec_driver_sql(
+                        "SELECT email_normalized, phone_normalized FROM users "
+                        "ORDER BY id"
+                    ).all(),
+                    [("old@example.com", "+15550100"), (None, None)],
+                )
+                self.assertEqual(
+                    connection.exec_driver_sql(
+                        "SELECT COUNT(*) FROM guides_fts "
+                        "WHERE guides_fts MATCH 'dragon'"
+                    ).scalar(),
+                    25,
+                )
+        finally:
+            legacy.dispose()
+            shutil.rmtree(directory)
+
+    def test_search_index_fills_in_bounded_resumable_chunks(self):
+        """Test migration 1 indexes a large guides table a range at a time."""
+        directory = tempfile.mkdtemp()
+        legacy = build_engine({"DATABASE_URL": f"sqlite:///{directory}/fts.db"})
+        fills = []
+
+        @event.listens_for(legacy, "before_cursor_execute")
+        def record_fill(connection, cursor, statement, parameters, context, many):
+            if statement.startswith("INSERT INTO guides_fts(rowid"):
+                fills.append(parameters)
+
+        save_position = operations._save_position
+
+        def interrupt_second_range(connection, task, position):
+            if task == SEARCH_INDEX_TASK and len(fills) > 1:
+                raise RuntimeError("interrupted")
+            save_position(connection, task, position)
+
+        try:
+            with legacy.begin() as connection:
+                connection.exec_driver_sql(
+                    "CREATE TABLE guides (id INTEGER PRIMARY KEY, title VARCHAR, "
+                    "content VARCHAR)"
+                )
+                connection.exec_driver_sql(
+                    "INSERT INTO guides (title, content) VALUES (?, 'c')",
+                    [(f"Dragon {number}",) for number in range(3000)],
+                )
+
+            with mock.patch(
+                "db.migrations.operations._save_position",
+                side_effect=interrupt_second_range,
+            ), self.assertRaises(RuntimeError):
+                create_search_index(legacy, batch_size=200, pause=0)
+            # The triggers keep indexed guides current while the fill is paused.
+            with legacy.begin() as connection:
+                connection.exec_driver_sql(
+                    "UPDATE guides SET title = 'Wyvern' WHERE id IN (1, 2500)"
+                )
+                connection.exec_driver_sql("DELETE FROM guides WHERE id IN (2, 2600)")
+                connection.exec_driver_sql(
+                    "INSERT INTO guides (title, content) VALUES ('Dragon new', 'c')"
+                )
+
+            self.assertEqual(create_search_index(legacy, batch_size=200, pause=0), 2800)
+            self.assertEqual(create_search_index(legacy), 0)
+            ranges = [fill[1] - fill[0] for fill in fills[2:]]
+            self.assertGreater(len(ranges), 1)
+            self.assertLess(max(ranges), 3000)
+            with legacy.connect() as connection:
+                connection.exec_driver_sql(
+                    "INSERT INTO guides_fts(guides_fts, rank) "
+                    "VALUES ('integrity-check', 1)"
+                )
+                matches = {
+                    term: connection.exec_driver_sql(
+                        "SELECT COUNT(*) FROM guides_fts "
+                        f"WHERE guides_fts MATCH '{term}'"
+                    ).scalar()
+                    for term in ("dragon", "wyvern")
+                }
+                self.assertEqual(matches, {"dragon": 2997, "wyvern": 2})
+                triggers = connection.exec_driver_sql(
+                    "SELECT sql FROM sqlite_master WHERE type = 'trigger'"
+                ).scalars()
+                self.assertFalse(any("WHEN" in sql for sql in triggers))
+        finally:
+            legacy.dispose()
+            shutil.rmtree(directory)
+
+    def test_sqlite_profiles_set_pragmas(self):
+        """Test the production profile turns on WAL on every new connection."""
+        directory = tempfile.mkdtemp()
+        try:
+            for profile, journal_mode, synchronous in [
+                ("production", "wal", 1),
+                ("default", "delete", 2),
+            ]:
+                profiled = build_engine(
+                    {
+                        "DATABASE_URL": f"sqlite:///{directory}/{profile}.db",
+                        "SQLITE_PROFILE": profile,
+                        "SQLITE_BUSY_TIMEOUT": 1234,
+                    }
+                )
+                with profiled.connect() as connection:
+                    pragma = connection.exec_driver_sql
+                    self.assertEqual(
+                        pragma("PRAGMA journal_mode").scalar(), journal_mode
+                    )
+                    self.assertEqual(pragma("PRAGMA synchronous").scalar(), synchronous)
+                    self.assertEqual(pragma("PRAGMA busy_timeout").scalar(), 1234)
+                profiled.dispose()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_commit_with_retry_retries_locked_commits(self):
+        """Test locked commits are retried as configured and other errors are not."""
+        locked = OperationalError(
+            "COMMIT", {}, sqlite3.OperationalError("database is locked")
+        )
+        session = mock.Mock(new=[])
+        session.commit.side_effect = [locked, locked, None]
+        settings = {"DB_COMMIT_RETRIES": 2, "DB_COMMIT_BACKOFF": 0}
+        with mock.patch.dict(app.config, settings):
+            commit_with_retry(session)
+            self.assertEqual(session.commit.call_count, 3)
+            self.assertEqual(session.rollback.call_count, 2)
+
+            session.commit.side_effect = [locked] * 3
+            with self.assertRaises(OperationalError):
+                commit_with_retry(session)
+            self.assertEqual(session.commit.call_count, 6)
+
+        failed = OperationalError("COMMIT", {}, sqlite3.OperationalError("disk I/O"))
+        session.commit.side_effect = [failed]
+        with self.assertRaises(OperationalError):
+            commit_with_retry(session)
+        self.assertEqual(session.commit.call_count, 7)
+
+    def test_backfill_resumes_after_interruption(self):
+        """Test a failed backfill batch is rolled back and resumed on the next run."""
+        for number in range(10):
+            db_session.add(Game(name=f"Backfill Game {number}"))
+        db_session.commit()
+        games = Game.__table__
+        ranges = []
+
+        def apply(connection, low, high):
+            ranges.append((low, high))
+            if len(ranges) == 2:
+                raise RuntimeError("interrupted")
+            return connection.execute(
+                games.update()
+                .where(games.c.id > low, games.c.id <= high)
+                .values(name=games.c.name + " (renamed)")
+            ).rowcount
+
+        with self.assertRaises(RuntimeError):
+            backfill(engine, "test.rename_games", games, apply, batch_size=3, pause=0)
+        self.assertEqual(ranges, [(0, 3), (3, 9)])
+
+        ranges.append(None)
+        renamed = backfill(
+            engine, "test.rename_games", games, apply, batch_size=3, pause=0
+        )
+        self.assertEqual(renamed, 7)
+        self.assertEqual(ranges[3], (3, 6))
+        names = db_session.scalars(select(Game.name).order_by(Game.id)).all()
+        self.assertTrue(all(name.endswith("(renamed)") for name in names))
+
+    def test_rebuild_table_keeps_rows_breaking_new_constraints(self):
+        """Test a rebuild adding NOT NULL fails on NULL rows instead of losing them."""
+        directory = tempfile.mkdtemp()
+        scratch = build_engine({"DATABASE_URL": f"sqlite:///{directory}/scratch.db"})
+        items = Table(
+            "items",
+            MetaData(),
+            Column("id", Integer, primary_key=True),
+            Column("amount", Integer, nullable=False),
+        )
+        try:
+            with scratch.begin() as connection:
+                connection.exec_driver_sql(
+                    "CREATE TABLE items (id INTEGER PRIMARY KEY, amount INTEGER)"
+                )
+                connection.exec_driver_sql("INSERT INTO items VALUES (1, NULL), (2, 5)")
+
+            with self.assertRaises(IntegrityError):
+                rebuild_table(scratch, items, pause=0)
+            with scratch.connect() as connection:
+                count = connection.exec_driver_sql("SELECT COUNT(*) FROM items")
+                self.assertEqual(count.scalar(), 2)
+
+            with scratch.begin() as connection:
+                connection.exec_driver_sql(
+                    "UPDATE items SET amount = 0 WHERE amount IS NULL"
+                )
+            rebuild_table(scratch, items, pause=0)
+            with scratch.connect() as connection:
+                rows = connection.exec_driver_sql("SELECT * FROM items ORDER BY id")
+                self.assertEqual(rows.all(), [(1, 0), (2, 5)])
+            self.assertFalse(inspect(scratch).get_columns("items")[1]["nullable"])
+        finally:
+            scratch.dispose()
+            shutil.rmtree(directory)
+
+    def test_rebuild_table_recreates_indexes_without_writable_schema(self):
+        """Test a rebuild builds the indexes after the swap in defensive mode."""
+        directory = tempfile.mkdtemp()
+        scratch = build_engine({"DATABASE_URL": f"sqlite:///{directory}/scratch.db"})
+        items = Table(
+            "items",
+            MetaData(),
+            Column("id", Integer, primary_key=True),
+            Column("amount", Integer, nullable=False, index=True),
+        )
+
+        # SQLITE_DBCONFIG_DEFENSIVE makes writes to sqlite_master fail this way.
+        @event.listens_for(scratch, "do_execute")
+        def defensive(cursor, statement, parameters, context):
+            if statement.startswith("UPDATE sqlite_master"):
+                raise sqlite3.OperationalError(
+                    "table sqlite_master may not be modified"
+                )
+
+        try:
+            with scratch.begin() as connection:
+                connection.exec_driver_sql(
+                    "CREATE TABLE items (id INTEGER PRIMARY KEY, amount INTEGER)"
+                )
+                connection.exec_driver_sql("INSERT INTO items VALUES (1, 3), (2, 5)")
+
+            rebuild_table(scratch, items, pause=0)
+            schema = inspect(scratch)
+            self.assertEqual(
+                [index["name"] for index in schema.get_indexes("items")],
+                ["ix_items_amount"],
+            )
+            self.assertFalse(schema.get_columns("items")[1]["nullable"])
+            with scratch.connect() as connection:
+                rows = connection.exec_driver_sql("SELECT * FROM items ORDER BY id")
+                self.assertEqual(rows.all(), [(1, 3), (2, 5)])
+                self.assertEqual(
+                    connection.exec_driver_sql("PRAGMA integrity_check").scalar(), "ok"
+                )
+        finally:
+            scratch.dispose()
+            shutil.rmtree(directory)
+
+    def test_api_guides_pagination_projection_and_filters(self):
+        """Test the JSON guide API pages, projects fields and filters."""
+        user, first_game = self.create_author_and_game("Api Game A")
+        games = [first_game, Game(name="Api Game B")]
+        db_session.add(games[1])
+        db_session.commit()
+        for number in range(5):
+            self.create_guide(
+                games[number % 2], user, f"Api Guide {number}", content="long content"
+            )
+        self.login("author")
+
+        response = self.app.get("/api/v1/guides?limit=2")
+        self.assertEqual(response.status_code, 200)
+        page = response.get_json()
+        self.assertEqual(len(page["data"]), 2)
+        self.assertNotIn("content", page["data"][0])
+        self.assertEqual(page["data"][0]["game_name"], "Api Game A")
+        self.assertEqual(page["data"][0]["author"], "author")
+        next_page = self.app.get(page["next"]).get_json()
+        self.assertEqual(next_page["data"][0]["id"], page["next_after"] + 1)
+
+        response = self.app.get(f"/api/v1/guides?fields=title&game_id={games[1].id}")
+        data = response.get_json()["data"]
+        self.assertEqual([set(guide) for guide in data], [{"id", "title"}] * 2)
+
+        guide_id = data[0]["id"]
+        guide = self.app.get(f"/api/v1/guides/{guide_id}").get_json()
+        self.assertEqual(guide["content"], "long content")
+        self.assertEqual(self.app.get("/api/v1/guides/999").status_code, 404)
+        self.assertEqual(self.app.get("/api/v1/guides?fields=secret").status_code, 400)
+
+        games_page = self.app.get("/api/v1/games?fields=name").get_json()
+        self.assertEqual(
+            [game["name"] for game in games_page["data"]], ["Api Game A", "Api Game B"]
+        )
+
+    def test_api_rejects_anonymous_requests(self):
+        """Test the JSON API requires a login like the pages it mirrors."""
+        user, game = self.create_author_and_game("Private Game")
+        guide = self.create_guide(game, user, "Private Guide")
+        for path in ["/api/v1/games", "/api/v1/guides", f"/api/v1/guides/{guide.id}"]:
+            response = self.app.get(path)
+            self.assertEqual(response.status_code, 401, path)
+            self.assertNotIn(b"Private", response.data)
+            self.assertEqual(response.get_json(), {"error": "Authentication required."})
+
+        self.login("author")
+        self.assertEqual(self.app.get(f"/api/v1/guides/{guide.id}").status_code, 200)
+
     def test_register(self):
         """Test user registration."""
         response = self.app.post(
@@ -56,6 +1049,146 @@ class FlaskAppTests(unittest.TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertIn(url_for("index"), response.location)
 
+    def test_login_rehashes_outdated_password_hash(self):
+        """Test a hash made with old parameters is upgraded on login."""
+        user = User(
+            username="legacyuser",
+            email="legacy@example.com",
+            phone="444",
+            password_hash=generate_password_hash("password", "pbkdf2:sha256:1000"),
+        )
+        db_session.add(user)
+        db_session.commit()
+
+        response = self.login("legacyuser")
+        self.assertEqual(response.status_code, 302)
+        db_session.refresh(user)
+        self.assertTrue(user.password_hash.startswith(app.config["PASSWORD_HASH_METHOD"]))
+        self.assertTrue(user.check_password("password"))
+
+    def test_login_rate_limited_per_identifier(self):
+        """Test repeated login attempts for one identifier are rejected with 429."""
+        limit, _ = parse_limit(app.config["RATE_LIMITS"]["login"]["per_identifier"])
+        statuses = [
+            self.app.post(
+                url_for("login"),
+                data={"identifier": "throttled", "password": "wrong"},
+            ).status_code
+            for _ in range(limit + 1)
+        ]
+        self.assertNotIn(429, statuses[:limit])
+        self.assertEqual(statuses[-1], 429)
+
+    def test_rate_limiters_count_all_keys_or_none(self):
+        """Test a rejected key does not use up the allowance of the other keys."""
+        for limiter in [MemoryRateLimiter(), SQLiteRateLimiter(engine)]:
+            hits = [("test:ip", 10, 60), ("test:id", 1, 60)]
+            self.assertEqual(limiter.hit_many(hits), (True, 0, None))
+            allowed, _, rejected = limiter.hit_many(hits)
+            self.assertFalse(allowed)
+            self.assertEqual(rejected, "test:id")
+            for _ in range(9):
+                self.assertTrue(limiter.hit("test:ip", 10, 60)[0])
+            self.assertFalse(limiter.hit("test:ip", 10, 60)[0])
+
+    def test_login_rate_limit_fails_open_when_database_is_locked(self):
+        """Test a locked rate limit table lets the request through."""
+        locked = OperationalError("INSERT", {}, sqlite3.OperationalError("locked"))
+        limiter = app.extensions["rate_limiter"]
+        with mock.patch.object(limiter, "hit_many", side_effect=locked):
+            response = self.app.post(
+                url_for("login"),
+                data={"identifier": "throttled", "password": "wrong"},
+            )
+        self.assertNotEqual(response.status_code, 429)
+        self.assertNotEqual(response.status_code, 500)
+
+    def test_password_hasher_workers_are_not_forked(self):
+        """Test hashing workers start fresh instead of forking the app."""
+        hasher = PasswordHasher("pbkdf2:sha256:1000", max_workers=1)
+        try:
+            password_hash = hasher.hash_password("password")
+            self.assertTrue(hasher.verify_password(password_hash, "password"))
+            start_method = hasher._get_executor()._mp_context.get_start_method()
+            self.assertNotEqual(start_method, "fork")
+        finally:
+            hasher.shutdown()
+
+    def test_login_with_differently_formatted_email_and_phone(self):
+        """Test login matches normalized emails and phone numbers."""
+        user = User(
+            username="formatted",
+            email="Formatted@Example.com",
+            phone="+380 (50) 123-45-67",
+        )
+        user.set_password("password")
+        db_session.add(user)
+        db_session.commit()
+
+        for identifier in ["formatted@example.COM", "00380501234567"]:
+            response = self.app.post(
+                url_for("login"),
+                data={"identifier": identifier, "password": "password"},
+            )
+            self.assertEqual(response.status_code, 302, identifier)
+
+    def test_login_with_username_containing_at_sign(self):
+        """Test a username that looks like an email still logs in."""
+        user = User(username="gamer@home", email="gamer@example.com", phone="555")
+        user.set_password("password")
+        db_session.add(user)
+        db_session.commit()
+
+        self.assertEqual(self.login("gamer@home").status_code, 302)
+
+    def test_login_with_colliding_normalized_identifiers(self):
+        """Test accounts sharing a normalized email or phone log in as themselves."""
+        self.create_author_and_game(
+            "Collision Game", "first", "A@Example.com", "+1 555 0100"
+        )
+        # A newer account whose identifiers were cleared as duplicates.
+        with engine.begin() as connection:
+            connection.execute(
+                User.__table__.insert().values(
+                    username="second",
+                    email="a@example.com",
+                    phone="15550100",
+                    password_hash=generate_password_hash("other", "pbkdf2:sha256:1000"),
+                )
+            )
+
+        for identifier, password, username in [
+            ("a@example.com", "other", "second"),
+            ("15550100", "other", "second"),
+            ("a@example.com", "password", None),
+            ("a@EXAMPLE.com", "password", "first"),
+            ("+1 (555) 0100", "password", "first"),
+        ]:
+            self.app.get(url_for("logout"))
+            response = self.login(identifier, password)
+            with self.app.session_transaction() as flask_session:
+                user_id = flask_session.get("user_id")
+            user = db_session.get(User, user_id) if user_id else None
+            self.assertEqual(user and user.username, username, identifier)
+            self.assertEqual(response.status_code, 302 if username else 200)
+
+    def test_normalized_emails_are_unique(self):
+        """Test emails differing only in case are rejected as duplicates."""
+        self.create_author_and_game("Unique Game", email="Taken@Example.com")
+        response = self.app.post(
+            url_for("register"),
+            data={
+                "username": "other",
+                "email": "taken@example.com",
+                "phone": "222",
+                "password": "password",
+            },
+        )
+        self.assertIn(b"already exists", response.data)
+        self.assertIsNone(
+            db_session.scalars(select(User).filter_by(username="other")).first()
+        )
+
     def test_logout(self):
         """Test user logout."""
         self.test_login()
@@ -63,6 +1196,38 @@ class FlaskAppTests(unittest.TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertIn(url_for("index"), response.location)
 
+    def test_login_and_logout_manage_token(self):
+        """Test login stores a session token and logout removes it."""
+        user = User(username="tokenuser", email="token@example.com", phone="222")
+        user.set_password("password")
+        db_session.add(user)
+        db_session.commit()
+
+        self.login("tokenuser")
+        with self.app.session_transaction() as flask_session:
+            self.assertEqual(tokens.get(user.id), flask_session["token"])
+
+        self.app.get(url_for("logout"))
+        self.assertIsNone(tokens.get(user.id))
+
+    def test_user_cache_invalidated_on_edit(self):
+        """Test the user loader serves cached users and is cleared on edit."""
+        user = User(username="cacheduser", email="cached@example.com", phone="333")
+        user.set_password("password")
+        db_session.add(user)
+        db_session.commit()
+        user_cache.clear()
+
+        self.assertEqual(load_user(user.id).username, "cacheduser")
+        hits = user_cache.stats()["hits"]
+        self.assertEqual(load_user(str(user.id)).username, "cacheduser")
+        self.assertEqual(user_cache.stats()["hits"], hits + 1)
+
+        self.login("cacheduser")
+        self.app.post(url_for("edit_user"), data={"username": "renameduser"})
+        self.assertIsNone(user_cache.get(user.id))
+        self.assertEqual(load_user(user.id).username, "renameduser")
+
     def test_add_game(self):
         """Test adding a new game."""
         self.test_login()